@@ -1,5 +1,10 @@
+import os
 from flask import Flask
 from flask_cors import CORS
+
+# Serverless cold starts skip create_all while the schema marker is current
+os.environ.setdefault('STARTUP_MODE', 'fast')
+
 from app import create_app
 
 app = create_app()
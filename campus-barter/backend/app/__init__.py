@@ -18,30 +18,112 @@ def create_app(test_config=None):
         SQLALCHEMY_DATABASE_URI=os.environ.get('DATABASE_URL', 'sqlite:///campus_barter.db'),
         SQLALCHEMY_TRACK_MODIFICATIONS=False,
         JWT_SECRET_KEY=os.environ.get('JWT_SECRET_KEY', 'jwt-secret-key'),
+        EVENT_POLL_INTERVAL=float(os.environ.get('EVENT_POLL_INTERVAL', 0.25)),
+        EVENT_HEARTBEAT_INTERVAL=float(os.environ.get('EVENT_HEARTBEAT_INTERVAL', 15)),
+        EVENT_RETENTION_SECONDS=int(os.environ.get('EVENT_RETENTION_SECONDS', 3600)),
+        PASSWORD_HASH_METHOD=os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:260000'),
+        PASSWORD_SALT_LENGTH=int(os.environ.get('PASSWORD_SALT_LENGTH', 16)),
+        PASSWORD_HASH_WORKERS=int(os.environ.get('PASSWORD_HASH_WORKERS', 2)),
+        PASSWORD_HASH_QUEUE=int(os.environ.get('PASSWORD_HASH_QUEUE', 16)),
+        RATE_LIMIT_STORE=os.environ.get('RATE_LIMIT_STORE'),  # SQLite file shared by local processes, default in memory
+        LOGIN_RATE_PER_IP=os.environ.get('LOGIN_RATE_PER_IP', '20/60'),
+        LOGIN_RATE_PER_ACCOUNT=os.environ.get('LOGIN_RATE_PER_ACCOUNT', '5/60'),
+        REGISTER_RATE_PER_IP=os.environ.get('REGISTER_RATE_PER_IP', '5/300'),
+        MATCHING_RATE_PER_USER=os.environ.get('MATCHING_RATE_PER_USER', '30/60'),  # All expensive matching endpoints together
+        RECOMMENDATIONS_RATE_PER_USER=os.environ.get('RECOMMENDATIONS_RATE_PER_USER', '10/60'),
+        INSTANT_MATCHES_RATE_PER_USER=os.environ.get('INSTANT_MATCHES_RATE_PER_USER', '20/60'),
+        ITEM_ANALYSIS_RATE_PER_USER=os.environ.get('ITEM_ANALYSIS_RATE_PER_USER', '5/300'),
+        REMOTE_BUDGET_PER_USER=os.environ.get('REMOTE_BUDGET_PER_USER', '200/3600'),  # Cost units, see REMOTE_CALL_COSTS
+        MEDIA_ROOT=os.environ.get('MEDIA_ROOT', os.path.join(app.instance_path, 'media')),
+        MEDIA_THUMBNAIL_SIZE=int(os.environ.get('MEDIA_THUMBNAIL_SIZE', 320)),
+        MAX_CONTENT_LENGTH=int(os.environ.get('MAX_UPLOAD_BYTES', 8 * 1024 * 1024)),
+        JOB_POLL_INTERVAL=float(os.environ.get('JOB_POLL_INTERVAL', 1)),
+        JOB_VISIBILITY_TIMEOUT=int(os.environ.get('JOB_VISIBILITY_TIMEOUT', 300)),
+        JOB_RETRY_BASE_SECONDS=float(os.environ.get('JOB_RETRY_BASE_SECONDS', 5)),
+        CYCLE_INDEX_TTL=int(os.environ.get('CYCLE_INDEX_TTL', 300)),
+        CYCLE_MAX_OUT_DEGREE=int(os.environ.get('CYCLE_MAX_OUT_DEGREE', 10)),
+        CYCLE_BUCKET_SCAN=int(os.environ.get('CYCLE_BUCKET_SCAN', 200)),
+        CYCLE_TIME_BUDGET_MS=int(os.environ.get('CYCLE_TIME_BUDGET_MS', 200)),
+        EMBEDDING_STORE_DIR=os.environ.get('EMBEDDING_STORE_DIR', os.path.join(app.instance_path, 'embeddings')),
+        EMBEDDING_STORE_DTYPE=os.environ.get('EMBEDDING_STORE_DTYPE', 'float32'),  # float32, int8
+        EMBEDDING_DELTA_MAX_ROWS=int(os.environ.get('EMBEDDING_DELTA_MAX_ROWS', 5000)),
+        MATCHING_DEADLINE_SECONDS=float(os.environ.get('MATCHING_DEADLINE_SECONDS', 5)),
+        MATCHING_MAX_CONCURRENCY=int(os.environ.get('MATCHING_MAX_CONCURRENCY', 8)),  # Embedding requests in flight per process
+        MATCHING_INDEX_TTL=int(os.environ.get('MATCHING_INDEX_TTL', 300)),
+        MATCHING_GENERATOR_LIMIT=int(os.environ.get('MATCHING_GENERATOR_LIMIT', 100)),
+        MATCHING_MAX_CANDIDATES=int(os.environ.get('MATCHING_MAX_CANDIDATES', 300)),
+        MATCHING_WEIGHTS=os.environ.get(
+            'MATCHING_WEIGHTS', 'similarity=0.6,category=0.15,tags=0.1,freshness=0.1,reputation=0.05'
+        ),
+        STARTUP_MODE=os.environ.get('STARTUP_MODE', 'full'),  # full, fast
+        STARTUP_REPORT=os.environ.get('STARTUP_REPORT', '') in ('1', 'true'),
+        METRICS_TOKEN=os.environ.get('METRICS_TOKEN'),
+        CHANGES_TOKEN=os.environ.get('CHANGES_TOKEN'),  # Bearer token for indexers reading every change
+        BATCH_MAX_REQUESTS=int(os.environ.get('BATCH_MAX_REQUESTS', 20)),
+        LISTING_TTL_DAYS=int(os.environ.get('LISTING_TTL_DAYS', 60)),
+        ITEM_EXPIRY_BATCH_SIZE=int(os.environ.get('ITEM_EXPIRY_BATCH_SIZE', 200)),
+        ITEM_EXPIRY_MAX_PER_RUN=int(os.environ.get('ITEM_EXPIRY_MAX_PER_RUN', 5000)),
+        ITEM_EXPIRY_BATCH_PAUSE=float(os.environ.get('ITEM_EXPIRY_BATCH_PAUSE', 0.5)),
+        TRADE_ARCHIVE_AFTER_DAYS=int(os.environ.get('TRADE_ARCHIVE_AFTER_DAYS', 365)),
+        TRADE_ARCHIVE_BATCH_SIZE=int(os.environ.get('TRADE_ARCHIVE_BATCH_SIZE', 200)),
+        QUERY_BUDGET=int(os.environ.get('QUERY_BUDGET', 20)),
+        QUERY_BUDGETS={},  # Per-endpoint overrides, keyed by route rule
+        QUERY_BUDGET_WARNINGS=os.environ.get('QUERY_BUDGET_WARNINGS', os.environ.get('FLASK_DEBUG', '')) in ('1', 'true'),
+        PROFILING_ENABLED=os.environ.get('PROFILING_ENABLED', '') in ('1', 'true'),
+        PROFILING_TOKEN=os.environ.get('PROFILING_TOKEN'),
+        PROFILE_DIR=os.environ.get('PROFILE_DIR', os.path.join(app.instance_path, 'profiles')),
     )
+    
+    # Override defaults with test configuration if provided
+    if test_config is not None:
+        app.config.from_mapping(test_config)
+    
+    from app.utils.startup import StartupTimer, ensure_schema
+    timer = StartupTimer(enabled=app.config['STARTUP_REPORT'])
 
     # Enable CORS
     CORS(app)
     
     # Initialize extensions with app
-    db.init_app(app)
-    jwt.init_app(app)
+    with timer.phase('extensions'):
+        from app.utils.metrics import init_metrics, install_sql_listeners
+        from app.utils.profiling import init_profiling
+        db.init_app(app)
+        jwt.init_app(app)
+        install_sql_listeners()
+        init_metrics(app)
+        init_profiling(app)
     
     # Register blueprints
-    from app.routes.auth import auth_bp
-    from app.routes.items import items_bp
-    from app.routes.trades import trades_bp
-    from app.routes.users import users_bp
-    from app.routes.matching import matching_bp
-    
-    app.register_blueprint(auth_bp)
-    app.register_blueprint(items_bp)
-    app.register_blueprint(trades_bp)
-    app.register_blueprint(users_bp)
-    app.register_blueprint(matching_bp)
-    
-    # Create database tables
-    with app.app_context():
-        db.create_all()
+    with timer.phase('blueprints'):
+        from app.routes.auth import auth_bp
+        from app.routes.items import items_bp
+        from app.routes.trades import trades_bp
+        from app.routes.users import users_bp
+        from app.routes.matching import matching_bp
+        from app.routes.media import media_bp
+        from app.routes.jobs import jobs_bp
+        from app.routes.metrics import metrics_bp
+        from app.routes.changes import changes_bp
+        from app.routes.batch import batch_bp
+        
+        app.register_blueprint(auth_bp)
+        app.register_blueprint(items_bp)
+        app.register_blueprint(trades_bp)
+        app.register_blueprint(users_bp)
+        app.register_blueprint(matching_bp)
+        app.register_blueprint(media_bp)
+        app.register_blueprint(jobs_bp)
+        app.register_blueprint(metrics_bp)
+        app.register_blueprint(changes_bp)
+        app.register_blueprint(batch_bp)
+    
+    # Create database tables, skipped in fast mode when the schema marker is current
+    with timer.phase('schema'):
+        ensure_schema(app)
+    
+    if timer.enabled:
+        app.extensions['startup_report'] = timer.report()
+        timer.print_report()
     
     return app
@@ -1,6 +1,16 @@
 from app.models.user import User
 from app.models.item import Item
-from app.models.trade import Trade, TradeItem
+from app.models.trade import Trade, TradeItem, TradeRevision
 from app.models.message import Message
+from app.models.trade_event import TradeEvent
+from app.models.schema_version import SchemaVersion
+from app.models.media import MediaFile
+from app.models.job import Job
+from app.models.need import StandingNeed, NeedKeyword, NeedMatch
+from app.models.reputation import TradeRating, UserStats
+from app.models.duplicate import ItemBand
+from app.models.change import Change
+from app.models.archive import TradeArchive
+from app.models.inbox import TradeCounters, TradeReadMarker
 
 # Import all models here to make them available for imports elsewhere
@@ -0,0 +1,45 @@
+from app import db
+from datetime import datetime
+import json
+import zlib
+
+class TradeArchive(db.Model):
+    """
+    A finished trade moved out of the hot tables by the archiver. The columns
+    needed to find a user's archived trades are kept; everything else (items,
+    messages, revisions and ratings) is a zlib-compressed JSON snapshot
+    """
+    trade_id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # The trade's original id
+    initiator_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    recipient_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    status = db.Column(db.String(20), nullable=False)  # completed, rejected
+    creation_date = db.Column(db.DateTime, nullable=True)
+    completion_date = db.Column(db.DateTime, nullable=True)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    payload = db.Column(db.LargeBinary, nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_trade_archive_initiator_status', 'initiator_id', 'status'),
+        db.Index('ix_trade_archive_recipient_status', 'recipient_id', 'status'),
+    )
+    
+    @property
+    def id(self):
+        return self.trade_id
+    
+    @staticmethod
+    def compress(data):
+        return zlib.compress(json.dumps(data, separators=(',', ':')).encode('utf-8'), 6)
+    
+    @property
+    def data(self):
+        return json.loads(zlib.decompress(self.payload).decode('utf-8'))
+    
+    def to_dict(self, include_messages=True):
+        data = self.data
+        data.pop('ratings', None)
+        data.pop('revisions', None)
+        if not include_messages:
+            data.pop('messages', None)
+        data['archived'] = True
+        return data
@@ -0,0 +1,33 @@
+from app import db
+from datetime import datetime
+import json
+
+class Change(db.Model):
+    """
+    Append-only log entry for a create, update or delete of an item, trade or
+    trade message. Rows are written in the same transaction as the change and
+    their ids serve as the /api/changes cursor.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(20), nullable=False)  # item, trade, message
+    entity_id = db.Column(db.Integer, nullable=False)
+    operation = db.Column(db.String(20), nullable=False)  # create, update, delete
+    
+    # Who may see the entry: items are public on their campus, trades and
+    # messages only to the two parties
+    campus = db.Column(db.String(100), nullable=True)
+    user_id = db.Column(db.Integer, nullable=True)  # Item owner or trade initiator
+    counterparty_id = db.Column(db.Integer, nullable=True)  # Trade recipient
+    
+    payload = db.Column(db.Text, nullable=True)  # JSON snapshot after the change, null for deletes
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'cursor': str(self.id),
+            'entity': self.entity,
+            'id': self.entity_id,
+            'operation': self.operation,
+            'data': json.loads(self.payload) if self.payload else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
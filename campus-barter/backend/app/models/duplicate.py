@@ -0,0 +1,15 @@
+from app import db
+
+class ItemBand(db.Model):
+    """
+    LSH index from a band of an item's MinHash signature to the item.
+    Items sharing any bucket are near-duplicate candidates
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    item_id = db.Column(db.Integer, db.ForeignKey('item.id'), nullable=False, index=True)
+    bucket = db.Column(db.String(24), nullable=False)  # "<band>:<hash of the band's rows>"
+    campus = db.Column(db.String(100), nullable=True)  # The item's campus, so lookups stay in one partition
+    
+    __table_args__ = (
+        db.Index('ix_item_band_campus_bucket', 'campus', 'bucket', 'item_id'),
+    )
@@ -0,0 +1,38 @@
+from app import db
+from datetime import datetime
+
+class TradeCounters(db.Model):
+    """
+    Running counts behind a user's trade badges, updated in the same
+    transaction as the messages and trades they count
+    """
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    unread_messages = db.Column(db.Integer, default=0, nullable=False)
+    pending_received = db.Column(db.Integer, default=0, nullable=False)  # Pending trades waiting on this user's answer
+    pending_sent = db.Column(db.Integer, default=0, nullable=False)  # Pending trades waiting on the other party
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'unread_messages': self.unread_messages or 0,
+            'pending_received': self.pending_received or 0,
+            'pending_sent': self.pending_sent or 0
+        }
+
+class TradeReadMarker(db.Model):
+    """
+    How far a user has read a trade's messages, and how many arrived since
+    """
+    trade_id = db.Column(db.Integer, db.ForeignKey('trade.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    last_read_message_id = db.Column(db.Integer, nullable=True)
+    unread = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'trade_id': self.trade_id,
+            'user_id': self.user_id,
+            'last_read_message_id': self.last_read_message_id,
+            'unread': self.unread or 0
+        }
@@ -1,4 +1,5 @@
 from app import db
+from app.utils.media import thumbnail_url
 from datetime import datetime
 
 class Item(db.Model):
@@ -10,7 +11,16 @@ class Item(db.Model):
     images = db.Column(db.Text, nullable=True)  # Comma-separated URLs or paths
     tags = db.Column(db.String(200), nullable=True)  # Comma-separated tags
     date_listed = db.Column(db.DateTime, default=datetime.utcnow)
-    status = db.Column(db.String(20), default='available')  # available, pending, traded
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=True)
+    status = db.Column(db.String(20), default='available')  # available, pending, traded, expired
+    expires_at = db.Column(db.DateTime, nullable=True)  # See app/utils/expiry.py
+    
+    # Owner's campus, copied so listings can be partitioned without a join
+    campus = db.Column(db.String(100), nullable=True)
+    
+    # Near-duplicate detection, see app/utils/duplicates.py
+    minhash = db.Column(db.Text, nullable=True)  # Comma-separated MinHash signature
+    duplicate_of = db.Column(db.Integer, db.ForeignKey('item.id'), nullable=True, index=True)  # Oldest listing in its cluster
     
     # Foreign keys
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -18,17 +28,29 @@ class Item(db.Model):
     # Relationships
     offered_in_trades = db.relationship('TradeItem', foreign_keys='TradeItem.offered_item_id', backref='offered_item', lazy=True)
     requested_in_trades = db.relationship('TradeItem', foreign_keys='TradeItem.requested_item_id', backref='requested_item', lazy=True)
+    signature_bands = db.relationship('ItemBand', backref='item', lazy=True, cascade='all, delete-orphan')
+    
+    __table_args__ = (
+        db.Index('ix_item_campus_status_category', 'campus', 'status', 'category'),
+        db.Index('ix_item_status_expires_at', 'status', 'expires_at'),
+    )
     
     def to_dict(self):
+        images = self.images.split(',') if self.images else []
         return {
             'id': self.id,
             'title': self.title,
             'description': self.description,
             'category': self.category,
             'condition': self.condition,
-            'images': self.images.split(',') if self.images else [],
+            'images': images,
+            'thumbnails': [thumbnail_url(image) for image in images],
             'tags': self.tags.split(',') if self.tags else [],
             'date_listed': self.date_listed.isoformat() if self.date_listed else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'status': self.status,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+            'campus': self.campus,
+            'duplicate_of': self.duplicate_of,
             'user_id': self.user_id
         }
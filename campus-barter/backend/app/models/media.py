@@ -0,0 +1,30 @@
+from app import db
+from app.utils.media import media_url
+from datetime import datetime
+
+class MediaFile(db.Model):
+    """
+    An uploaded image, stored on disk under the SHA-256 of its contents
+    """
+    hash = db.Column(db.String(64), primary_key=True)
+    content_type = db.Column(db.String(50), nullable=False)
+    extension = db.Column(db.String(10), nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    width = db.Column(db.Integer, nullable=True)
+    height = db.Column(db.Integer, nullable=True)
+    variants_ready = db.Column(db.Boolean, default=False)
+    uploader_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'hash': self.hash,
+            'content_type': self.content_type,
+            'size': self.size,
+            'width': self.width,
+            'height': self.height,
+            'variants_ready': self.variants_ready,
+            'url': media_url(self.hash),
+            'thumbnail_url': media_url(self.hash, 'thumb'),
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
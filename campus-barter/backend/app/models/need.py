@@ -0,0 +1,78 @@
+from app import db
+from datetime import datetime
+import json
+
+class StandingNeed(db.Model):
+    """
+    A persisted instant need that is matched against new listings as they arrive
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    campus = db.Column(db.String(100), nullable=True)
+    description = db.Column(db.Text, nullable=False)
+    keywords = db.Column(db.Text, nullable=False)  # Comma-separated keywords
+    embedding = db.Column(db.Text, nullable=True)  # JSON encoded, filled in by the matching job
+    active = db.Column(db.Boolean, default=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    keyword_entries = db.relationship('NeedKeyword', backref='need', lazy=True, cascade='all, delete-orphan')
+    matches = db.relationship('NeedMatch', backref='need', lazy=True, cascade='all, delete-orphan')
+    
+    def get_embedding(self):
+        return json.loads(self.embedding) if self.embedding else None
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'description': self.description,
+            'keywords': self.keywords.split(',') if self.keywords else [],
+            'active': self.active,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class NeedKeyword(db.Model):
+    """
+    Reverse index from a keyword to the active needs that contain it
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    need_id = db.Column(db.Integer, db.ForeignKey('standing_need.id'), nullable=False)
+    keyword = db.Column(db.String(50), nullable=False)
+    campus = db.Column(db.String(100), nullable=True)  # The need's campus, so lookups stay in one partition
+    
+    __table_args__ = (
+        db.Index('ix_need_keyword_campus_keyword', 'campus', 'keyword', 'need_id'),
+    )
+
+class NeedMatch(db.Model):
+    """
+    A listing found for a standing need, waiting for its owner to fetch it
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    need_id = db.Column(db.Integer, db.ForeignKey('standing_need.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    item_id = db.Column(db.Integer, db.ForeignKey('item.id'), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    reason = db.Column(db.String(200), nullable=True)
+    seen = db.Column(db.Boolean, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    item = db.relationship('Item', lazy=True)
+    
+    __table_args__ = (
+        db.UniqueConstraint('need_id', 'item_id', name='uq_need_match_need_item'),
+        db.Index('ix_need_match_user_seen', 'user_id', 'seen'),
+    )
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'need_id': self.need_id,
+            'item': self.item.to_dict() if self.item else None,
+            'score': self.score,
+            'reason': self.reason,
+            'seen': self.seen,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
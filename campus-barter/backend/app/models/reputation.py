@@ -0,0 +1,68 @@
+from app import db
+from datetime import datetime
+
+# Reputation shown for users who have not been rated yet
+DEFAULT_REPUTATION = 5.0
+
+class TradeRating(db.Model):
+    """
+    A rating one party gives the other when a trade is completed
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    trade_id = db.Column(db.Integer, db.ForeignKey('trade.id'), nullable=False)
+    rater_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    ratee_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    score = db.Column(db.Integer, nullable=False)  # 1 to 5
+    comment = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.UniqueConstraint('trade_id', 'rater_id', name='uq_trade_rating_trade_rater'),
+    )
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'trade_id': self.trade_id,
+            'rater_id': self.rater_id,
+            'ratee_id': self.ratee_id,
+            'score': self.score,
+            'comment': self.comment,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class UserStats(db.Model):
+    """
+    Running trade and reputation totals for a user, updated as trades change
+    so profiles never have to aggregate over the trade tables
+    """
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    trades_completed = db.Column(db.Integer, default=0, nullable=False)
+    trades_rejected = db.Column(db.Integer, default=0, nullable=False)
+    rating_count = db.Column(db.Integer, default=0, nullable=False)
+    rating_total = db.Column(db.Integer, default=0, nullable=False)
+    response_count = db.Column(db.Integer, default=0, nullable=False)
+    response_seconds_total = db.Column(db.Float, default=0.0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    @property
+    def reputation(self):
+        if not self.rating_count:
+            return DEFAULT_REPUTATION
+        return round(self.rating_total / self.rating_count, 2)
+    
+    @property
+    def average_response_seconds(self):
+        if not self.response_count:
+            return None
+        return round(self.response_seconds_total / self.response_count, 1)
+    
+    def to_dict(self):
+        return {
+            'user_id': self.user_id,
+            'reputation_score': self.reputation,
+            'rating_count': self.rating_count or 0,
+            'trades_completed': self.trades_completed or 0,
+            'trades_rejected': self.trades_rejected or 0,
+            'average_response_seconds': self.average_response_seconds
+        }
@@ -0,0 +1,10 @@
+from app import db
+from datetime import datetime
+
+class SchemaVersion(db.Model):
+    """
+    Single-row marker recording which schema version create_all last built
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -1,5 +1,6 @@
 from app import db
 from datetime import datetime
+import json
 
 class Trade(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -8,22 +9,40 @@ class Trade(db.Model):
     status = db.Column(db.String(20), default='pending')  # pending, accepted, rejected, completed
     creation_date = db.Column(db.DateTime, default=datetime.utcnow)
     completion_date = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=True)
+    
+    # Negotiation, see app/utils/negotiation.py
+    version = db.Column(db.Integer, default=1, server_default='1', nullable=False)  # Bumped by every transition and counter-offer
+    revision = db.Column(db.Integer, default=0, nullable=True)  # Number of counter-offers made
+    proposer_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)  # Author of the current terms, null for the initiator
     
     # Relationships
     items = db.relationship('TradeItem', backref='trade', lazy=True)
     messages = db.relationship('Message', backref='trade', lazy=True)
+    revisions = db.relationship('TradeRevision', backref='trade', lazy=True, order_by='TradeRevision.number')
     
-    def to_dict(self):
-        return {
+    __table_args__ = (
+        db.Index('ix_trade_initiator_status', 'initiator_id', 'status'),
+        db.Index('ix_trade_recipient_status', 'recipient_id', 'status'),
+    )
+    
+    def to_dict(self, include_messages=True):
+        data = {
             'id': self.id,
             'initiator_id': self.initiator_id,
             'recipient_id': self.recipient_id,
             'status': self.status,
             'creation_date': self.creation_date.isoformat() if self.creation_date else None,
             'completion_date': self.completion_date.isoformat() if self.completion_date else None,
-            'items': [item.to_dict() for item in self.items],
-            'messages': [message.to_dict() for message in self.messages]
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'version': self.version or 1,
+            'revision': self.revision or 0,
+            'proposer_id': self.proposer_id or self.initiator_id,
+            'items': [item.to_dict() for item in self.items]
         }
+        if include_messages:
+            data['messages'] = [message.to_dict() for message in self.messages]
+        return data
 
 class TradeItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -38,3 +57,30 @@ class TradeItem(db.Model):
             'offered_item_id': self.offered_item_id,
             'requested_item_id': self.requested_item_id
         }
+
+class TradeRevision(db.Model):
+    """
+    A counter-offer on a trade. Only the item sets that changed are stored,
+    as the ids added to and removed from each; the current terms are the
+    trade's items
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    trade_id = db.Column(db.Integer, db.ForeignKey('trade.id'), nullable=False)
+    number = db.Column(db.Integer, nullable=False)
+    author_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    changes = db.Column(db.Text, nullable=False)  # JSON: {'offered': {'added': [...], 'removed': [...]}, ...}
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.UniqueConstraint('trade_id', 'number', name='uq_trade_revision_number'),
+    )
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'trade_id': self.trade_id,
+            'number': self.number,
+            'author_id': self.author_id,
+            'changes': json.loads(self.changes),
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
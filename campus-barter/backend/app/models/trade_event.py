@@ -0,0 +1,25 @@
+from app import db
+from datetime import datetime
+import json
+
+class TradeEvent(db.Model):
+    """
+    Outbox row for a trade message or status change, one row per recipient.
+    Every worker's event hub tails this table, so it doubles as the local
+    broker between gunicorn workers.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    trade_id = db.Column(db.Integer, db.ForeignKey('trade.id'), nullable=False)
+    event_type = db.Column(db.String(30), nullable=False)  # message, status, trade
+    payload = db.Column(db.Text, nullable=False)  # JSON encoded
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'trade_id': self.trade_id,
+            'type': self.event_type,
+            'data': json.loads(self.payload),
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
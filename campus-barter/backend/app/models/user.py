@@ -1,11 +1,12 @@
 from app import db
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from app.utils.hashing import get_password_hasher
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
+    campus = db.Column(db.String(100), nullable=True, index=True)  # Derived from the email domain
     password_hash = db.Column(db.String(200), nullable=False)
     profile_picture = db.Column(db.String(200), nullable=True)
     bio = db.Column(db.Text, nullable=True)
@@ -18,16 +19,24 @@ class User(db.Model):
     received_trades = db.relationship('Trade', foreign_keys='Trade.recipient_id', backref='recipient', lazy=True)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = get_password_hasher().hash(password)
         
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        hasher = get_password_hasher()
+        if not hasher.verify(self.password_hash, password):
+            return False
+        
+        # Upgrade hashes made with old parameters while we have the plain password
+        if hasher.needs_rehash(self.password_hash):
+            self.password_hash = hasher.hash(password)
+        return True
     
     def to_dict(self):
         return {
             'id': self.id,
             'name': self.name,
             'email': self.email,
+            'campus': self.campus,
             'profile_picture': self.profile_picture,
             'bio': self.bio,
             'reputation_score': self.reputation_score,
@@ -6,5 +6,10 @@ from app.routes.items import items_bp
 from app.routes.trades import trades_bp
 from app.routes.users import users_bp
 from app.routes.matching import matching_bp
+from app.routes.media import media_bp
+from app.routes.jobs import jobs_bp
+from app.routes.metrics import metrics_bp
+from app.routes.changes import changes_bp
+from app.routes.batch import batch_bp
 
 # Import all routes here to make them available for imports elsewhere
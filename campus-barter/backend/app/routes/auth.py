@@ -1,6 +1,9 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from app.models.user import User
+from app.utils.hashing import HasherBusy
+from app.utils.rate_limit import check_rate_limits
+from app.utils.campus import campus_from_email, campus_claims
 from app import db
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
@@ -12,6 +15,13 @@ def register():
     # Check if required fields are present
     if not all(k in data for k in ('name', 'email', 'password')):
         return jsonify({'error': 'Missing required fields'}), 400
+    if not isinstance(data['email'], str):
+        return jsonify({'error': 'Invalid email'}), 400
+    
+    # Throttle sign-ups per client before doing any hashing
+    throttled = check_rate_limits(('REGISTER_RATE_PER_IP', request.remote_addr))
+    if throttled:
+        return throttled
     
     # Check if user already exists
     if User.query.filter_by(email=data['email']).first():
@@ -20,16 +30,20 @@ def register():
     # Create new user
     new_user = User(
         name=data['name'],
-        email=data['email']
+        email=data['email'],
+        campus=campus_from_email(data['email'])
     )
-    new_user.set_password(data['password'])
+    try:
+        new_user.set_password(data['password'])
+    except HasherBusy:
+        return server_busy()
     
     # Add to database
     db.session.add(new_user)
     db.session.commit()
     
     # Create access token
-    access_token = create_access_token(identity=new_user.id)
+    access_token = create_access_token(identity=new_user.id, additional_claims=campus_claims(new_user))
     
     return jsonify({
         'message': 'User registered successfully',
@@ -44,16 +58,33 @@ def login():
     # Check if required fields are present
     if not all(k in data for k in ('email', 'password')):
         return jsonify({'error': 'Missing email or password'}), 400
+    if not isinstance(data['email'], str):
+        return jsonify({'error': 'Invalid email or password'}), 400
+    
+    # Throttle per client and per account before doing any hashing
+    throttled = check_rate_limits(
+        ('LOGIN_RATE_PER_IP', request.remote_addr),
+        ('LOGIN_RATE_PER_ACCOUNT', data['email'].strip().lower())
+    )
+    if throttled:
+        return throttled
     
     # Find user by email
     user = User.query.filter_by(email=data['email']).first()
     
     # Check if user exists and password is correct
-    if not user or not user.check_password(data['password']):
-        return jsonify({'error': 'Invalid email or password'}), 401
+    try:
+        if not user or not user.check_password(data['password']):
+            return jsonify({'error': 'Invalid email or password'}), 401
+    except HasherBusy:
+        return server_busy()
+    
+    # Persist a hash upgraded during the check
+    if user in db.session.dirty:
+        db.session.commit()
     
     # Create access token
-    access_token = create_access_token(identity=user.id)
+    access_token = create_access_token(identity=user.id, additional_claims=campus_claims(user))
     
     return jsonify({
         'message': 'Login successful',
@@ -74,3 +105,9 @@ def get_current_user():
         return jsonify({'error': 'User not found'}), 404
     
     return jsonify(user.to_dict()), 200
+
+def server_busy():
+    response = jsonify({'error': 'Server is busy, please try again shortly'})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
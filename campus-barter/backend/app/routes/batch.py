@@ -0,0 +1,18 @@
+from flask import Blueprint, request, jsonify, current_app
+from app.utils.batch import parse_batch, run_batch, InvalidBatch
+
+batch_bp = Blueprint('batch', __name__, url_prefix='/api/batch')
+
+@batch_bp.route('', methods=['POST'])
+def batch():
+    """
+    Run several API requests in one round trip, e.g.
+    {"requests": [{"id": "me", "method": "GET", "path": "/api/auth/me"}, ...]}
+    Each sub-request is authenticated with this request's Authorization header
+    """
+    try:
+        sub_requests = parse_batch(request.get_json(silent=True), current_app.config['BATCH_MAX_REQUESTS'])
+    except InvalidBatch as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'responses': run_batch(sub_requests)}), 200
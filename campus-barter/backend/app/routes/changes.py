@@ -0,0 +1,45 @@
+import hmac
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from app.utils.changes import changes_since
+from app.utils.campus import current_campus
+
+changes_bp = Blueprint('changes', __name__, url_prefix='/api/changes')
+
+ENTITIES = ('item', 'trade', 'message')
+
+@changes_bp.route('', methods=['GET'])
+def get_changes():
+    """
+    Get item, trade and message changes after a cursor, oldest first.
+    Signed-in users see their campus's items and their own trades; indexers
+    holding CHANGES_TOKEN as a bearer token see every change
+    """
+    token = current_app.config['CHANGES_TOKEN']
+    supplied = request.headers.get('Authorization', '')
+    if token and hmac.compare_digest(supplied, f'Bearer {token}'):
+        user_id, campus = None, request.args.get('campus')
+    else:
+        verify_jwt_in_request()
+        user_id, campus = get_jwt_identity(), current_campus()
+    
+    # Get since, limit and entity parameters
+    try:
+        since = int(request.args.get('since', 0))
+        limit = min(max(int(request.args.get('limit', 100)), 1), 1000)
+    except ValueError:
+        return jsonify({'error': 'Invalid since or limit parameter'}), 400
+    
+    entities = [entity for entity in request.args.get('entities', '').split(',') if entity]
+    if any(entity not in ENTITIES for entity in entities):
+        return jsonify({'error': f"Invalid entities parameter, expected some of {', '.join(ENTITIES)}"}), 400
+    
+    # The cursor also moves past scanned entries this reader may not see, so
+    # its next poll does not rescan them
+    changes, cursor, has_more = changes_since(since, limit, user_id=user_id, campus=campus, entities=entities)
+    
+    return jsonify({
+        'changes': [change.to_dict() for change in changes],
+        'cursor': str(cursor),
+        'has_more': has_more
+    }), 200
@@ -1,6 +1,14 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.item import Item
+from app.utils.jobs import enqueue
+from app.utils.cycles import notify_item_changed, notify_item_deleted
+from app.utils import candidates
+from app.utils.duplicates import flag_duplicates, release_duplicates
+from app.utils.changes import record_item_change
+from app.utils.campus import current_campus
+from app.utils.includes import parse_include, expand, InvalidInclude
+from app.utils.expiry import listing_expiry, renew_item
 from app import db
 
 items_bp = Blueprint('items', __name__, url_prefix='/api/items')
@@ -11,9 +19,22 @@ def get_items():
     category = request.args.get('category')
     status = request.args.get('status', 'available')
     
+    # Signed-in users see their own campus; anyone may pick one with ?campus=
+    campus = request.args.get('campus') or current_campus()
+    
+    # Related records to embed, e.g. ?include=owner
+    try:
+        include = parse_include(request.args.get('include'), 'item')
+    except InvalidInclude as e:
+        return jsonify({'error': str(e)}), 400
+    
     # Base query
     query = Item.query.filter_by(status=status)
     
+    # Apply campus filter if known
+    if campus:
+        query = query.filter_by(campus=campus)
+    
     # Apply category filter if provided
     if category:
         query = query.filter_by(category=category)
@@ -21,7 +42,7 @@ def get_items():
     # Get items
     items = query.all()
     
-    return jsonify([item.to_dict() for item in items]), 200
+    return jsonify(expand([item.to_dict() for item in items], 'item', include)), 200
 
 @items_bp.route('/<int:item_id>', methods=['GET'])
 def get_item(item_id):
@@ -30,7 +51,13 @@ def get_item(item_id):
     if not item:
         return jsonify({'error': 'Item not found'}), 404
     
-    return jsonify(item.to_dict()), 200
+    # Related records to embed, e.g. ?include=owner
+    try:
+        include = parse_include(request.args.get('include'), 'item')
+    except InvalidInclude as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(expand([item.to_dict()], 'item', include)[0]), 200
 
 @items_bp.route('', methods=['POST'])
 @jwt_required()
@@ -53,16 +80,32 @@ def create_item():
         condition=data.get('condition'),
         images=','.join(data.get('images', [])) if data.get('images') else None,
         tags=','.join(data.get('tags', [])) if data.get('tags') else None,
+        campus=current_campus(),
+        expires_at=listing_expiry(),
         user_id=user_id
     )
     
     # Add to database
     db.session.add(new_item)
+    db.session.flush()
+    
+    # Flag re-posts of an existing listing
+    duplicates = flag_duplicates(new_item)
+    record_item_change(new_item, 'create')
+    
+    # Check standing needs in the background
+    enqueue('needs.match_item', {'item_id': new_item.id}, key=f'needs.match_item:{new_item.id}')
     db.session.commit()
+    notify_item_changed(new_item)
+    candidates.notify_item_changed(new_item)
     
     return jsonify({
         'message': 'Item created successfully',
-        'item': new_item.to_dict()
+        'item': new_item.to_dict(),
+        'duplicates': [
+            {'item_id': duplicate.id, 'similarity': round(score, 2)}
+            for duplicate, score in duplicates
+        ]
     }), 201
 
 @items_bp.route('/<int:item_id>', methods=['PUT'])
@@ -98,16 +141,67 @@ def update_item(item_id):
     if 'tags' in data:
         item.tags = ','.join(data['tags']) if data['tags'] else None
     if 'status' in data:
+        # Relisting starts a new term
+        if data['status'] == 'available' and item.status != 'available':
+            renew_item(item)
         item.status = data['status']
     
+    # Edited text needs a new signature
+    if any(field in data for field in ('title', 'description', 'category')):
+        flag_duplicates(item)
+    
     # Save changes
+    db.session.flush()
+    record_item_change(item, 'update')
     db.session.commit()
+    notify_item_changed(item)
+    candidates.notify_item_changed(item)
     
     return jsonify({
         'message': 'Item updated successfully',
         'item': item.to_dict()
     }), 200
 
+@items_bp.route('/<int:item_id>/renew', methods=['POST'])
+@jwt_required()
+def renew(item_id):
+    """
+    Keep a listing up for another term, or bring back an expired one
+    """
+    # Get user ID from JWT
+    user_id = get_jwt_identity()
+    
+    # Find item
+    item = Item.query.get(item_id)
+    
+    if not item:
+        return jsonify({'error': 'Item not found'}), 404
+    
+    # Check if user owns the item
+    if item.user_id != user_id:
+        return jsonify({'error': 'Not authorized to renew this item'}), 403
+    
+    if item.status not in ('available', 'expired'):
+        return jsonify({'error': f'Cannot renew a {item.status} item'}), 400
+    
+    was_expired = item.status == 'expired'
+    renew_item(item)
+    
+    # A returning listing may answer standing needs again
+    if was_expired:
+        enqueue('needs.match_item', {'item_id': item.id}, key=f'needs.match_item:{item.id}')
+    
+    db.session.flush()
+    record_item_change(item, 'update')
+    db.session.commit()
+    notify_item_changed(item)
+    candidates.notify_item_changed(item)
+    
+    return jsonify({
+        'message': 'Item renewed successfully',
+        'item': item.to_dict()
+    }), 200
+
 @items_bp.route('/<int:item_id>', methods=['DELETE'])
 @jwt_required()
 def delete_item(item_id):
@@ -125,8 +219,13 @@ def delete_item(item_id):
         return jsonify({'error': 'Not authorized to delete this item'}), 403
     
     # Delete item
+    campus = item.campus
+    release_duplicates(item)
+    record_item_change(item, 'delete')
     db.session.delete(item)
     db.session.commit()
+    notify_item_deleted(item_id, campus)
+    candidates.notify_item_deleted(item_id, campus)
     
     return jsonify({
         'message': 'Item deleted successfully'
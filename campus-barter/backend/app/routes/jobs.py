@@ -0,0 +1,22 @@
+from flask import Blueprint, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.models.job import Job
+
+jobs_bp = Blueprint('jobs', __name__, url_prefix='/api/jobs')
+
+@jobs_bp.route('/<int:job_id>', methods=['GET'])
+@jwt_required()
+def get_job(job_id):
+    """
+    Get the status and result of a background job started by the current user
+    """
+    # Get user ID from JWT
+    user_id = get_jwt_identity()
+    
+    # Find job
+    job = Job.query.get(job_id)
+    
+    if not job or job.user_id != user_id:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify(job.to_dict()), 200
@@ -1,12 +1,24 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, g, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.item import Item
 from app.models.user import User
-from app.utils.ai_matching import get_matching_system
+from app.utils.jobs import enqueue
+from app.utils.tasks import enqueue_recommendations
+from app.utils.cycles import get_cycle_engine
+from app.utils.needs import create_need, deactivate_need
+from app.utils.campus import current_campus
+from app.utils.rate_limit import check_rate_limits, charge_remote_calls_to, too_many_requests, RemoteBudgetExceeded
+from app.models.need import StandingNeed, NeedMatch
 from app import db
 
+# app.utils.ai_matching is imported inside the handlers so the matching stack
+# loads on the first matching request instead of at startup
 matching_bp = Blueprint('matching', __name__)
 
+@matching_bp.errorhandler(RemoteBudgetExceeded)
+def remote_budget_exceeded(e):
+    return too_many_requests(e.retry_after)
+
 @matching_bp.route('/recommendations', methods=['GET'])
 @jwt_required()
 def get_recommendations():
@@ -15,6 +27,15 @@ def get_recommendations():
     """
     current_user_id = get_jwt_identity()
     
+    # Keep one user from monopolising the matching workers and remote calls
+    throttled = check_rate_limits(
+        ('MATCHING_RATE_PER_USER', current_user_id),
+        ('RECOMMENDATIONS_RATE_PER_USER', current_user_id)
+    )
+    if throttled:
+        return throttled
+    charge_remote_calls_to(current_user_id)
+    
     # Get optional item_id parameter
     item_id = request.args.get('item_id', None)
     if item_id:
@@ -30,7 +51,14 @@ def get_recommendations():
     except ValueError:
         limit = 10
     
+    # Hand the work to the job queue if the client will poll for it
+    if wants_async():
+        job = enqueue_recommendations(current_user_id, item_id, limit)
+        db.session.commit()
+        return jsonify({'job': job.to_dict()}), 202
+    
     # Get the appropriate matching system
+    from app.utils.ai_matching import get_matching_system
     matching_system = get_matching_system()
     
     # Get recommendations
@@ -40,7 +68,7 @@ def get_recommendations():
         limit=limit
     )
     
-    return jsonify(recommendations), 200
+    return matching_response(recommendations)
 
 @matching_bp.route('/instant-matches', methods=['POST'])
 @jwt_required()
@@ -50,6 +78,15 @@ def find_instant_matches():
     """
     current_user_id = get_jwt_identity()
     
+    # Keep one user from monopolising the matching workers and remote calls
+    throttled = check_rate_limits(
+        ('MATCHING_RATE_PER_USER', current_user_id),
+        ('INSTANT_MATCHES_RATE_PER_USER', current_user_id)
+    )
+    if throttled:
+        return throttled
+    charge_remote_calls_to(current_user_id)
+    
     # Get request data
     data = request.get_json()
     
@@ -66,15 +103,107 @@ def find_instant_matches():
         limit = 10
     
     # Get the appropriate matching system
+    from app.utils.ai_matching import get_matching_system
     matching_system = get_matching_system()
     
     # Find matches
     matches = matching_system.find_instant_matches(
         need_description=need_description,
-        limit=limit
+        limit=limit,
+        campus=current_campus()
     )
     
-    return jsonify(matches), 200
+    return matching_response(matches)
+
+@matching_bp.route('/instant-needs', methods=['POST'])
+@jwt_required()
+def create_standing_need():
+    """
+    Save an instant need so new listings are matched against it as they arrive
+    """
+    current_user_id = get_jwt_identity()
+    
+    # Get request data
+    data = request.get_json()
+    
+    if not data or not data.get('description'):
+        return jsonify({'error': 'Need description is required'}), 400
+    
+    need = create_need(current_user_id, data['description'], current_campus())
+    if not need.keywords:
+        db.session.rollback()
+        return jsonify({'error': 'Need description has no usable keywords'}), 400
+    
+    # Match the listings that already exist once, in the background
+    db.session.flush()
+    enqueue('needs.backfill', {'need_id': need.id}, key=f'needs.backfill:{need.id}', user_id=current_user_id)
+    db.session.commit()
+    
+    return jsonify({
+        'message': 'Need saved successfully',
+        'need': need.to_dict()
+    }), 201
+
+@matching_bp.route('/instant-needs', methods=['GET'])
+@jwt_required()
+def get_standing_needs():
+    """
+    Get the current user's active standing needs with their unseen match counts
+    """
+    current_user_id = get_jwt_identity()
+    
+    needs = StandingNeed.query.filter_by(user_id=current_user_id, active=True).all()
+    
+    # Count unseen matches per need in one query
+    counts = dict(
+        db.session.query(NeedMatch.need_id, db.func.count(NeedMatch.id))
+        .filter_by(user_id=current_user_id, seen=False)
+        .group_by(NeedMatch.need_id)
+        .all()
+    )
+    
+    return jsonify([dict(need.to_dict(), unseen_matches=counts.get(need.id, 0)) for need in needs]), 200
+
+@matching_bp.route('/instant-needs/<int:need_id>', methods=['DELETE'])
+@jwt_required()
+def delete_standing_need(need_id):
+    """
+    Stop matching a standing need
+    """
+    current_user_id = get_jwt_identity()
+    
+    need = StandingNeed.query.get(need_id)
+    
+    if not need or need.user_id != current_user_id:
+        return jsonify({'error': 'Need not found'}), 404
+    
+    deactivate_need(need)
+    db.session.commit()
+    
+    return jsonify({'message': 'Need removed successfully'}), 200
+
+@matching_bp.route('/instant-needs/matches', methods=['GET'])
+@jwt_required()
+def get_standing_need_matches():
+    """
+    Get listings matched to the current user's standing needs.
+    Unseen matches only by default; they are marked seen once returned
+    """
+    current_user_id = get_jwt_identity()
+    
+    query = NeedMatch.query.filter_by(user_id=current_user_id)
+    if request.args.get('all', '').lower() not in ('1', 'true'):
+        query = query.filter_by(seen=False)
+    
+    matches = query.order_by(NeedMatch.score.desc()).all()
+    results = [match.to_dict() for match in matches if match.item]
+    
+    # Mark as seen so the next poll only returns new matches
+    for match in matches:
+        match.seen = True
+    db.session.commit()
+    
+    return jsonify(results), 200
 
 @matching_bp.route('/item-analysis/<int:item_id>', methods=['GET'])
 @jwt_required()
@@ -84,6 +213,15 @@ def get_item_analysis(item_id):
     """
     current_user_id = get_jwt_identity()
     
+    # Keep one user from monopolising the matching workers and remote calls
+    throttled = check_rate_limits(
+        ('MATCHING_RATE_PER_USER', current_user_id),
+        ('ITEM_ANALYSIS_RATE_PER_USER', current_user_id)
+    )
+    if throttled:
+        return throttled
+    charge_remote_calls_to(current_user_id)
+    
     # Get the item
     item = Item.query.get(item_id)
     
@@ -94,7 +232,19 @@ def get_item_analysis(item_id):
     if item.user_id != current_user_id:
         return jsonify({'error': 'You do not have permission to analyze this item'}), 403
     
+    # Hand the work to the job queue if the client will poll for it
+    if wants_async():
+        job = enqueue(
+            'matching.item_analysis',
+            {'item_id': item_id},
+            key=f'matching.item_analysis:{item_id}',
+            user_id=current_user_id
+        )
+        db.session.commit()
+        return jsonify({'job': job.to_dict()}), 202
+    
     # Get the appropriate matching system
+    from app.utils.ai_matching import get_matching_system
     matching_system = get_matching_system()
     
     # Get analysis
@@ -103,3 +253,68 @@ def get_item_analysis(item_id):
         return jsonify({'analysis': analysis}), 200
     else:
         return jsonify({'error': 'AI analysis not available'}), 400
+
+@matching_bp.route('/cycle-suggestions', methods=['GET'])
+@jwt_required()
+def get_cycle_suggestions():
+    """
+    Suggest multi-party trade cycles (A gets B's item, B gets C's, C gets A's)
+    that include the current user
+    """
+    current_user_id = get_jwt_identity()
+    
+    # Get max_length and limit parameters
+    try:
+        max_length = min(max(int(request.args.get('max_length', 4)), 2), 4)
+        limit = int(request.args.get('limit', 10))
+    except ValueError:
+        return jsonify({'error': 'Invalid max_length or limit parameter'}), 400
+    if limit < 0:
+        return jsonify({'error': 'limit cannot be negative'}), 400
+    
+    engine = get_cycle_engine(current_campus())
+    cycles, complete = engine.find_cycles(
+        current_user_id,
+        max_length=max_length,
+        limit=limit,
+        time_budget=current_app.config['CYCLE_TIME_BUDGET_MS'] / 1000
+    )
+    
+    # Load every item in the suggested cycles with one query
+    item_ids = {item_id for cycle in cycles for _, _, item_id in cycle['steps']}
+    items = {item.id: item for item in Item.query.filter(Item.id.in_(item_ids)).all()} if item_ids else {}
+    
+    suggestions = []
+    for cycle in cycles:
+        # Skip cycles that went stale since the index was built
+        if any(items.get(item_id) is None or items[item_id].status != 'available' for _, _, item_id in cycle['steps']):
+            continue
+        
+        suggestions.append({
+            'participants': cycle['participants'],
+            'score': round(cycle['score'], 4),
+            'steps': [
+                {'receiver_id': receiver, 'giver_id': giver, 'item': items[item_id].to_dict()}
+                for receiver, giver, item_id in cycle['steps']
+            ]
+        })
+    
+    response = jsonify(suggestions)
+    if not complete:
+        response.headers['X-Matching-Partial'] = 'true'
+    return response, 200
+
+def matching_response(results):
+    """
+    Return matching results, flagging them when the deadline cut remote calls short
+    """
+    response = jsonify(results)
+    if g.get('matching_partial'):
+        response.headers['X-Matching-Partial'] = 'true'
+    return response, 200
+
+def wants_async():
+    """
+    Check whether the client asked for the work to run as a background job
+    """
+    return request.args.get('async', '').lower() in ('1', 'true')
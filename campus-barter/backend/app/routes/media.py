@@ -0,0 +1,103 @@
+import os
+from flask import Blueprint, request, jsonify, send_file
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy.exc import IntegrityError
+from app.models.media import MediaFile
+from app.utils.media import get_media_store, InvalidImage, ALLOWED_FORMATS, VARIANTS
+from app.utils.jobs import enqueue
+from app import db
+
+media_bp = Blueprint('media', __name__, url_prefix='/api/media')
+
+# Files are addressed by content hash and never change, so they can be cached forever
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+
+@media_bp.route('', methods=['POST'])
+@jwt_required()
+def upload_image():
+    """
+    Upload an image and return its content-addressed URLs.
+    Thumbnail and WebP variants are generated in the background
+    """
+    # Get user ID from JWT
+    user_id = get_jwt_identity()
+
+    upload = request.files.get('file')
+    if not upload:
+        return jsonify({'error': 'No file uploaded'}), 400
+
+    data = upload.read()
+    if not data:
+        return jsonify({'error': 'Uploaded file is empty'}), 400
+
+    store = get_media_store()
+
+    # Check the file really is an image we accept
+    try:
+        image_format, width, height = store.inspect(data)
+    except InvalidImage as e:
+        return jsonify({'error': str(e)}), 400
+
+    extension, content_type = ALLOWED_FORMATS[image_format]
+    digest, created = store.save(data, extension)
+
+    # Identical uploads share one file and one record
+    media = MediaFile.query.get(digest)
+    if not media:
+        media = MediaFile(
+            hash=digest,
+            content_type=content_type,
+            extension=extension,
+            size=len(data),
+            width=width,
+            height=height,
+            uploader_id=user_id
+        )
+        db.session.add(media)
+        try:
+            db.session.flush()
+        except IntegrityError:
+            # A concurrent identical upload recorded it first
+            db.session.rollback()
+            media = MediaFile.query.get(digest)
+        else:
+            # Build the thumbnail and WebP variants in the background
+            enqueue('media.variants', {'hash': digest}, key=f'media.variants:{digest}')
+            db.session.commit()
+
+    return jsonify({
+        'message': 'Image uploaded successfully',
+        'media': media.to_dict()
+    }), 201 if created else 200
+
+@media_bp.route('/<string:digest>', methods=['GET'])
+@media_bp.route('/<string:digest>/<string:variant>', methods=['GET'])
+def get_image(digest, variant=None):
+    """
+    Serve an image or one of its variants with caching and range support
+    """
+    if variant is not None and variant not in VARIANTS:
+        return jsonify({'error': 'Unknown image variant'}), 404
+
+    media = MediaFile.query.get(digest)
+
+    if not media:
+        return jsonify({'error': 'Image not found'}), 404
+
+    store = get_media_store()
+    path = store.path(digest, media.extension)
+    mimetype = media.content_type
+    cache_control = IMMUTABLE_CACHE
+
+    if variant:
+        variant_path = store.variant_path(digest, variant)
+        if os.path.exists(variant_path):
+            path = variant_path
+            mimetype = 'image/webp'
+        else:
+            # Serve the original until the variant is ready, but don't let it stick in caches
+            cache_control = 'public, max-age=60'
+
+    response = send_file(path, mimetype=mimetype, conditional=True, etag=f'{digest}-{variant or "original"}')
+    response.headers['Cache-Control'] = cache_control
+    return response
@@ -0,0 +1,19 @@
+import hmac
+from flask import Blueprint, Response, request, jsonify, current_app
+from app.utils.metrics import REGISTRY
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Expose this process's metrics in the Prometheus text format.
+    When METRICS_TOKEN is set, scrapers must send it as a bearer token
+    """
+    token = current_app.config['METRICS_TOKEN']
+    if token:
+        supplied = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(supplied, f'Bearer {token}'):
+            return jsonify({'error': 'Not authorized to read metrics'}), 401
+    
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
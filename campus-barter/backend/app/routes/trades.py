@@ -1,13 +1,42 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models.trade import Trade, TradeItem
+from sqlalchemy.orm import selectinload
+from app.models.trade import Trade, TradeItem, TradeRevision
+from app.models.archive import TradeArchive
 from app.models.item import Item
 from app.models.message import Message
+from app.models.user import User
+from app.utils.events import publish_trade_event, notify_event_hub, get_event_hub, stream_events
+from app.utils.reputation import record_status_change, record_rating, InvalidRating
+from app.utils.campus import current_campus
+from app.utils.changes import record_trade_change, record_message_change
+from app.utils.includes import parse_include, expand, InvalidInclude
+from app.utils.negotiation import transition, counter_offer, proposer_id, InvalidTransition, TradeConflict
+from app.utils.archive import ARCHIVED_STATUSES, get_archived_trade, archived_trades_for_user
+from app.utils.inbox import get_trade_summary, record_pending_change, record_message, mark_trade_read
 from app import db
 from datetime import datetime
 
 trades_bp = Blueprint('trades', __name__, url_prefix='/api/trades')
 
+def expected_version(data):
+    """
+    The trade version a client read before changing it, if it sent one.
+    Raises ValueError if it is not an integer
+    """
+    version = data.get('version')
+    if version is not None and (isinstance(version, bool) or not isinstance(version, int)):
+        raise ValueError('Version must be an integer')
+    return version
+
+def conflict_response(trade_id, e):
+    """
+    Answer a lost race with the trade as it is now, so the client can retry
+    """
+    db.session.rollback()
+    trade = db.session.get(Trade, trade_id)
+    return jsonify({'error': str(e), 'trade': trade.to_dict() if trade else None}), 409
+
 @trades_bp.route('', methods=['GET'])
 @jwt_required()
 def get_trades():
@@ -17,6 +46,12 @@ def get_trades():
     # Get query parameters
     status = request.args.get('status')
     
+    # Related records to embed, e.g. ?include=items.offered_item,initiator
+    try:
+        include = parse_include(request.args.get('include'), 'trade')
+    except InvalidInclude as e:
+        return jsonify({'error': str(e)}), 400
+    
     # Base query - get trades where user is either initiator or recipient
     query = Trade.query.filter(
         (Trade.initiator_id == user_id) | (Trade.recipient_id == user_id)
@@ -26,10 +61,55 @@ def get_trades():
     if status:
         query = query.filter_by(status=status)
     
-    # Get trades
-    trades = query.all()
+    # Get trades, loading their items and messages for the whole page at once
+    trades = query.options(selectinload(Trade.items), selectinload(Trade.messages)).all()
+    results = [trade.to_dict() for trade in trades]
+    
+    # Archived trades are cold history, listed only on request, e.g. ?archived=1
+    wants_archived = request.args.get('archived', '').lower() in ('1', 'true')
+    if wants_archived and (not status or status in ARCHIVED_STATUSES):
+        results.extend(archived.to_dict() for archived in archived_trades_for_user(user_id, status))
+    
+    return jsonify(expand(results, 'trade', include)), 200
+
+@trades_bp.route('/events', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def trade_events():
+    """
+    Stream new messages and status changes for the current user's trades.
+    EventSource cannot set headers, so the token may also be passed as ?jwt=
+    """
+    # Get user ID from JWT
+    user_id = get_jwt_identity()
+    
+    # Resume from the last event the client saw, if any
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    if last_event_id is not None:
+        try:
+            last_event_id = int(last_event_id)
+        except ValueError:
+            return jsonify({'error': 'Invalid last event id'}), 400
+    
+    hub = get_event_hub()
+    subscription = hub.subscribe(user_id)
+    
+    return Response(
+        stream_events(hub, subscription, last_event_id, current_app.config['EVENT_HEARTBEAT_INTERVAL']),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@trades_bp.route('/summary', methods=['GET'])
+@jwt_required()
+def get_summary():
+    """
+    Unread message and pending trade counts for the current user's badges
+    """
+    # Get user ID from JWT
+    user_id = get_jwt_identity()
     
-    return jsonify([trade.to_dict() for trade in trades]), 200
+    # One row, kept current as trades and messages change
+    return jsonify(get_trade_summary(user_id).to_dict()), 200
 
 @trades_bp.route('/<int:trade_id>', methods=['GET'])
 @jwt_required()
@@ -37,8 +117,8 @@ def get_trade(trade_id):
     # Get user ID from JWT
     user_id = get_jwt_identity()
     
-    # Find trade
-    trade = Trade.query.get(trade_id)
+    # Find trade, falling back to the archive for old finished ones
+    trade = Trade.query.get(trade_id) or get_archived_trade(trade_id)
     
     if not trade:
         return jsonify({'error': 'Trade not found'}), 404
@@ -47,7 +127,13 @@ def get_trade(trade_id):
     if trade.initiator_id != user_id and trade.recipient_id != user_id:
         return jsonify({'error': 'Not authorized to view this trade'}), 403
     
-    return jsonify(trade.to_dict()), 200
+    # Related records to embed, e.g. ?include=items.offered_item,initiator
+    try:
+        include = parse_include(request.args.get('include'), 'trade')
+    except InvalidInclude as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(expand([trade.to_dict()], 'trade', include)[0]), 200
 
 @trades_bp.route('', methods=['POST'])
 @jwt_required()
@@ -62,6 +148,13 @@ def create_trade():
     if not all(k in data for k in ('recipient_id', 'offered_items', 'requested_items')):
         return jsonify({'error': 'Missing required fields'}), 400
     
+    # Trades only happen within a campus
+    recipient = User.query.get(data['recipient_id'])
+    if not recipient:
+        return jsonify({'error': 'Recipient not found'}), 400
+    if recipient.campus != current_campus():
+        return jsonify({'error': 'You can only trade with users on your campus'}), 400
+    
     # Create new trade
     new_trade = Trade(
         initiator_id=user_id,
@@ -103,6 +196,7 @@ def create_trade():
         db.session.add(trade_item)
     
     # Add initial message if provided
+    message = None
     if 'message' in data and data['message']:
         message = Message(
             trade_id=new_trade.id,
@@ -111,8 +205,25 @@ def create_trade():
         )
         db.session.add(message)
     
+    # Log the new trade for change feed readers
+    db.session.flush()
+    record_trade_change(new_trade, 'create')
+    record_pending_change(new_trade)
+    if message:
+        record_message_change(message, new_trade)
+        record_message(message, new_trade)
+    
+    # Notify both parties about the new trade
+    publish_trade_event(new_trade, 'trade', {
+        'trade_id': new_trade.id,
+        'initiator_id': new_trade.initiator_id,
+        'recipient_id': new_trade.recipient_id,
+        'status': new_trade.status
+    })
+    
     # Commit changes
     db.session.commit()
+    notify_event_hub()
     
     return jsonify({
         'message': 'Trade created successfully',
@@ -139,36 +250,148 @@ def update_trade_status(trade_id):
     
     new_status = data['status']
     
-    # Validate status transition
+    # Validate status
     valid_statuses = ['pending', 'accepted', 'rejected', 'completed']
     if new_status not in valid_statuses:
         return jsonify({'error': 'Invalid status'}), 400
     
-    # Check authorization based on status change
-    if new_status == 'accepted' or new_status == 'rejected':
-        # Only recipient can accept or reject
-        if trade.recipient_id != user_id:
-            return jsonify({'error': 'Not authorized to update this trade'}), 403
-    elif new_status == 'completed':
-        # Either party can mark as completed
-        if trade.initiator_id != user_id and trade.recipient_id != user_id:
-            return jsonify({'error': 'Not authorized to update this trade'}), 403
+    try:
+        version = expected_version(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Apply the transition only if nobody changed the trade since it was read
+    now = datetime.utcnow()
+    try:
+        previous_status = transition(trade, user_id, new_status, version, now)
+    except InvalidTransition as e:
+        return jsonify({'error': str(e)}), e.status_code
+    except TradeConflict as e:
+        return conflict_response(trade_id, e)
+    
+    # Keep both parties' trade stats and pending counts current
+    record_status_change(trade, previous_status, now)
+    record_pending_change(trade, previous_status, trade.proposer_id)
+    
+    # Completing a trade may include a rating of the other party
+    if data.get('rating') is not None:
+        try:
+            record_rating(trade, user_id, data['rating'], data.get('comment'))
+        except InvalidRating as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 400
     
-    # Update status
-    trade.status = new_status
+    # Log the change for change feed readers
+    db.session.flush()
+    record_trade_change(trade, 'update')
     
-    # Set completion date if completed
-    if new_status == 'completed':
-        trade.completion_date = datetime.utcnow()
+    # Notify both parties about the transition
+    if new_status != previous_status:
+        publish_trade_event(trade, 'status', {
+            'trade_id': trade.id,
+            'status': new_status,
+            'previous_status': previous_status,
+            'changed_by': user_id
+        })
     
     # Save changes
     db.session.commit()
+    notify_event_hub()
     
     return jsonify({
         'message': 'Trade status updated successfully',
         'trade': trade.to_dict()
     }), 200
 
+@trades_bp.route('/<int:trade_id>/counter', methods=['POST'])
+@jwt_required()
+def create_counter_offer(trade_id):
+    """
+    Answer a pending trade with different items; the other party then
+    accepts, rejects or counters in turn
+    """
+    # Get user ID from JWT
+    user_id = get_jwt_identity()
+    
+    # Find trade
+    trade = Trade.query.get(trade_id)
+    
+    if not trade:
+        return jsonify({'error': 'Trade not found'}), 404
+    
+    # Get request data
+    data = request.get_json()
+    
+    if not all(k in data for k in ('offered_items', 'requested_items')):
+        return jsonify({'error': 'Missing required fields'}), 400
+    
+    try:
+        version = expected_version(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # The counter-offer hands the trade to the other party
+    previous_proposer_id = proposer_id(trade)
+    try:
+        revision = counter_offer(trade, user_id, data['offered_items'], data['requested_items'], version)
+    except InvalidTransition as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), e.status_code
+    except TradeConflict as e:
+        return conflict_response(trade_id, e)
+    
+    # Add a message explaining the counter-offer if provided
+    message = None
+    if data.get('message'):
+        message = Message(trade_id=trade_id, sender_id=user_id, content=data['message'])
+        db.session.add(message)
+    
+    # Log the change and notify both parties
+    db.session.flush()
+    record_trade_change(trade, 'update')
+    record_pending_change(trade, 'pending', previous_proposer_id)
+    if message:
+        record_message_change(message, trade)
+        record_message(message, trade)
+    publish_trade_event(trade, 'counter', {
+        'trade_id': trade.id,
+        'revision': revision.number,
+        'author_id': user_id,
+        'version': trade.version
+    })
+    
+    db.session.commit()
+    notify_event_hub()
+    
+    return jsonify({
+        'message': 'Counter-offer sent successfully',
+        'trade': trade.to_dict(),
+        'revision': revision.to_dict()
+    }), 201
+
+@trades_bp.route('/<int:trade_id>/revisions', methods=['GET'])
+@jwt_required()
+def get_trade_revisions(trade_id):
+    # Get user ID from JWT
+    user_id = get_jwt_identity()
+    
+    # Find trade, falling back to the archive for old finished ones
+    trade = Trade.query.get(trade_id) or get_archived_trade(trade_id)
+    
+    if not trade:
+        return jsonify({'error': 'Trade not found'}), 404
+    
+    # Check if user is part of the trade
+    if trade.initiator_id != user_id and trade.recipient_id != user_id:
+        return jsonify({'error': 'Not authorized to view this trade'}), 403
+    
+    # Archived trades keep their revisions in the snapshot
+    if isinstance(trade, TradeArchive):
+        return jsonify(trade.data['revisions']), 200
+    
+    revisions = TradeRevision.query.filter_by(trade_id=trade_id).order_by(TradeRevision.number).all()
+    return jsonify([revision.to_dict() for revision in revisions]), 200
+
 @trades_bp.route('/<int:trade_id>/messages', methods=['POST'])
 @jwt_required()
 def add_message(trade_id):
@@ -200,9 +423,44 @@ def add_message(trade_id):
     
     # Add to database
     db.session.add(new_message)
+    db.session.flush()
+    
+    # Push the message to both parties and log it
+    publish_trade_event(trade, 'message', new_message.to_dict())
+    record_message_change(new_message, trade)
+    record_message(new_message, trade)
+    
     db.session.commit()
+    notify_event_hub()
     
     return jsonify({
         'message': 'Message sent successfully',
         'trade_message': new_message.to_dict()
     }), 201
+
+@trades_bp.route('/<int:trade_id>/read', methods=['POST'])
+@jwt_required()
+def mark_read(trade_id):
+    """
+    Mark a trade's messages read for the current user
+    """
+    # Get user ID from JWT
+    user_id = get_jwt_identity()
+    
+    # Find trade
+    trade = Trade.query.get(trade_id)
+    
+    if not trade:
+        return jsonify({'error': 'Trade not found'}), 404
+    
+    # Check if user is part of the trade
+    if trade.initiator_id != user_id and trade.recipient_id != user_id:
+        return jsonify({'error': 'Not authorized to view this trade'}), 403
+    
+    marker = mark_trade_read(trade, user_id)
+    db.session.commit()
+    
+    return jsonify({
+        'marker': marker.to_dict(),
+        'summary': get_trade_summary(user_id).to_dict()
+    }), 200
@@ -2,6 +2,12 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.user import User
 from app.models.item import Item
+from app.models.trade import Trade
+from app.models.reputation import TradeRating
+from app.models.archive import TradeArchive
+from app.utils.reputation import get_user_stats
+from app.utils.archive import archived_trades_for_user
+from app.utils.includes import parse_include, expand, InvalidInclude
 from app import db
 
 users_bp = Blueprint('users', __name__, url_prefix='/api/users')
@@ -13,7 +19,16 @@ def get_user(user_id):
     if not user:
         return jsonify({'error': 'User not found'}), 404
     
-    return jsonify(user.to_dict()), 200
+    # Related records to embed, e.g. ?include=items
+    try:
+        include = parse_include(request.args.get('include'), 'user')
+    except InvalidInclude as e:
+        return jsonify({'error': str(e)}), 400
+    
+    profile = expand([user.to_dict()], 'user', include)[0]
+    profile['stats'] = get_user_stats(user_id).to_dict()
+    
+    return jsonify(profile), 200
 
 @users_bp.route('/<int:user_id>', methods=['PUT'])
 @jwt_required()
@@ -61,6 +76,12 @@ def get_user_items(user_id):
     # Get query parameters
     status = request.args.get('status')
     
+    # Related records to embed, e.g. ?include=original
+    try:
+        include = parse_include(request.args.get('include'), 'item')
+    except InvalidInclude as e:
+        return jsonify({'error': str(e)}), 400
+    
     # Base query
     query = Item.query.filter_by(user_id=user_id)
     
@@ -71,4 +92,79 @@ def get_user_items(user_id):
     # Get items
     items = query.all()
     
-    return jsonify([item.to_dict() for item in items]), 200
+    return jsonify(expand([item.to_dict() for item in items], 'item', include)), 200
+
+@users_bp.route('/<int:user_id>/trades', methods=['GET'])
+def get_user_trade_history(user_id):
+    """
+    Get a user's trade stats and a page of their completed trades
+    with the rating they received for each
+    """
+    # Find user
+    user = User.query.get(user_id)
+    
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    
+    # Get query parameters
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+    
+    query = Trade.query.filter(
+        ((Trade.initiator_id == user_id) | (Trade.recipient_id == user_id)) &
+        (Trade.status == 'completed')
+    )
+    offset = (page - 1) * per_page
+    trades = (
+        query
+        .order_by(Trade.completion_date.desc(), Trade.id.desc())
+        .offset(offset)
+        .limit(per_page)
+        .all()
+    )
+    
+    # Ratings for the whole page in one query
+    ratings = {}
+    if trades:
+        ratings = {
+            rating.trade_id: rating.to_dict()
+            for rating in TradeRating.query.filter(
+                TradeRating.trade_id.in_([trade.id for trade in trades]),
+                TradeRating.ratee_id == user_id
+            )
+        }
+    
+    # Archived trades ended before any still in the hot tables, so they
+    # continue the page once those run out
+    if len(trades) < per_page:
+        archived = (
+            archived_trades_for_user(user_id, 'completed')
+            .order_by(TradeArchive.completion_date.desc(), TradeArchive.trade_id.desc())
+            .offset(max(offset - query.count(), 0))
+            .limit(per_page - len(trades))
+            .all()
+        )
+        for trade in archived:
+            for rating in trade.data['ratings']:
+                if rating['ratee_id'] == user_id:
+                    ratings[trade.id] = rating
+        trades.extend(archived)
+    
+    history = []
+    for trade in trades:
+        rating = ratings.get(trade.id)
+        history.append({
+            'trade_id': trade.id,
+            'partner_id': trade.recipient_id if trade.initiator_id == user_id else trade.initiator_id,
+            'role': 'initiator' if trade.initiator_id == user_id else 'recipient',
+            'creation_date': trade.creation_date.isoformat() if trade.creation_date else None,
+            'completion_date': trade.completion_date.isoformat() if trade.completion_date else None,
+            'rating': rating
+        })
+    
+    return jsonify({
+        'stats': get_user_stats(user_id).to_dict(),
+        'trades': history,
+        'page': page,
+        'per_page': per_page
+    }), 200
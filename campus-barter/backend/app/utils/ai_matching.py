@@ -4,49 +4,194 @@ This module implements the AI-powered matching algorithm for trade recommendatio
 """
 
 import os
+import re
 import json
-import openai
-from dotenv import load_dotenv
+import time
+import hashlib
+import math
+from concurrent.futures import ThreadPoolExecutor, wait
+from flask import current_app, g
 from app.models.item import Item
+from app.utils.metrics import track_remote_call, record_cache, REMOTE_ERRORS
+from app.utils.rate_limit import spend_remote_budget, RemoteBudgetExceeded
+from app.utils.embedding_store import get_embedding_store, fingerprint, schedule_compaction
+from app.utils.duplicates import collapse_duplicates
 from app.models.user import User
 from app import db
 
-# Load environment variables
-load_dotenv()
+# openai and dotenv are loaded on first use to keep them out of app startup
+_openai = None
+_env_loaded = False
 
-# Set OpenAI API key
-openai.api_key = os.getenv('OPENAI_API_KEY')
+def load_environment():
+    """
+    Load environment variables from .env once
+    """
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+
+def get_openai():
+    """
+    Import and configure the OpenAI client on first use
+    """
+    global _openai
+    if _openai is None:
+        import openai
+        load_environment()
+        
+        # Set OpenAI API key
+        openai.api_key = os.getenv('OPENAI_API_KEY')
+        _openai = openai
+    return _openai
+
+# Remote embedding calls are fanned out over one bounded pool per process
+_embedding_executor = None
+
+def get_embedding_executor():
+    """
+    Get the shared thread pool used for concurrent embedding requests, sized
+    by the MATCHING_MAX_CONCURRENCY of the app that first uses it
+    """
+    global _embedding_executor
+    if _embedding_executor is None:
+        _embedding_executor = ThreadPoolExecutor(
+            max_workers=current_app.config['MATCHING_MAX_CONCURRENCY'],
+            thread_name_prefix='embeddings'
+        )
+    return _embedding_executor
+
+# name -> matching system class, see matching_engine()
+ENGINES = {}
+
+def matching_engine(name):
+    """
+    Register a matching system class under a name so MATCHING_ENGINE and the
+    matching benchmarks can select it
+    """
+    def decorator(cls):
+        ENGINES[name] = cls
+        cls.engine_name = name
+        return cls
+    return decorator
+
+def fake_embedding(text, dimensions=256):
+    """
+    Deterministic offline stand-in for OpenAI embeddings: each word is hashed
+    into a signed bucket, so texts sharing words get similar unit vectors.
+    Used when MATCHING_EMBEDDINGS=fake, e.g. by the matching benchmarks
+    """
+    vector = [0.0] * dimensions
+    for word in re.findall(r'[a-z0-9]+', text.lower()):
+        digest = hashlib.blake2b(word.encode(), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], 'little') % dimensions
+        vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+    length = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / length for value in vector]
 
+def use_fake_embeddings():
+    return os.getenv('MATCHING_EMBEDDINGS', 'openai') == 'fake'
+
+def matching_deadline():
+    """
+    Get the monotonic time by which a matching request must finish
+    """
+    return time.monotonic() + current_app.config['MATCHING_DEADLINE_SECONDS']
+
+@matching_engine('openai')
 class AIMatchingSystem:
     """
     AI-powered matching system for Campus Barter
     Uses OpenAI API to generate trade recommendations and instant needs matching
     """
     
+    @staticmethod
+    def get_item_text(item):
+        """
+        Combine item attributes into a single text for embedding
+        """
+        item_text = f"Title: {item.title}\nDescription: {item.description}\nCategory: {item.category}"
+        if item.condition:
+            item_text += f"\nCondition: {item.condition}"
+        if item.tags:
+            item_text += f"\nTags: {item.tags}"
+        return item_text
+    
     @staticmethod
     def get_item_embedding(item):
         """
         Generate an embedding for an item using OpenAI's API
         """
-        try:
-            # Combine item attributes into a single text
-            item_text = f"Title: {item.title}\nDescription: {item.description}\nCategory: {item.category}"
-            if item.condition:
-                item_text += f"\nCondition: {item.condition}"
-            if item.tags:
-                item_text += f"\nTags: {item.tags}"
-            
-            # Get embedding from OpenAI
-            response = openai.Embedding.create(
-                model="text-embedding-ada-002",
-                input=item_text
-            )
-            
-            # Return the embedding
-            return response['data'][0]['embedding']
-        except Exception as e:
-            print(f"Error generating embedding: {str(e)}")
-            return None
+        return AIMatchingSystem.get_text_embedding(AIMatchingSystem.get_item_text(item))
+    
+    @staticmethod
+    def get_embeddings(texts, deadline):
+        """
+        Fetch embeddings for a dict of key -> text concurrently.
+        Returns key -> embedding for every call that finished before the
+        deadline; slower or failed calls are left out, as are calls beyond
+        the current user's remote budget
+        """
+        if not use_fake_embeddings():
+            get_openai()
+            
+            # Fetch only what the budget covers, in the order given
+            granted = spend_remote_budget('embedding', len(texts))
+            if granted < len(texts):
+                g.matching_partial = True
+                texts = dict(list(texts.items())[:granted])
+        executor = get_embedding_executor()
+        timeout = max(0, deadline - time.monotonic())
+        futures = {
+            executor.submit(AIMatchingSystem.get_text_embedding, text, timeout): key
+            for key, text in texts.items()
+        }
+        
+        done, not_done = wait(futures, timeout=timeout)
+        
+        # Give up on anything still queued or running, we return best-so-far
+        for future in not_done:
+            future.cancel()
+        if not_done:
+            g.matching_partial = True
+            REMOTE_ERRORS.inc('openai', 'embedding_deadline', amount=len(not_done))
+            print(f"Warning: {len(not_done)} of {len(futures)} embeddings missed the matching deadline")
+        
+        embeddings = {}
+        for future in done:
+            embedding = future.result()
+            if embedding:
+                embeddings[futures[future]] = embedding
+        return embeddings
+    
+    @staticmethod
+    def get_stored_embeddings(items, deadline, texts=None):
+        """
+        Make sure the embedding store holds current embeddings for items,
+        fetching the missing ones concurrently along with any extra key -> text.
+        Returns the store, item id -> text fingerprint, and the extra embeddings
+        """
+        store = get_embedding_store('fake' if use_fake_embeddings() else 'openai')
+        item_texts = {item.id: AIMatchingSystem.get_item_text(item) for item in items}
+        fingerprints = {item_id: fingerprint(text) for item_id, text in item_texts.items()}
+        
+        stored = store.contains(fingerprints)
+        for item_id in fingerprints:
+            record_cache('item_embedding', item_id in stored)
+        
+        # Extra texts first, they matter most if the budget runs short
+        requests = dict(texts or {})
+        requests.update((item_id, text) for item_id, text in item_texts.items() if item_id not in stored)
+        embeddings = AIMatchingSystem.get_embeddings(requests, deadline) if requests else {}
+        
+        store.append({
+            key: (fingerprints[key], embedding)
+            for key, embedding in embeddings.items() if key in fingerprints
+        })
+        schedule_compaction(store)
+        return store, fingerprints, {key: embeddings[key] for key in (texts or {}) if key in embeddings}
     
     @staticmethod
     def calculate_similarity(embedding1, embedding2):
@@ -82,38 +227,39 @@ class AIMatchingSystem:
                 if not user_items:
                     return []
             
-            # Get other available items (not owned by the user)
-            other_items = Item.query.filter(
+            # Get other available items (not owned by the user) on the user's campus
+            query = Item.query.filter(
                 Item.user_id != user_id,
                 Item.status == 'available'
-            ).all()
+            )
+            user = db.session.get(User, user_id)
+            if user and user.campus:
+                query = query.filter(Item.campus == user.campus)
+            other_items = query.all()
             
             if not other_items:
                 return []
             
+            # Fetch the embeddings the store lacks, concurrently, within the request deadline
+            store, fingerprints, _ = AIMatchingSystem.get_stored_embeddings(user_items + other_items, matching_deadline())
+            other_fingerprints = {item.id: fingerprints[item.id] for item in other_items}
+            
             recommendations = []
             
             # For each user item, find potential matches
             for user_item in user_items:
-                # Get embedding for user item
-                user_item_embedding = AIMatchingSystem.get_item_embedding(user_item)
+                user_item_embedding = store.get(user_item.id, fingerprints[user_item.id])
                 
-                if not user_item_embedding:
+                if user_item_embedding is None:
                     continue
                 
-                # Calculate similarity with other items
+                # Similarity with every other item at once, on the stored vectors
+                similarities = store.similarities(user_item_embedding, other_fingerprints)
+                
                 for other_item in other_items:
-                    # Get embedding for other item
-                    other_item_embedding = AIMatchingSystem.get_item_embedding(other_item)
-                    
-                    if not other_item_embedding:
+                    if other_item.id not in similarities:
                         continue
-                    
-                    # Calculate similarity score
-                    similarity = AIMatchingSystem.calculate_similarity(
-                        user_item_embedding, 
-                        other_item_embedding
-                    )
+                    similarity = similarities[other_item.id]
                     
                     # Generate reason for recommendation
                     reason = AIMatchingSystem.generate_recommendation_reason(
@@ -130,10 +276,12 @@ class AIMatchingSystem:
                         'reason': reason
                     })
             
-            # Sort by score (highest first) and limit results
+            # Sort by score (highest first), keep one listing per duplicate cluster and limit results
             recommendations.sort(key=lambda x: x['score'], reverse=True)
-            return recommendations[:limit]
+            return collapse_duplicates(recommendations, 'recommended_item')[:limit]
         
+        except RemoteBudgetExceeded:
+            raise
         except Exception as e:
             print(f"Error generating recommendations: {str(e)}")
             return []
@@ -173,38 +321,39 @@ class AIMatchingSystem:
             return "This item might be a good trade match."
     
     @staticmethod
-    def find_instant_matches(need_description, limit=10):
+    def find_instant_matches(need_description, limit=10, campus=None):
         """
-        Find items matching an instant need description
+        Find items matching an instant need description,
+        on the given campus if there is one
         """
         try:
             # Get all available items
-            available_items = Item.query.filter_by(status='available').all()
+            query = Item.query.filter_by(status='available')
+            if campus:
+                query = query.filter_by(campus=campus)
+            available_items = query.all()
             
             if not available_items:
                 return []
             
-            # Get embedding for need description
-            need_embedding = AIMatchingSystem.get_text_embedding(need_description)
+            # Fetch the need and any missing item embeddings concurrently within the request deadline
+            store, fingerprints, embeddings = AIMatchingSystem.get_stored_embeddings(
+                available_items, matching_deadline(), {'need': need_description}
+            )
+            need_embedding = embeddings.get('need')
             
             if not need_embedding:
                 return []
             
+            # Similarity with every available item at once, on the stored vectors
+            similarities = store.similarities(need_embedding, fingerprints)
+            
             matches = []
             
-            # Calculate similarity with available items
             for item in available_items:
-                # Get embedding for item
-                item_embedding = AIMatchingSystem.get_item_embedding(item)
-                
-                if not item_embedding:
+                if item.id not in similarities:
                     continue
-                
-                # Calculate similarity score
-                similarity = AIMatchingSystem.calculate_similarity(
-                    need_embedding, 
-                    item_embedding
-                )
+                similarity = similarities[item.id]
                 
                 # Generate reason for match
                 reason = AIMatchingSystem.generate_match_reason(
@@ -220,25 +369,32 @@ class AIMatchingSystem:
                     'reason': reason
                 })
             
-            # Sort by score (highest first) and limit results
+            # Sort by score (highest first), keep one listing per duplicate cluster and limit results
             matches.sort(key=lambda x: x['score'], reverse=True)
-            return matches[:limit]
+            return collapse_duplicates(matches, 'item')[:limit]
         
+        except RemoteBudgetExceeded:
+            raise
         except Exception as e:
             print(f"Error finding instant matches: {str(e)}")
             return []
     
     @staticmethod
-    def get_text_embedding(text):
+    def get_text_embedding(text, timeout=None):
         """
         Generate an embedding for a text using OpenAI's API
         """
+        if use_fake_embeddings():
+            return fake_embedding(text)
+        
         try:
             # Get embedding from OpenAI
-            response = openai.Embedding.create(
-                model="text-embedding-ada-002",
-                input=text
-            )
+            with track_remote_call('openai', 'embedding'):
+                response = get_openai().Embedding.create(
+                    model="text-embedding-ada-002",
+                    input=text,
+                    request_timeout=timeout
+                )
             
             # Return the embedding
             return response['data'][0]['embedding']
@@ -292,23 +448,28 @@ class AIMatchingSystem:
             """
             
             # Get response from OpenAI
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are an expert in marketplace listings and trading."},
-                    {"role": "user", "content": prompt}
-                ]
-            )
+            spend_remote_budget('chat_completion')
+            with track_remote_call('openai', 'chat_completion'):
+                response = get_openai().ChatCompletion.create(
+                    model="gpt-3.5-turbo",
+                    messages=[
+                        {"role": "system", "content": "You are an expert in marketplace listings and trading."},
+                        {"role": "user", "content": prompt}
+                    ]
+                )
             
             # Return the analysis
             return response.choices[0].message.content
         
+        except RemoteBudgetExceeded:
+            raise
         except Exception as e:
             print(f"Error generating AI analysis: {str(e)}")
             return "Unable to generate analysis at this time."
 
 # Create a fallback version that doesn't use OpenAI API
 # This is used when the API key is not available or for testing
+@matching_engine('mock')
 class MockAIMatchingSystem:
     """
     Mock AI matching system that doesn't use OpenAI API
@@ -333,11 +494,15 @@ class MockAIMatchingSystem:
                 if not user_items:
                     return []
             
-            # Get other available items (not owned by the user)
-            other_items = Item.query.filter(
+            # Get other available items (not owned by the user) on the user's campus
+            query = Item.query.filter(
                 Item.user_id != user_id,
                 Item.status == 'available'
-            ).limit(20).all()
+            )
+            user = db.session.get(User, user_id)
+            if user and user.campus:
+                query = query.filter(Item.campus == user.campus)
+            other_items = query.limit(20).all()
             
             if not other_items:
                 return []
@@ -378,22 +543,26 @@ class MockAIMatchingSystem:
                         'reason': reason
                     })
             
-            # Sort by score (highest first) and limit results
+            # Sort by score (highest first), keep one listing per duplicate cluster and limit results
             recommendations.sort(key=lambda x: x['score'], reverse=True)
-            return recommendations[:limit]
+            return collapse_duplicates(recommendations, 'recommended_item')[:limit]
         
         except Exception as e:
             print(f"Error generating mock recommendations: {str(e)}")
             return []
     
     @staticmethod
-    def find_instant_matches(need_description, limit=10):
+    def find_instant_matches(need_description, limit=10, campus=None):
         """
-        Find mock items matching an instant need description
+        Find mock items matching an instant need description,
+        on the given campus if there is one
         """
         try:
             # Get all available items
-            available_items = Item.query.filter_by(status='available').limit(20).all()
+            query = Item.query.filter_by(status='available')
+            if campus:
+                query = query.filter_by(campus=campus)
+            available_items = query.limit(20).all()
             
             if not available_items:
                 return []
@@ -431,9 +600,9 @@ class MockAIMatchingSystem:
                     'reason': reason
                 })
             
-            # Sort by score (highest first) and limit results
+            # Sort by score (highest first), keep one listing per duplicate cluster and limit results
             matches.sort(key=lambda x: x['score'], reverse=True)
-            return matches[:limit]
+            return collapse_duplicates(matches, 'item')[:limit]
         
         except Exception as e:
             print(f"Error finding mock instant matches: {str(e)}")
@@ -442,10 +611,22 @@ class MockAIMatchingSystem:
 # Factory function to get the appropriate matching system
 def get_matching_system():
     """
-    Get the appropriate matching system based on API key availability
+    Get the appropriate matching system: the one named by MATCHING_ENGINE if
+    set, otherwise based on API key availability
     """
+    load_environment()
+    engine = os.getenv('MATCHING_ENGINE')
+    if engine:
+        if engine in ENGINES:
+            return ENGINES[engine]
+        print(f"Warning: Unknown MATCHING_ENGINE {engine}, choosing by API key")
+    
     if os.getenv('OPENAI_API_KEY') and os.getenv('OPENAI_API_KEY') != 'your_openai_api_key_here':
         return AIMatchingSystem
     else:
         print("Warning: Using mock AI matching system because OpenAI API key is not set")
         return MockAIMatchingSystem
+
+# Engines defined in their own modules, which stay out of startup until now
+from app.utils.candidates import PipelineMatchingSystem  # noqa: E402
+matching_engine('pipeline')(PipelineMatchingSystem)
@@ -0,0 +1,109 @@
+"""
+Trade Archive for Campus Barter
+Finished trades are rarely read again, but their rows and messages stay in
+the hot tables and every trade list and message scan pays for them. The
+'trades.archive' job moves completed and rejected trades that ended more
+than TRADE_ARCHIVE_AFTER_DAYS ago into TradeArchive: one row per trade with
+a compressed JSON snapshot of the trade, its items, messages, counter-offer
+revisions and ratings. The originals are deleted in the same transaction.
+
+Trade read endpoints fall back to the archive when a trade is not in the hot
+tables, so clients see archived trades as before, marked archived: true.
+Archived trades are read-only.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.orm import selectinload
+from app.models.archive import TradeArchive
+from app.models.message import Message
+from app.models.reputation import TradeRating
+from app.models.trade import Trade, TradeItem, TradeRevision
+from app.models.trade_event import TradeEvent
+from app.utils.inbox import forget_trades
+from app import db
+
+# Only trades that can no longer change are archived
+ARCHIVED_STATUSES = ('completed', 'rejected')
+
+def archive_trades(older_than_days=None, batch_size=None):
+    """
+    Move finished trades older than the cutoff into the archive, committing
+    one batch at a time. Returns the number of trades and messages moved
+    """
+    older_than_days = older_than_days if older_than_days is not None else current_app.config['TRADE_ARCHIVE_AFTER_DAYS']
+    batch_size = batch_size or current_app.config['TRADE_ARCHIVE_BATCH_SIZE']
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+
+    # SQLite hands out max(id) + 1 for new rows, so the newest trade stays
+    # put to keep its id from being reused
+    newest = db.session.query(db.func.max(Trade.id)).scalar()
+    if newest is None:
+        return {'trades': 0, 'messages': 0}
+    ended = db.func.coalesce(Trade.completion_date, Trade.updated_at, Trade.creation_date)
+
+    moved = {'trades': 0, 'messages': 0}
+    while True:
+        trades = (
+            Trade.query
+            .filter(Trade.status.in_(ARCHIVED_STATUSES), ended < cutoff, Trade.id < newest)
+            .options(selectinload(Trade.items), selectinload(Trade.messages), selectinload(Trade.revisions))
+            .order_by(Trade.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not trades:
+            return moved
+
+        trade_ids = [trade.id for trade in trades]
+        ratings = defaultdict(list)
+        for rating in TradeRating.query.filter(TradeRating.trade_id.in_(trade_ids)):
+            ratings[rating.trade_id].append(rating.to_dict())
+
+        for trade in trades:
+            data = trade.to_dict()
+            data['revisions'] = [revision.to_dict() for revision in trade.revisions]
+            data['ratings'] = ratings[trade.id]
+            db.session.merge(TradeArchive(
+                trade_id=trade.id,
+                initiator_id=trade.initiator_id,
+                recipient_id=trade.recipient_id,
+                status=trade.status,
+                creation_date=trade.creation_date,
+                completion_date=trade.completion_date,
+                payload=TradeArchive.compress(data)
+            ))
+            moved['messages'] += len(trade.messages)
+
+        # Unread messages in archived trades no longer count
+        forget_trades(trade_ids)
+        
+        # Children first, then the trades, each as one statement
+        for model in (TradeEvent, TradeRating, TradeRevision, Message, TradeItem):
+            db.session.execute(
+                db.delete(model).where(model.trade_id.in_(trade_ids)).execution_options(synchronize_session=False)
+            )
+        db.session.execute(
+            db.delete(Trade).where(Trade.id.in_(trade_ids)).execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        db.session.expunge_all()
+        moved['trades'] += len(trade_ids)
+
+def get_archived_trade(trade_id):
+    """
+    Get an archived trade by its original id, or None
+    """
+    return db.session.get(TradeArchive, trade_id)
+
+def archived_trades_for_user(user_id, status=None):
+    """
+    Query a user's archived trades, optionally with one status
+    """
+    query = TradeArchive.query.filter(
+        (TradeArchive.initiator_id == user_id) | (TradeArchive.recipient_id == user_id)
+    )
+    if status:
+        query = query.filter(TradeArchive.status == status)
+    return query
@@ -0,0 +1,183 @@
+"""
+Batch Requests for Campus Barter
+This module runs the sub-requests of a POST /api/batch call in-process
+through the app's own blueprints, so a client can load a page with one round
+trip instead of one per endpoint.
+
+- Every sub-request carries the batch's Authorization header, so all of them
+  act as the same user.
+- Sub-requests run in the order given. Mutating ones (anything but GET and
+  HEAD) run one at a time inside the batch's own app context, so they share
+  its DB session and see each other's changes.
+- Runs of consecutive read-only sub-requests are independent of each other
+  and run concurrently on a bounded thread pool. SQLAlchemy sessions are not
+  thread-safe, so each of those gets its own app context and session; the
+  writes before them have been committed by their routes.
+"""
+
+import inspect
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from flask import current_app, g, request
+from werkzeug.test import EnvironBuilder
+from app import db
+
+READ_ONLY_METHODS = ('GET', 'HEAD')
+
+# Paths that must not run inside a batch: batches do not nest, and
+# event streams never finish
+EXCLUDED_PATHS = ('/api/batch', '/api/trades/events')
+
+# Headers copied from the batch request to every sub-request
+FORWARDED_HEADERS = ('Authorization', 'X-Forwarded-For', 'X-Real-IP', 'Forwarded')
+
+class InvalidBatch(Exception):
+    """
+    Raised when a batch or one of its sub-requests is malformed
+    """
+    pass
+
+_batch_executor = None
+
+def get_batch_executor():
+    """
+    Get the shared thread pool that runs read-only sub-requests
+    """
+    global _batch_executor
+    if _batch_executor is None:
+        _batch_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('BATCH_MAX_CONCURRENCY', 4)),
+            thread_name_prefix='batch'
+        )
+    return _batch_executor
+
+def parse_batch(data, max_requests):
+    """
+    Validate a batch body. Returns the sub-requests as dicts with id, method,
+    path and body
+    """
+    if not isinstance(data, dict) or not isinstance(data.get('requests'), list):
+        raise InvalidBatch('Body must be an object with a list of requests')
+    if not data['requests']:
+        raise InvalidBatch('The batch has no requests')
+    if len(data['requests']) > max_requests:
+        raise InvalidBatch(f'A batch may hold at most {max_requests} requests')
+
+    requests = []
+    for index, entry in enumerate(data['requests']):
+        if not isinstance(entry, dict) or not isinstance(entry.get('path'), str):
+            raise InvalidBatch(f'Request {index} needs a path')
+        path = entry['path']
+        if not path.startswith('/') or urlsplit(path).path.rstrip('/') in EXCLUDED_PATHS:
+            raise InvalidBatch(f'Request {index} has a path that cannot be batched: {path}')
+        requests.append({
+            'id': entry.get('id', index),
+            'method': str(entry.get('method', 'GET')).upper(),
+            'path': path,
+            'body': entry.get('body')
+        })
+    return requests
+
+def build_environ(sub_request):
+    """
+    WSGI environ for a sub-request, authenticated like the batch request and
+    from the same client, so per-IP limits count it against the caller
+    """
+    path, _, query_string = sub_request['path'].partition('?')
+    headers = {
+        name: request.headers[name] for name in FORWARDED_HEADERS if request.headers.get(name)
+    }
+    builder = EnvironBuilder(
+        path=path,
+        query_string=query_string,
+        method=sub_request['method'],
+        base_url=request.host_url,
+        headers=headers,
+        environ_base={'REMOTE_ADDR': request.environ.get('REMOTE_ADDR')},
+        json=sub_request['body'] if sub_request['body'] is not None else None
+    )
+    try:
+        return builder.get_environ()
+    finally:
+        builder.close()
+
+def dispatch(app, environ):
+    """
+    Run one sub-request through the app and collect its response
+    """
+    with app.request_context(environ):
+        try:
+            response = app.full_dispatch_request()
+        except Exception as e:
+            current_app.logger.exception('Batch sub-request failed')
+            return 500, {'error': f'Internal error: {e.__class__.__name__}'}
+
+        # Error pages also report is_streamed, so look for a real stream
+        if response.mimetype == 'text/event-stream' or inspect.isgenerator(response.response):
+            response.close()
+            return 400, {'error': 'Streaming responses cannot be batched'}
+
+        data = response.get_data(as_text=True)
+        if response.is_json:
+            body = json.loads(data) if data else None
+        else:
+            body = data
+        return response.status_code, body
+
+def dispatch_shared(app, environ):
+    """
+    Run a sub-request in the batch's own app context and DB session, keeping
+    the batch request's g intact
+    """
+    saved = dict(vars(g))
+    try:
+        status, body = dispatch(app, environ)
+        # A failed write may leave changes behind; keep them out of later sub-requests
+        if status >= 400:
+            db.session.rollback()
+        return status, body
+    finally:
+        vars(g).clear()
+        vars(g).update(saved)
+
+def dispatch_isolated(app, environ):
+    """
+    Run a read-only sub-request on a pool thread with its own app context
+    """
+    with app.app_context():
+        return dispatch(app, environ)
+
+def run_batch(sub_requests):
+    """
+    Run sub-requests, concurrently where they are read-only and adjacent.
+    Returns one response dict per sub-request, in order
+    """
+    app = current_app._get_current_object()
+    environs = [build_environ(sub_request) for sub_request in sub_requests]
+    results = [None] * len(sub_requests)
+
+    index = 0
+    while index < len(sub_requests):
+        # Collect the run of read-only sub-requests starting here
+        end = index
+        while end < len(sub_requests) and sub_requests[end]['method'] in READ_ONLY_METHODS:
+            end += 1
+
+        if end - index > 1:
+            futures = [
+                get_batch_executor().submit(dispatch_isolated, app, environs[i])
+                for i in range(index, end)
+            ]
+            for i, future in zip(range(index, end), futures):
+                results[i] = future.result()
+        else:
+            end = index + 1
+            results[index] = dispatch_shared(app, environs[index])
+        index = end
+
+    return [
+        {'id': sub_request['id'], 'status': status, 'body': body}
+        for sub_request, (status, body) in zip(sub_requests, results)
+    ]
@@ -0,0 +1,93 @@
+"""
+Campus Partitioning for Campus Barter
+Students can only trade with people on their own campus, so every user and
+listing belongs to a campus derived from the user's email domain at
+registration (jane@cs.example.edu -> example.edu).
+
+The campus is stored on users, items and standing needs, indexed as the
+leading column of their lookup indexes, and carried in the access token so
+requests can scope their queries without loading the user. Listings,
+matching candidates, standing needs and the cycle index are all partitioned
+by it, so the cost of a request grows with its own campus rather than with
+the whole platform.
+"""
+
+from flask_jwt_extended import get_jwt, verify_jwt_in_request
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt import PyJWTError
+from app import db
+
+# Second-level suffixes under which institutions register their own domain,
+# e.g. ox.ac.uk or unimelb.edu.au
+SECOND_LEVEL_SUFFIXES = {
+    'ac.uk', 'ac.nz', 'ac.jp', 'ac.kr', 'ac.in', 'ac.za', 'ac.il', 'ac.at', 'ac.th',
+    'edu.au', 'edu.cn', 'edu.hk', 'edu.sg', 'edu.my', 'edu.tw', 'edu.br', 'edu.mx',
+    'edu.ar', 'edu.co', 'edu.pl', 'edu.tr', 'edu.pk', 'edu.ph', 'edu.eg'
+}
+
+def campus_from_email(email):
+    """
+    Derive a campus key from an email address's registrable domain.
+    Returns None if the address has no usable domain
+    """
+    if not email or '@' not in email:
+        return None
+
+    labels = [label for label in email.rsplit('@', 1)[1].strip().lower().split('.') if label]
+    if len(labels) < 2:
+        return None
+
+    keep = 3 if '.'.join(labels[-2:]) in SECOND_LEVEL_SUFFIXES and len(labels) >= 3 else 2
+    return '.'.join(labels[-keep:])
+
+def current_campus():
+    """
+    Get the campus of the user making the request, or None if anonymous.
+    Read from the token claim, falling back to the user record for tokens
+    issued before campuses existed. An expired or malformed token on a
+    public endpoint counts as anonymous
+    """
+    try:
+        if not verify_jwt_in_request(optional=True):
+            return None
+    except (JWTExtendedException, PyJWTError):
+        return None
+
+    claims = get_jwt()
+    if 'campus' in claims:
+        return claims['campus']
+
+    from app.models.user import User
+    user = db.session.get(User, claims['sub'])
+    return user.campus if user else None
+
+def campus_claims(user):
+    return {'campus': user.campus}
+
+def backfill_campuses():
+    """
+    Fill in the campus of users, items and standing needs created before
+    campuses were tracked. Returns the number of users updated
+    """
+    from app.models.user import User
+    from app.models.item import Item
+    from app.models.need import StandingNeed, NeedKeyword
+
+    updated = 0
+    for user in User.query.filter(User.campus.is_(None)):
+        user.campus = campus_from_email(user.email)
+        updated += 1
+    db.session.flush()
+
+    # Denormalised copies follow their owner
+    owner_campus = db.select(User.campus).where(User.id == Item.user_id).scalar_subquery()
+    Item.query.filter(Item.campus.is_(None)).update({Item.campus: owner_campus}, synchronize_session=False)
+
+    need_owner_campus = db.select(User.campus).where(User.id == StandingNeed.user_id).scalar_subquery()
+    StandingNeed.query.filter(StandingNeed.campus.is_(None)).update({StandingNeed.campus: need_owner_campus}, synchronize_session=False)
+
+    keyword_campus = db.select(StandingNeed.campus).where(StandingNeed.id == NeedKeyword.need_id).scalar_subquery()
+    NeedKeyword.query.filter(NeedKeyword.campus.is_(None)).update({NeedKeyword.campus: keyword_campus}, synchronize_session=False)
+
+    db.session.commit()
+    return updated
@@ -0,0 +1,572 @@
+"""
+Candidate Generation and Re-ranking for Campus Barter
+This module implements the 'pipeline' matching engine. Instead of scoring
+every available item, it works in two stages:
+
+1. Cheap candidate generators look up items by category, tag, keyword and
+   approximate vector neighbours in a per-campus in-memory index. Their
+   results are unioned and deduplicated, and at most MATCHING_MAX_CANDIDATES
+   reach the next stage, however large the catalog.
+2. A vectorized re-ranker scores the candidates in one numpy pass as a
+   weighted sum of embedding (or keyword) similarity, category match, tag
+   overlap, listing freshness and owner reputation. The weights come from
+   MATCHING_WEIGHTS.
+
+Item embeddings are cached in the index as the re-ranker fetches them, and
+the vector generator searches the cached ones with random-hyperplane LSH.
+Like the cycle index, the candidate index follows item changes made in this
+worker and is rebuilt once it is older than MATCHING_INDEX_TTL seconds.
+Request threads share an index, so its tables and vectors are only read or
+changed under its locks.
+
+The item routes import this module to keep the index current, so the
+matching stack is imported inside the functions that need it to keep it out
+of startup. app.utils.ai_matching registers the engine when it loads.
+"""
+
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from itertools import islice
+from flask import current_app
+from app.models.item import Item
+from app.models.user import User
+from app.models.reputation import DEFAULT_REPUTATION
+from app.utils.metrics import record_cache
+from app.utils.duplicates import canonical_id
+from app.utils.needs import extract_keywords, item_keywords
+from app import db
+
+FEATURES = ('similarity', 'category', 'tags', 'freshness', 'reputation')
+
+# Listings lose half their freshness score every this many days
+FRESHNESS_HALF_LIFE_DAYS = 14
+
+def parse_weights(value):
+    """
+    Parse "similarity=0.6,category=0.15,..." into a weight per feature
+    """
+    weights = dict.fromkeys(FEATURES, 0.0)
+    for part in value.split(','):
+        if not part.strip():
+            continue
+        name, weight = part.split('=')
+        if name.strip() not in weights:
+            raise ValueError(f'Unknown matching weight: {name.strip()}')
+        weights[name.strip()] = float(weight)
+    return weights
+
+def embeddings_available():
+    """
+    Whether item embeddings can be fetched, from OpenAI or the fake provider
+    """
+    from app.utils.ai_matching import use_fake_embeddings, load_environment
+
+    load_environment()
+    key = os.getenv('OPENAI_API_KEY')
+    return use_fake_embeddings() or bool(key and key != 'your_openai_api_key_here')
+
+def split_tags(tags):
+    return frozenset(tag.strip().lower() for tag in tags.split(',') if tag.strip()) if tags else frozenset()
+
+def get_candidate_index(campus=None):
+    """
+    Get the candidate index for a campus in the current app, building it if
+    missing or stale
+    """
+    app = current_app._get_current_object()
+    indexes = app.extensions.setdefault('candidate_indexes', {})
+    index = indexes.get(campus)
+    fresh = index is not None and not index.is_stale(app.config['MATCHING_INDEX_TTL'])
+    record_cache('candidate_index', fresh)
+    if not fresh:
+        previous = index
+        index = CandidateIndex()
+        query = (
+            db.session.query(Item.id, Item.title, Item.description, Item.category, Item.tags)
+            .filter(Item.status == 'available')
+        )
+        # Without a campus, match across every campus as the other engines do
+        if campus:
+            query = query.filter(Item.campus == campus)
+        index.load(query.order_by(Item.id))
+        # Embeddings do not go stale with the item list, keep the ones we paid for
+        if previous is not None:
+            index.vectors.adopt(previous.vectors, index.categories)
+        indexes[campus] = index
+    return index
+
+def _indexes_for(campus):
+    # An item is in its campus's index and in the all-campus one
+    indexes = current_app.extensions.get('candidate_indexes', {})
+    return [indexes[key] for key in {campus, None} if key in indexes]
+
+def notify_item_changed(item):
+    """
+    Keep this worker's candidate indexes in step with an item change.
+    Indexes that have not been built yet are left alone
+    """
+    for index in _indexes_for(item.campus):
+        if item.status == 'available':
+            index.update_item(item.id, item.title, item.description, item.category, item.tags)
+        else:
+            index.remove_item(item.id)
+
+def notify_item_deleted(item_id, campus=None):
+    for index in _indexes_for(campus):
+        index.remove_item(item_id)
+
+class VectorIndex:
+    """
+    Unit vectors by item id with random-hyperplane LSH for approximate search
+    """
+
+    def __init__(self, tables=8, bits=10, seed=13):
+        self.tables = tables
+        self.bits = bits
+        self.seed = seed
+        self.vectors = {}
+        self._planes = None
+        self._buckets = [defaultdict(set) for _ in range(tables)]
+        self._codes = {}
+
+        # Reentrant, as add replaces an item's old vector under it
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def __contains__(self, item_id):
+        return item_id in self.vectors
+
+    def _hash(self, vector):
+        import numpy as np
+
+        if self._planes is None:
+            rng = np.random.default_rng(self.seed)
+            self._planes = rng.standard_normal((self.tables, self.bits, vector.shape[0])).astype(np.float32)
+        signs = (self._planes @ vector) > 0
+        return tuple(int(code) for code in signs @ (1 << np.arange(self.bits)))
+
+    def add(self, item_id, vector):
+        import numpy as np
+
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        if not norm:
+            return
+        vector = vector / norm
+
+        with self._lock:
+            self.remove(item_id)
+            codes = self._hash(vector)
+            for table, code in enumerate(codes):
+                self._buckets[table][code].add(item_id)
+            self.vectors[item_id] = vector
+            self._codes[item_id] = codes
+
+    def remove(self, item_id):
+        with self._lock:
+            codes = self._codes.pop(item_id, None)
+            if codes is None:
+                return
+            for table, code in enumerate(codes):
+                self._buckets[table][code].discard(item_id)
+            del self.vectors[item_id]
+
+    def get(self, item_ids):
+        """
+        Cached vectors for those of item_ids that have one
+        """
+        with self._lock:
+            return {item_id: self.vectors[item_id] for item_id in item_ids if item_id in self.vectors}
+
+    def adopt(self, other, keep):
+        """
+        Copy vectors from an older index for the item ids in `keep`
+        """
+        with other._lock:
+            vectors = [(item_id, vector) for item_id, vector in other.vectors.items() if item_id in keep]
+        for item_id, vector in vectors:
+            self.add(item_id, vector)
+
+    def search(self, vector, limit):
+        """
+        Approximate nearest neighbours of a vector, most similar first.
+        Only items sharing an LSH bucket in some table are scored
+        """
+        import numpy as np
+
+        vector = np.asarray(vector, dtype=np.float32)
+        vector = vector / (float(np.linalg.norm(vector)) or 1.0)
+
+        with self._lock:
+            if not self.vectors:
+                return []
+            candidates = set()
+            for table, code in enumerate(self._hash(vector)):
+                candidates.update(self._buckets[table].get(code, ()))
+            if not candidates:
+                return []
+            ids = list(candidates)
+            matrix = np.stack([self.vectors[item_id] for item_id in ids])
+
+        scores = matrix @ vector
+        order = np.argsort(-scores)[:limit]
+        return [ids[i] for i in order]
+
+class CandidateIndex:
+    """
+    In-memory lookup tables over a campus's available items
+    """
+
+    def __init__(self):
+        self.built_at = time.monotonic()
+
+        # item id -> category, for membership and removal
+        self.categories = {}
+        self._tags = {}
+        self._keywords = {}
+
+        # Buckets are dicts used as insertion-ordered sets, newest last
+        self.by_category = defaultdict(dict)
+        self.by_tag = defaultdict(dict)
+        self.by_keyword = defaultdict(dict)
+
+        self.vectors = VectorIndex()
+
+        # Reentrant, as the public methods update the tables through _add and _remove
+        self._lock = threading.RLock()
+
+    def is_stale(self, ttl):
+        return time.monotonic() - self.built_at > ttl
+
+    def load(self, rows):
+        with self._lock:
+            for item_id, title, description, category, tags in rows:
+                self._add(item_id, title, description, category, tags)
+
+    def category_names(self):
+        with self._lock:
+            return list(self.by_category)
+
+    def _add(self, item_id, title, description, category, tags):
+        tags = split_tags(tags)
+        keywords = frozenset(extract_keywords(f'{title} {description} {" ".join(tags)}', limit=50))
+
+        with self._lock:
+            self.categories[item_id] = category
+            self._tags[item_id] = tags
+            self._keywords[item_id] = keywords
+            self.by_category[category][item_id] = None
+            for tag in tags:
+                self.by_tag[tag][item_id] = None
+            for keyword in keywords:
+                self.by_keyword[keyword][item_id] = None
+
+    def _remove(self, item_id):
+        with self._lock:
+            category = self.categories.pop(item_id, None)
+            if category is None:
+                return
+            self.by_category[category].pop(item_id, None)
+            for tag in self._tags.pop(item_id):
+                self.by_tag[tag].pop(item_id, None)
+            for keyword in self._keywords.pop(item_id):
+                self.by_keyword[keyword].pop(item_id, None)
+
+    def update_item(self, item_id, title, description, category, tags):
+        # Text changed, so any cached embedding is out of date
+        with self._lock:
+            self._remove(item_id)
+            self.vectors.remove(item_id)
+            self._add(item_id, title, description, category, tags)
+
+    def remove_item(self, item_id):
+        with self._lock:
+            self._remove(item_id)
+            self.vectors.remove(item_id)
+
+    @staticmethod
+    def _newest(bucket, limit):
+        return islice(reversed(bucket), limit)
+
+    def generate(self, categories=(), tags=(), keywords=(), vector=None, per_generator=100, max_candidates=300):
+        """
+        Union the candidates from every generator, deduplicated and capped.
+        Generators are taken round-robin so each contributes until the cap
+        """
+        nearest = self.vectors.search(vector, per_generator) if vector is not None else []
+
+        # The streams read the buckets lazily, so drain them under the lock
+        with self._lock:
+            streams = []
+            for category in categories:
+                streams.append(self._newest(self.by_category.get(category, {}), per_generator))
+            streams.append(islice(_interleave(self._newest(self.by_tag.get(tag, {}), per_generator) for tag in tags), per_generator))
+            streams.append(islice(_interleave(self._newest(self.by_keyword.get(keyword, {}), per_generator) for keyword in keywords), per_generator))
+            if vector is not None:
+                streams.append(iter(nearest))
+
+            candidates = {}
+            for item_id in _interleave(streams):
+                candidates[item_id] = None
+                if len(candidates) >= max_candidates:
+                    break
+            return list(candidates)
+
+def _interleave(iterators):
+    iterators = [iter(iterator) for iterator in iterators]
+    while iterators:
+        remaining = []
+        for iterator in iterators:
+            try:
+                yield next(iterator)
+            except StopIteration:
+                continue
+            remaining.append(iterator)
+        iterators = remaining
+
+class Reranker:
+    """
+    Scores candidates against a query as a weighted sum of features
+    """
+
+    def __init__(self, weights):
+        import numpy as np
+
+        self.weights = np.array([weights[name] for name in FEATURES], dtype=np.float32)
+
+    def score(self, candidates, reputations, category=None, tags=frozenset(), keywords=frozenset(),
+              query_vector=None, vectors=None, now=None):
+        """
+        Score candidate items for one query. Returns a numpy array of scores
+        and the feature matrix, one row per candidate
+        """
+        import numpy as np
+
+        now = now or datetime.utcnow()
+        count = len(candidates)
+        features = np.zeros((count, len(FEATURES)), dtype=np.float32)
+
+        # Similarity: cosine of embeddings where both are known, keyword overlap otherwise
+        if query_vector is not None and vectors:
+            query = np.asarray(query_vector, dtype=np.float32)
+            query = query / (float(np.linalg.norm(query)) or 1.0)
+            known = [i for i, item in enumerate(candidates) if item.id in vectors]
+            if known:
+                matrix = np.stack([vectors[candidates[i].id] for i in known])
+                features[known, 0] = np.clip(matrix @ query, 0, 1)
+        else:
+            known = []
+        if keywords:
+            embedded = set(known)
+            for i, item in enumerate(candidates):
+                if i not in embedded:
+                    features[i, 0] = len(keywords & item_keywords(item)) / len(keywords)
+
+        if category is not None:
+            features[:, 1] = [item.category == category for item in candidates]
+
+        if tags:
+            for i, item in enumerate(candidates):
+                item_tags = split_tags(item.tags)
+                union = tags | item_tags
+                features[i, 2] = len(tags & item_tags) / len(union) if union else 0.0
+
+        ages = np.array([
+            (now - item.date_listed).total_seconds() / 86400 if item.date_listed else 365
+            for item in candidates
+        ], dtype=np.float32)
+        features[:, 3] = np.power(0.5, np.maximum(ages, 0) / FRESHNESS_HALF_LIFE_DAYS)
+
+        # Reputation is on a 1-5 scale
+        owner_reputation = np.array([reputations.get(item.user_id) or DEFAULT_REPUTATION for item in candidates], dtype=np.float32)
+        features[:, 4] = np.clip((owner_reputation - 1) / 4, 0, 1)
+
+        return features @ self.weights, features
+
+def _pipeline_settings():
+    config = current_app.config
+    return (
+        parse_weights(config['MATCHING_WEIGHTS']),
+        config['MATCHING_GENERATOR_LIMIT'],
+        config['MATCHING_MAX_CANDIDATES'],
+    )
+
+def _load_candidates(item_ids, exclude_user=None):
+    """
+    Load candidate items and their owners' reputations with one query
+    """
+    if not item_ids:
+        return [], {}
+    rows = (
+        db.session.query(Item, User.reputation_score)
+        .join(User, User.id == Item.user_id)
+        .filter(Item.id.in_(item_ids), Item.status == 'available')
+        .all()
+    )
+    items = [item for item, _ in rows if item.user_id != exclude_user]
+    return items, {item.user_id: reputation for item, reputation in rows}
+
+def _embed(index, texts):
+    """
+    Fetch embeddings for key -> text and cache the item ones in the index.
+    Returns key -> embedding for what arrived before the deadline
+    """
+    from app.utils.ai_matching import AIMatchingSystem, matching_deadline
+
+    if not texts or not embeddings_available():
+        return {}
+    embeddings = AIMatchingSystem.get_embeddings(texts, matching_deadline())
+    for key, embedding in embeddings.items():
+        if isinstance(key, int) and key in index.categories:
+            index.vectors.add(key, embedding)
+    return embeddings
+
+def _item_vectors(index, items):
+    """
+    Embeddings for candidate items, fetching only those not cached yet
+    """
+    from app.utils.ai_matching import AIMatchingSystem
+
+    missing = {item.id: AIMatchingSystem.get_item_text(item) for item in items if item.id not in index.vectors}
+    for item in items:
+        record_cache('item_embedding', item.id in index.vectors)
+    _embed(index, missing)
+    return index.vectors.get(item.id for item in items)
+
+class PipelineMatchingSystem:
+    """
+    Multi-stage matching: cheap candidate generation, then vectorized re-ranking
+    """
+
+    @staticmethod
+    def find_instant_matches(need_description, limit=10, campus=None):
+        """
+        Find items matching an instant need description, on the given campus
+        """
+        weights, per_generator, max_candidates = _pipeline_settings()
+        index = get_candidate_index(campus)
+
+        keywords = extract_keywords(need_description)
+        query_vector = None
+        if embeddings_available():
+            query_vector = _embed(index, {'need': need_description}).get('need')
+
+        # Categories named in the need, e.g. "textbooks" or "electronics"
+        categories = [category for category in index.category_names() if category.lower().rstrip('s') in {k.rstrip('s') for k in keywords}]
+
+        item_ids = index.generate(
+            categories=categories, tags=keywords, keywords=keywords, vector=query_vector,
+            per_generator=per_generator, max_candidates=max_candidates
+        )
+        candidates, reputations = _load_candidates(item_ids)
+        if not candidates:
+            return []
+
+        vectors = _item_vectors(index, candidates) if query_vector is not None else None
+        scores, features = Reranker(weights).score(
+            candidates, reputations,
+            category=categories[0] if len(categories) == 1 else None,
+            tags=frozenset(keywords), keywords=frozenset(keywords),
+            query_vector=query_vector, vectors=vectors
+        )
+
+        # Best first, one listing per duplicate cluster
+        matches, clusters = [], set()
+        for i in scores.argsort()[::-1]:
+            cluster = canonical_id(candidates[i])
+            if cluster in clusters:
+                continue
+            clusters.add(cluster)
+            matches.append({
+                'item': candidates[i].to_dict(),
+                'score': round(float(scores[i]), 4),
+                'reason': _reason(features[i], candidates[i])
+            })
+            if len(matches) >= limit:
+                break
+        return matches
+
+    @staticmethod
+    def get_trade_recommendations(user_id, item_id=None, limit=10):
+        """
+        Get trade recommendations for a user's available items
+        """
+        weights, per_generator, max_candidates = _pipeline_settings()
+
+        user = db.session.get(User, user_id)
+        if user is None:
+            return []
+
+        query = Item.query.filter_by(user_id=user_id, status='available')
+        if item_id:
+            query = query.filter_by(id=item_id)
+        user_items = query.all()
+        if not user_items:
+            return []
+
+        index = get_candidate_index(user.campus)
+        use_vectors = embeddings_available()
+        own_vectors = _item_vectors(index, user_items) if use_vectors else {}
+        reranker = Reranker(weights)
+
+        best = {}
+        for user_item in user_items:
+            tags = split_tags(user_item.tags)
+            keywords = frozenset(extract_keywords(f'{user_item.title} {(user_item.tags or "").replace(",", " ")}'))
+            query_vector = own_vectors.get(user_item.id) if use_vectors else None
+
+            item_ids = index.generate(
+                categories=[user_item.category], tags=tags, keywords=keywords, vector=query_vector,
+                per_generator=per_generator, max_candidates=max_candidates
+            )
+            candidates, reputations = _load_candidates(item_ids, exclude_user=user_id)
+            if not candidates:
+                continue
+
+            vectors = _item_vectors(index, candidates) if query_vector is not None else None
+            scores, features = reranker.score(
+                candidates, reputations,
+                category=user_item.category, tags=tags, keywords=keywords,
+                query_vector=query_vector, vectors=vectors
+            )
+            # Keep the best match per duplicate cluster
+            for i, other_item in enumerate(candidates):
+                score = float(scores[i])
+                cluster = canonical_id(other_item)
+                if cluster not in best or score > best[cluster]['score']:
+                    best[cluster] = {
+                        'user_item': user_item,
+                        'recommended_item': other_item,
+                        'score': score,
+                        'features': features[i]
+                    }
+
+        ranked = sorted(best.values(), key=lambda match: match['score'], reverse=True)[:limit]
+        return [{
+            'user_item': match['user_item'].to_dict(),
+            'recommended_item': match['recommended_item'].to_dict(),
+            'score': round(match['score'], 4),
+            'reason': _reason(match['features'], match['recommended_item'])
+        } for match in ranked]
+
+def _reason(features, item):
+    """
+    Explain a match by its strongest feature
+    """
+    similarity, category, tags, freshness, _ = (float(value) for value in features)
+    if similarity > 0.8:
+        return "This item closely matches what you described."
+    if category and tags:
+        return f"Same category ({item.category}) with overlapping tags."
+    if tags:
+        return "Items share common tags."
+    if category:
+        return f"Both items are in the same category: {item.category}"
+    if freshness > 0.9:
+        return "A fresh listing that may interest you."
+    return "This item might be of interest based on your listings."
@@ -0,0 +1,93 @@
+"""
+Change Feed for Campus Barter
+This module records every create, update and delete of items, trades and
+trade messages in the Change table, so clients and external cache or search
+indexers can sync deltas from GET /api/changes instead of re-downloading
+whole lists.
+
+Route handlers call record_*_change() before committing, like
+publish_trade_event(), so an entry exists exactly when its change does.
+Entries carry a snapshot of the entity after the change; readers apply them
+in cursor order and keep the last cursor they saw.
+
+A cursor only ever moves past entries a request actually read, but it
+assumes entries commit in id order. SQLite's single writer guarantees that;
+on a database with concurrent writers, an entry whose transaction commits
+after a higher id has been read can be skipped.
+"""
+
+import json
+from app.models.change import Change
+from app import db
+
+# Entries examined per request, visible to the reader or not
+SCAN_LIMIT = 1000
+
+def record_change(entity, entity_id, operation, data=None, campus=None, user_id=None, counterparty_id=None):
+    """
+    Add a change log entry to the current session; it commits with the caller's change
+    """
+    db.session.add(Change(
+        entity=entity,
+        entity_id=entity_id,
+        operation=operation,
+        campus=campus,
+        user_id=user_id,
+        counterparty_id=counterparty_id,
+        payload=json.dumps(data) if data is not None else None
+    ))
+
+def record_item_change(item, operation):
+    """
+    Log an item change. The item must have been flushed so it has an id
+    """
+    data = item.to_dict() if operation != 'delete' else None
+    record_change('item', item.id, operation, data, campus=item.campus, user_id=item.user_id)
+
+def record_trade_change(trade, operation):
+    # Messages are logged as entries of their own
+    record_change(
+        'trade', trade.id, operation, trade.to_dict(include_messages=False),
+        user_id=trade.initiator_id, counterparty_id=trade.recipient_id
+    )
+
+def record_message_change(message, trade, operation='create'):
+    record_change(
+        'message', message.id, operation, message.to_dict(),
+        user_id=trade.initiator_id, counterparty_id=trade.recipient_id
+    )
+
+def changes_since(cursor, limit, user_id=None, campus=None, entities=None, scan_limit=SCAN_LIMIT):
+    """
+    Get up to `limit` entries after a cursor, oldest first, from the next
+    scan_limit entries of the log. With a user_id, only that user's trades
+    and messages and the items on `campus` (if set) are returned; without
+    one, every entry is. Returns (entries, next cursor, has_more)
+    """
+    # Fix the scanned range first, so the cursor never passes an entry that
+    # committed after the visible ones were read
+    window = [
+        change_id for change_id, in
+        db.session.query(Change.id).filter(Change.id > cursor).order_by(Change.id).limit(scan_limit + 1)
+    ]
+    if not window:
+        return [], cursor, False
+    more_to_scan = len(window) > scan_limit
+    window = window[:scan_limit]
+
+    query = Change.query.filter(Change.id > cursor, Change.id <= window[-1])
+    if entities:
+        query = query.filter(Change.entity.in_(entities))
+    if user_id is not None:
+        items = Change.entity == 'item'
+        if campus:
+            items = items & (Change.campus == campus)
+        query = query.filter(items | (Change.user_id == user_id) | (Change.counterparty_id == user_id))
+
+    # Fetch one extra entry to know whether there are more
+    entries = query.order_by(Change.id).limit(limit + 1).all()
+    if len(entries) > limit:
+        return entries[:limit], entries[limit - 1].id, True
+
+    # Everything visible in the window was returned, so skip past the rest of it
+    return entries, window[-1], more_to_scan
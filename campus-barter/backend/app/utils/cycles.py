@@ -0,0 +1,285 @@
+"""
+Barter Cycle Discovery for Campus Barter
+This module finds multi-party trades such as A -> B -> C -> A, where each
+user receives an item they want from the next user in the cycle.
+
+The "wants" graph has an edge u -> v when one of v's available items scores
+well as a recommendation for one of u's items, using the same category and
+tag scoring as MockAIMatchingSystem. The engine keeps an in-memory index of
+available items per process and works incrementally:
+
+- Item changes update the category/tag index and invalidate only the cached
+  out-edges of the users they can affect.
+- Out-edges are computed on demand, scanning at most CYCLE_BUCKET_SCAN of
+  the newest items per category/tag bucket and keeping the best
+  CYCLE_MAX_OUT_DEGREE neighbours, so their cost does not grow with the
+  catalog.
+- The cycle search from a user is a depth-limited DFS over those edges that
+  closes a cycle whenever the current user wants one of the start user's
+  items. It stops at the time budget and returns the best cycles so far.
+
+Cycles never cross campuses, so each campus gets its own engine, built on
+first use. An engine is shared by the request threads of its worker, so its
+index and edge cache are only read or changed under the engine's lock. The
+cycle search takes it per edge lookup rather than for the whole search, so
+item changes do not wait out its time budget. Changes made by other worker
+processes are picked up by rebuilding an index once it is older than
+CYCLE_INDEX_TTL seconds.
+"""
+
+import threading
+import time
+from collections import defaultdict
+from itertools import islice
+from flask import current_app
+from app.models.item import Item
+from app.utils.metrics import record_cache
+from app import db
+
+# Score tiers, matching MockAIMatchingSystem
+BASE_SCORE = 0.5
+CATEGORY_BONUS = 0.3
+TAG_BONUS = 0.2
+
+# An edge needs more than the base score, i.e. a shared category or tag
+MIN_EDGE_SCORE = BASE_SCORE + TAG_BONUS
+
+def get_cycle_engine(campus=None):
+    """
+    Get the cycle engine for a campus in the current app, building its index
+    if missing or stale. Each campus has its own engine over its own items
+    """
+    app = current_app._get_current_object()
+    engines = app.extensions.setdefault('cycle_engines', {})
+    engine = engines.get(campus)
+    fresh = engine is not None and not engine.is_stale(app.config['CYCLE_INDEX_TTL'])
+    record_cache('cycle_index', fresh)
+    if not fresh:
+        engine = CycleEngine(
+            max_out_degree=app.config['CYCLE_MAX_OUT_DEGREE'],
+            bucket_scan=app.config['CYCLE_BUCKET_SCAN']
+        )
+        engine.load(
+            db.session.query(Item.id, Item.user_id, Item.category, Item.tags)
+            .filter(Item.campus == campus, Item.status == 'available')
+            .order_by(Item.id)
+        )
+        engines[campus] = engine
+    return engine
+
+def notify_item_changed(item):
+    """
+    Keep this worker's cycle index for the item's campus in step with an
+    item change. Does nothing if that index has not been built yet
+    """
+    engine = current_app.extensions.get('cycle_engines', {}).get(item.campus)
+    if engine is None:
+        return
+    if item.status == 'available':
+        engine.update_item(item.id, item.user_id, item.category, item.tags)
+    else:
+        engine.remove_item(item.id)
+
+def notify_item_deleted(item_id, campus=None):
+    engine = current_app.extensions.get('cycle_engines', {}).get(campus)
+    if engine is not None:
+        engine.remove_item(item_id)
+
+def score_items(a, b):
+    """
+    Score how good a trade match two indexed items are
+    """
+    score = BASE_SCORE
+    if a[1] == b[1]:
+        score += CATEGORY_BONUS
+    if a[2] & b[2]:
+        score += TAG_BONUS
+    return score
+
+class CycleEngine:
+    """
+    In-memory wants graph over available items with bounded cycle search
+    """
+
+    def __init__(self, max_out_degree=10, bucket_scan=200):
+        self.max_out_degree = max_out_degree
+        self.bucket_scan = bucket_scan
+        self.built_at = time.monotonic()
+
+        # item id -> (owner id, category, frozenset of tags)
+        self.items = {}
+        self.user_items = defaultdict(set)
+
+        # Buckets are dicts used as insertion-ordered sets, newest last
+        self.by_category = defaultdict(dict)
+        self.by_tag = defaultdict(dict)
+
+        # user id -> cached out-edges [(neighbour, score, wanted item id)]
+        self._edges = {}
+
+        # Cached edge lists are replaced rather than changed, so they can be
+        # read after the lock is released
+        self._lock = threading.Lock()
+
+    def is_stale(self, ttl):
+        return time.monotonic() - self.built_at > ttl
+
+    def load(self, rows):
+        with self._lock:
+            for item_id, user_id, category, tags in rows:
+                self._add(item_id, user_id, category, tags)
+
+    def _add(self, item_id, user_id, category, tags):
+        tags = frozenset(tag.strip().lower() for tag in tags.split(',') if tag.strip()) if tags else frozenset()
+        self.items[item_id] = (user_id, category, tags)
+        self.user_items[user_id].add(item_id)
+        self.by_category[category][item_id] = None
+        for tag in tags:
+            self.by_tag[tag][item_id] = None
+
+    def _remove(self, item_id):
+        entry = self.items.pop(item_id, None)
+        if entry is None:
+            return None
+
+        user_id, category, tags = entry
+        self.user_items[user_id].discard(item_id)
+        if not self.user_items[user_id]:
+            del self.user_items[user_id]
+        self.by_category[category].pop(item_id, None)
+        for tag in tags:
+            self.by_tag[tag].pop(item_id, None)
+        return entry
+
+    def update_item(self, item_id, user_id, category, tags):
+        """
+        Add or replace an item and invalidate the edges it can affect
+        """
+        with self._lock:
+            old = self._remove(item_id)
+            self._add(item_id, user_id, category, tags)
+            if old:
+                self._invalidate_around(old)
+            self._invalidate_around(self.items[item_id])
+
+    def remove_item(self, item_id):
+        with self._lock:
+            old = self._remove(item_id)
+            if old:
+                self._invalidate_around(old)
+
+    def _invalidate_around(self, entry):
+        # The owner's own edges change, and so may those of anyone whose
+        # bounded bucket scans can see this item
+        user_id, category, tags = entry
+        affected = {user_id}
+        for bucket in [self.by_category[category]] + [self.by_tag[tag] for tag in tags]:
+            affected.update(self.items[other_id][0] for other_id in self._newest(bucket))
+        for affected_user in affected:
+            self._edges.pop(affected_user, None)
+
+    def _newest(self, bucket):
+        # Dicts keep insertion order, so the newest items are at the end
+        return islice(reversed(bucket), self.bucket_scan)
+
+    def out_edges(self, user_id):
+        """
+        Best neighbours a user wants to receive items from, highest score first
+        """
+        with self._lock:
+            edges = self._edges.get(user_id)
+            record_cache('cycle_edges', edges is not None)
+            if edges is not None:
+                return edges
+
+            best = {}
+            for own_id in self.user_items.get(user_id, ()):
+                own = self.items[own_id]
+                candidates = set(self._newest(self.by_category[own[1]]))
+                for tag in own[2]:
+                    candidates.update(self._newest(self.by_tag[tag]))
+
+                for other_id in candidates:
+                    other = self.items[other_id]
+                    if other[0] == user_id:
+                        continue
+                    score = score_items(own, other)
+                    if score >= MIN_EDGE_SCORE and score > best.get(other[0], (0, None))[0]:
+                        best[other[0]] = (score, other_id)
+
+            edges = sorted(
+                ((neighbour, score, item_id) for neighbour, (score, item_id) in best.items()),
+                key=lambda edge: (-edge[1], -edge[2])
+            )[:self.max_out_degree]
+            self._edges[user_id] = edges
+            return edges
+
+    def edge(self, from_user, to_user):
+        """
+        Exact best edge from one user to another, or None.
+        Returns (score, wanted item id)
+        """
+        with self._lock:
+            best = None
+            for own_id in self.user_items.get(from_user, ()):
+                own = self.items[own_id]
+                for other_id in self.user_items.get(to_user, ()):
+                    score = score_items(own, self.items[other_id])
+                    if score >= MIN_EDGE_SCORE and (best is None or score > best[0]):
+                        best = (score, other_id)
+            return best
+
+    def find_cycles(self, user_id, max_length=4, limit=10, time_budget=0.2):
+        """
+        Find the best cycles of 2 to max_length users starting at user_id.
+        Returns (cycles, complete) where complete is False if the time
+        budget ran out first. Each cycle is a dict with the participants,
+        the steps as (receiver, giver, item id) and the mean edge score
+        """
+        deadline = time.monotonic() + time_budget
+        cycles = []
+        path = [user_id]
+        steps = []
+        complete = True
+
+        if user_id not in self.user_items:
+            return cycles, complete
+
+        def search(current):
+            nonlocal complete
+            if time.monotonic() > deadline:
+                complete = False
+                return
+            for neighbour, score, item_id in self.out_edges(current):
+                if time.monotonic() > deadline:
+                    complete = False
+                    return
+                if neighbour in path:
+                    continue
+
+                path.append(neighbour)
+                steps.append((current, neighbour, item_id, score))
+
+                # Close the cycle if this user wants something the start user has
+                closing = self.edge(neighbour, user_id)
+                if closing:
+                    cycle_steps = steps + [(neighbour, user_id, closing[1], closing[0])]
+                    cycles.append({
+                        'participants': list(path),
+                        'steps': [(receiver, giver, item) for receiver, giver, item, _ in cycle_steps],
+                        'score': sum(step[3] for step in cycle_steps) / len(cycle_steps)
+                    })
+
+                if len(path) < max_length:
+                    search(neighbour)
+
+                path.pop()
+                steps.pop()
+                if not complete:
+                    return
+
+        search(user_id)
+
+        # Prefer higher value, then fewer participants
+        cycles.sort(key=lambda cycle: (-cycle['score'], len(cycle['participants'])))
+        return cycles[:limit], complete
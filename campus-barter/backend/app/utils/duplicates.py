@@ -0,0 +1,236 @@
+"""
+Near-duplicate Listings for Campus Barter
+This module finds re-posted listings without comparing every pair of items.
+
+Each item gets a MinHash signature over the word shingles of its text when it
+is written. The signature is split into bands, and every band is hashed into
+an ItemBand row. Two listings whose signatures agree on a whole band share a
+bucket, so the near-duplicates of a new listing are found with one indexed
+lookup and then confirmed by comparing signatures. With 16 bands of 4 rows,
+pairs above about 0.5 Jaccard similarity are likely to share a bucket.
+
+- create_item flags the listing as a duplicate of the oldest near-identical
+  listing by the same owner, via Item.duplicate_of. Two students listing the
+  same textbook are separate offers and are never collapsed.
+- The 'duplicates.cluster' job signs existing items and clusters them.
+- Matching engines call collapse_duplicates() so one listing posted many
+  times takes a single slot in the top-k.
+"""
+
+import hashlib
+import random
+import re
+from collections import defaultdict
+from app.models.item import Item
+from app.models.duplicate import ItemBand
+from app import db
+
+NUM_PERMUTATIONS = 64
+BANDS = 16
+ROWS = NUM_PERMUTATIONS // BANDS
+
+# Estimated Jaccard similarity at which two listings count as the same one
+DUPLICATE_SIMILARITY = 0.8
+
+# Larger buckets are only compared against their oldest item
+MAX_PAIRWISE_BUCKET = 50
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(41)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERMUTATIONS)]
+
+def shingles(text, size=2):
+    """
+    Word n-grams of normalised text, or the words themselves for short texts
+    """
+    words = re.findall(r'[a-z0-9]+', text.lower())
+    if len(words) < size:
+        return set(words)
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def item_text(item):
+    return f'{item.title} {item.description} {item.category}'
+
+def compute_signature(text):
+    """
+    MinHash signature of a text: per permutation, the smallest hash of any shingle
+    """
+    hashes = [
+        int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), 'little')
+        for shingle in shingles(text)
+    ]
+    if not hashes:
+        return None
+    return [min((a * value + b) % _PRIME for value in hashes) for a, b in _PERMUTATIONS]
+
+def band_buckets(signature):
+    buckets = []
+    for band in range(BANDS):
+        rows = ','.join(str(value) for value in signature[band * ROWS:(band + 1) * ROWS])
+        buckets.append(f"{band}:{hashlib.blake2b(rows.encode(), digest_size=8).hexdigest()}")
+    return buckets
+
+def parse_signature(value):
+    return [int(part) for part in value.split(',')] if value else None
+
+def similarity(signature1, signature2):
+    """
+    Estimated Jaccard similarity: the fraction of matching signature rows
+    """
+    return sum(1 for a, b in zip(signature1, signature2) if a == b) / NUM_PERMUTATIONS
+
+def canonical_id(item):
+    return item.duplicate_of or item.id
+
+def sign_item(item):
+    """
+    Compute the item's signature and replace its LSH bucket rows.
+    Returns the signature
+    """
+    signature = compute_signature(item_text(item))
+    item.minhash = ','.join(str(value) for value in signature) if signature else None
+    item.signature_bands = [
+        ItemBand(bucket=bucket, campus=item.campus) for bucket in band_buckets(signature)
+    ] if signature else []
+    return signature
+
+def find_duplicates(item, signature=None):
+    """
+    Find the owner's other available listings that are near-duplicates of
+    the item. Returns (item, similarity) pairs, most similar first
+    """
+    signature = signature or parse_signature(item.minhash)
+    if not signature:
+        return []
+
+    item_ids = db.session.query(ItemBand.item_id).filter(ItemBand.bucket.in_(band_buckets(signature)))
+    if item.campus:
+        item_ids = item_ids.filter(ItemBand.campus == item.campus)
+    if item.id:
+        item_ids = item_ids.filter(ItemBand.item_id != item.id)
+
+    candidates = Item.query.filter(
+        Item.id.in_(item_ids.distinct()), Item.user_id == item.user_id, Item.status == 'available'
+    ).all()
+    duplicates = []
+    for candidate in candidates:
+        score = similarity(signature, parse_signature(candidate.minhash))
+        if score >= DUPLICATE_SIMILARITY:
+            duplicates.append((candidate, score))
+    duplicates.sort(key=lambda pair: (-pair[1], pair[0].id))
+    return duplicates
+
+def flag_duplicates(item):
+    """
+    Sign a new or edited listing and point it at the oldest listing it
+    duplicates. Returns the duplicates found
+    """
+    signature = sign_item(item)
+    duplicates = find_duplicates(item, signature)
+    item.duplicate_of = min(canonical_id(duplicate) for duplicate, _ in duplicates) if duplicates else None
+    if item.duplicate_of == item.id:
+        item.duplicate_of = None
+    return duplicates
+
+def release_duplicates(item):
+    """
+    Before deleting a listing, make the oldest of its duplicates the new
+    canonical listing for the rest
+    """
+    duplicates = Item.query.filter_by(duplicate_of=item.id).order_by(Item.id).all()
+    if not duplicates:
+        return
+    canonical = duplicates[0]
+    canonical.duplicate_of = None
+    for duplicate in duplicates[1:]:
+        duplicate.duplicate_of = canonical.id
+
+def cluster_duplicates(chunk_size=500):
+    """
+    Sign unsigned items, then cluster every available item with its
+    near-duplicates. Each cluster's oldest item becomes its canonical listing.
+    Returns counts of items signed, clusters and duplicates
+    """
+    # Sign items listed before duplicate detection, a chunk per transaction
+    signed = 0
+    last_id = 0
+    while True:
+        items = (
+            Item.query.filter(Item.minhash.is_(None), Item.id > last_id)
+            .order_by(Item.id).limit(chunk_size).all()
+        )
+        if not items:
+            break
+        signed += sum(1 for item in items if sign_item(item))
+        last_id = items[-1].id
+        db.session.commit()
+
+    signatures, current, owners = {}, {}, {}
+    for item_id, user_id, minhash, duplicate_of in db.session.query(
+        Item.id, Item.user_id, Item.minhash, Item.duplicate_of
+    ).filter(Item.status == 'available', Item.minhash.isnot(None)):
+        signatures[item_id] = parse_signature(minhash)
+        current[item_id] = duplicate_of
+        owners[item_id] = user_id
+
+    # Union-find over the items sharing a bucket whose signatures agree
+    parent = {}
+
+    def find(item_id):
+        while parent.get(item_id, item_id) != item_id:
+            parent[item_id] = parent.get(parent[item_id], parent[item_id])
+            item_id = parent[item_id]
+        return item_id
+
+    def union(a, b):
+        a, b = find(a), find(b)
+        if a != b:
+            parent[max(a, b)] = min(a, b)
+
+    # Only one owner's listings can duplicate each other
+    buckets = defaultdict(list)
+    for item_id, campus, bucket in db.session.query(ItemBand.item_id, ItemBand.campus, ItemBand.bucket):
+        if item_id in signatures:
+            buckets[(campus, owners[item_id], bucket)].append(item_id)
+
+    for members in buckets.values():
+        if len(members) < 2:
+            continue
+        members.sort()
+        anchors = members if len(members) <= MAX_PAIRWISE_BUCKET else members[:1]
+        for i, anchor in enumerate(anchors):
+            for other in members[i + 1:]:
+                if similarity(signatures[anchor], signatures[other]) >= DUPLICATE_SIMILARITY:
+                    union(anchor, other)
+
+    roots = {item_id: find(item_id) for item_id in signatures}
+    changes = []
+    for item_id, root in roots.items():
+        duplicate_of = root if root != item_id else None
+        if current[item_id] != duplicate_of:
+            changes.append({'id': item_id, 'duplicate_of': duplicate_of})
+    if changes:
+        db.session.execute(db.update(Item), changes)
+    db.session.commit()
+
+    return {
+        'signed': signed,
+        'clusters': len({root for item_id, root in roots.items() if root != item_id}),
+        'duplicates': sum(1 for item_id, root in roots.items() if root != item_id)
+    }
+
+def collapse_duplicates(results, key):
+    """
+    Keep only the best-ranked result per duplicate cluster. `key` names the
+    item dict in each result, e.g. 'item' or 'recommended_item'
+    """
+    seen = set()
+    collapsed = []
+    for result in results:
+        item = result[key]
+        cluster = item.get('duplicate_of') or item['id']
+        if cluster in seen:
+            continue
+        seen.add(cluster)
+        collapsed.append(result)
+    return collapsed
@@ -0,0 +1,333 @@
+"""
+Embedding Store for Campus Barter
+This module keeps item embeddings in memory-mapped numpy files shared by every
+worker process, instead of a list of Python floats per item per worker.
+
+Layout under EMBEDDING_STORE_DIR/<provider>:
+    meta.json                 current generation, dimensions and dtype
+    vectors-<gen>.npy         one unit vector per row, float32 or int8
+    scales-<gen>.npy          per-row scale of the int8 rows
+    fingerprints-<gen>.npy    hash of the text each row was embedded from
+    rows-<gen>.npy            item id -> row, -1 where absent
+    delta-<gen>.bin           append-only (id, fingerprint, float32 vector) records
+    lock                      flock'ed by appenders and compaction
+
+Workers map the generation files read-only, so the OS page cache holds one
+copy however many workers there are, and similarity is computed on the mapped
+rows. New embeddings are appended to the delta file, which each worker tails
+into memory. Compaction folds the delta into a new generation and is run by
+the 'embeddings.compact' job once the delta grows past EMBEDDING_DELTA_MAX_ROWS.
+
+Each store is shared by the request threads of its worker, so its in-memory
+view of the files is only read or changed under the store's lock.
+
+A row only counts for an item if its fingerprint matches the item's current
+text, so edited listings are re-embedded and stale rows are dropped at the
+next compaction.
+
+The store is keyed by provider because the dimensions differ between them;
+if the embedding model changes, delete the provider's directory.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from flask import current_app
+
+# Rows scored per block, which bounds the temporary float32 copy of int8 rows
+SCORE_BLOCK_ROWS = 8192
+
+def fingerprint(text):
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), 'little')
+
+def get_embedding_store(provider):
+    """
+    Get the embedding store for a provider in the current app, opening it on first use
+    """
+    app = current_app._get_current_object()
+    stores = app.extensions.setdefault('embedding_stores', {})
+    store = stores.get(provider)
+    if store is None:
+        store = EmbeddingStore(
+            os.path.join(app.config['EMBEDDING_STORE_DIR'], provider),
+            dtype=app.config['EMBEDDING_STORE_DTYPE']
+        )
+        stores[provider] = store
+    return store
+
+def schedule_compaction(store):
+    """
+    Queue a compaction once the store's delta has grown past EMBEDDING_DELTA_MAX_ROWS
+    """
+    from app.utils.jobs import enqueue
+    from app import db
+
+    if store.delta_rows < current_app.config['EMBEDDING_DELTA_MAX_ROWS']:
+        return
+    provider = os.path.basename(store.root)
+    enqueue('embeddings.compact', {'provider': provider}, key=f'embeddings.compact:{provider}')
+    db.session.commit()
+
+class EmbeddingStore:
+    """
+    Item embeddings in a memory-mapped base matrix plus an append-only delta
+    """
+
+    def __init__(self, root, dtype='float32'):
+        if dtype not in ('float32', 'int8'):
+            raise ValueError(f'Unsupported embedding dtype: {dtype}')
+        self.root = root
+        self.dtype = dtype
+        self._meta_mtime = None
+        self._meta = {'generation': 0, 'dimensions': None, 'dtype': dtype, 'rows': 0}
+        self._base = None
+        self._delta = {}
+        self._delta_offset = 0
+
+        # Reentrant, as the public methods refresh while holding it
+        self._lock = threading.RLock()
+
+    def _path(self, name):
+        return os.path.join(self.root, name)
+
+    @contextmanager
+    def _locked(self):
+        # This worker's threads first, then other processes
+        os.makedirs(self.root, exist_ok=True)
+        with self._lock, open(self._path('lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    @property
+    def dimensions(self):
+        return self._meta['dimensions']
+
+    @property
+    def delta_rows(self):
+        with self._lock:
+            self.refresh()
+            return len(self._delta)
+
+    def _record_size(self):
+        return 16 + 4 * self.dimensions
+
+    def refresh(self):
+        """
+        Pick up a new generation or delta records written by other workers
+        """
+        import numpy as np
+
+        with self._lock:
+            try:
+                mtime = os.stat(self._path('meta.json')).st_mtime_ns
+            except FileNotFoundError:
+                return
+            if mtime != self._meta_mtime:
+                with open(self._path('meta.json')) as f:
+                    meta = json.load(f)
+                self._meta, self._meta_mtime = meta, mtime
+                self._base = None
+                self._delta, self._delta_offset = {}, 0
+                if meta['rows']:
+                    generation = meta['generation']
+                    self._base = {
+                        name: np.load(self._path(f'{name}-{generation}.npy'), mmap_mode='r')
+                        for name in ('vectors', 'fingerprints', 'rows') + (('scales',) if meta['dtype'] == 'int8' else ())
+                    }
+
+            # Tail the delta file from where we stopped
+            if not self.dimensions:
+                return
+            try:
+                with open(self._path(f"delta-{self._meta['generation']}.bin"), 'rb') as f:
+                    f.seek(self._delta_offset)
+                    data = f.read()
+            except FileNotFoundError:
+                return
+            size = self._record_size()
+            complete = len(data) - len(data) % size
+            for start in range(0, complete, size):
+                item_id, item_fingerprint = np.frombuffer(data, dtype='<u8', count=2, offset=start).tolist()
+                self._delta[item_id] = (item_fingerprint, np.frombuffer(data, dtype='<f4', count=self.dimensions, offset=start + 16))
+            self._delta_offset += complete
+
+    def _base_rows(self, fingerprints):
+        """
+        Base rows for the items whose stored fingerprint still matches, as
+        (item ids, row numbers) with rows in ascending order
+        """
+        import numpy as np
+
+        if self._base is None:
+            return [], np.array([], dtype=np.int64)
+        rows_by_id = self._base['rows']
+        item_ids = np.array([item_id for item_id in fingerprints if item_id not in self._delta and 0 <= item_id < len(rows_by_id)], dtype=np.int64)
+        if not len(item_ids):
+            return [], np.array([], dtype=np.int64)
+        rows = np.asarray(rows_by_id[item_ids])
+        expected = np.array([fingerprints[int(item_id)] for item_id in item_ids], dtype=np.uint64)
+        present = rows >= 0
+        present[present] = np.asarray(self._base['fingerprints'][rows[present]]) == expected[present]
+        item_ids, rows = item_ids[present], rows[present]
+        order = np.argsort(rows)
+        return [int(item_id) for item_id in item_ids[order]], rows[order]
+
+    def _read_rows(self, rows):
+        import numpy as np
+
+        vectors = np.asarray(self._base['vectors'][rows], dtype=np.float32)
+        if self._meta['dtype'] == 'int8':
+            vectors *= np.asarray(self._base['scales'][rows])[:, None]
+        return vectors
+
+    def contains(self, fingerprints):
+        """
+        The item ids in an id -> fingerprint dict with a current embedding
+        """
+        with self._lock:
+            self.refresh()
+            found = {item_id for item_id, item_fingerprint in fingerprints.items() if self._delta.get(item_id, (None,))[0] == item_fingerprint}
+            found.update(self._base_rows(fingerprints)[0])
+            return found
+
+    def get(self, item_id, item_fingerprint):
+        """
+        An item's embedding as a float32 array, or None
+        """
+        with self._lock:
+            self.refresh()
+            if item_id in self._delta:
+                stored_fingerprint, vector = self._delta[item_id]
+                return vector if stored_fingerprint == item_fingerprint else None
+            item_ids, rows = self._base_rows({item_id: item_fingerprint})
+            return self._read_rows(rows)[0] if item_ids else None
+
+    def similarities(self, query, fingerprints):
+        """
+        Cosine similarity of a query vector to every item in an
+        id -> fingerprint dict that has a current embedding
+        """
+        import numpy as np
+
+        with self._lock:
+            self.refresh()
+            query = np.asarray(query, dtype=np.float32)
+            query = query / (float(np.linalg.norm(query)) or 1.0)
+            scores = {}
+
+            item_ids, rows = self._base_rows(fingerprints)
+            for start in range(0, len(rows), SCORE_BLOCK_ROWS):
+                block = self._read_rows(rows[start:start + SCORE_BLOCK_ROWS]) @ query
+                scores.update(zip(item_ids[start:start + SCORE_BLOCK_ROWS], block.tolist()))
+
+            for item_id, item_fingerprint in fingerprints.items():
+                entry = self._delta.get(item_id)
+                if entry and entry[0] == item_fingerprint:
+                    scores[item_id] = float(entry[1] @ query)
+            return scores
+
+    def append(self, embeddings):
+        """
+        Append id -> (fingerprint, vector) entries to the delta file
+        """
+        import numpy as np
+
+        if not embeddings:
+            return
+        with self._locked():
+            self.refresh()
+            dimensions = len(next(iter(embeddings.values()))[1])
+            if self.dimensions is None:
+                self._meta = {'generation': 0, 'dimensions': dimensions, 'dtype': self.dtype, 'rows': 0}
+                self._write_meta()
+            elif dimensions != self.dimensions:
+                raise ValueError(f'Embedding has {dimensions} dimensions, the store at {self.root} holds {self.dimensions}')
+
+            records = []
+            for item_id, (item_fingerprint, vector) in embeddings.items():
+                vector = np.asarray(vector, dtype='<f4')
+                vector = vector / (float(np.linalg.norm(vector)) or 1.0)
+                records.append(np.array([item_id, item_fingerprint], dtype='<u8').tobytes() + vector.tobytes())
+            with open(self._path(f"delta-{self._meta['generation']}.bin"), 'ab') as f:
+                f.write(b''.join(records))
+        self.refresh()
+
+    def _write_meta(self):
+        path = self._path('meta.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self._meta, f)
+        os.replace(path + '.tmp', path)
+        # Same-size rewrites within the mtime granularity must still be seen
+        self._meta_mtime = None
+
+    def compact(self, live_ids=None):
+        """
+        Fold the delta into a new generation, keeping only the current row per
+        item and, if given, only the items in live_ids. Returns the row count
+        """
+        import numpy as np
+
+        with self._locked():
+            self.refresh()
+            if not self.dimensions:
+                return 0
+
+            # Latest vector per item: delta entries replace base rows
+            item_ids, fingerprints, vectors = [], [], []
+            if self._base is not None:
+                base_ids = np.flatnonzero(np.asarray(self._base['rows']) >= 0)
+                base_rows = np.asarray(self._base['rows'])[base_ids]
+                keep = np.array([
+                    int(item_id) not in self._delta and (live_ids is None or int(item_id) in live_ids)
+                    for item_id in base_ids
+                ], dtype=bool)
+                for start in range(0, int(keep.sum()), SCORE_BLOCK_ROWS):
+                    rows = base_rows[keep][start:start + SCORE_BLOCK_ROWS]
+                    vectors.append(self._read_rows(rows))
+                item_ids.extend(base_ids[keep].tolist())
+                fingerprints.extend(np.asarray(self._base['fingerprints'])[base_rows[keep]].tolist())
+            for item_id, (item_fingerprint, vector) in self._delta.items():
+                if live_ids is None or item_id in live_ids:
+                    item_ids.append(item_id)
+                    fingerprints.append(item_fingerprint)
+                    vectors.append(vector[None, :])
+
+            matrix = np.concatenate(vectors) if vectors else np.zeros((0, self.dimensions), dtype=np.float32)
+            generation = self._meta['generation'] + 1
+            rows_by_id = np.full(max(item_ids, default=-1) + 1, -1, dtype=np.int64)
+            rows_by_id[item_ids] = np.arange(len(item_ids))
+            arrays = {
+                'fingerprints': np.array(fingerprints, dtype=np.uint64),
+                'rows': rows_by_id,
+            }
+            if self.dtype == 'int8':
+                scales = np.abs(matrix).max(axis=1) / 127 if len(matrix) else np.zeros(0, dtype=np.float32)
+                scales[scales == 0] = 1.0
+                arrays['vectors'] = np.round(matrix / scales[:, None]).astype(np.int8)
+                arrays['scales'] = scales.astype(np.float32)
+            else:
+                arrays['vectors'] = matrix.astype(np.float32)
+
+            for name, array in arrays.items():
+                with open(self._path(f'{name}-{generation}.npy'), 'wb') as f:
+                    np.save(f, array)
+            open(self._path(f'delta-{generation}.bin'), 'wb').close()
+
+            previous = self._meta['generation']
+            self._meta = {'generation': generation, 'dimensions': self.dimensions, 'dtype': self.dtype, 'rows': len(item_ids)}
+            self._write_meta()
+
+            # Workers still mapping the old files keep reading them until they refresh
+            for name in ('vectors-{}.npy', 'scales-{}.npy', 'fingerprints-{}.npy', 'rows-{}.npy', 'delta-{}.bin'):
+                try:
+                    os.unlink(self._path(name.format(previous)))
+                except FileNotFoundError:
+                    pass
+        self.refresh()
+        return len(item_ids)
@@ -0,0 +1,207 @@
+"""
+Trade Event Hub for Campus Barter
+This module pushes new trade messages and status changes to the two parties
+of a trade over Server-Sent Events.
+
+Route handlers write TradeEvent rows in the same transaction as the change
+they describe. Each worker process runs one EventHub thread that tails the
+TradeEvent table and fans the rows out to the streams connected to that
+worker, so the table acts as a local broker shared by every gunicorn worker.
+Streaming responses keep a worker busy, so deployments serving /events should
+run gunicorn with threaded or gevent workers.
+"""
+
+import json
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from app.models.trade_event import TradeEvent
+from app import db
+
+def publish_trade_event(trade, event_type, data):
+    """
+    Queue an event for both parties of a trade on the current session.
+    The rows are committed together with the caller's change.
+    """
+    for user_id in {trade.initiator_id, trade.recipient_id}:
+        db.session.add(TradeEvent(
+            user_id=user_id,
+            trade_id=trade.id,
+            event_type=event_type,
+            payload=json.dumps(data)
+        ))
+
+def notify_event_hub():
+    """
+    Wake the local hub after a commit so streams on this worker see the
+    event without waiting for the next poll
+    """
+    hub = current_app.extensions.get('event_hub')
+    if hub:
+        hub.wake()
+
+def get_event_hub():
+    """
+    Get the event hub for the current app, creating it on first use
+    """
+    app = current_app._get_current_object()
+    hub = app.extensions.get('event_hub')
+    if hub is None:
+        hub = EventHub(
+            app,
+            poll_interval=app.config['EVENT_POLL_INTERVAL'],
+            retention=app.config['EVENT_RETENTION_SECONDS']
+        )
+        app.extensions['event_hub'] = hub
+    return hub
+
+def format_sse(event):
+    """
+    Format an event dict as a Server-Sent Events frame
+    """
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+class Subscription:
+    """
+    A single connected stream for one user
+    """
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.queue = queue.Queue()
+
+    def get(self, timeout):
+        return self.queue.get(timeout=timeout)
+
+class EventHub:
+    """
+    Per-process fan-out of TradeEvent rows to connected subscribers
+    """
+
+    def __init__(self, app, poll_interval=0.25, retention=3600):
+        self.app = app
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._last_id = None
+        self._last_prune = 0
+
+    def subscribe(self, user_id):
+        """
+        Register a stream for a user and make sure the poller is running
+        """
+        subscription = Subscription(user_id)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+        self._ensure_started()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def wake(self):
+        self._wakeup.set()
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            if self._last_id is None:
+                self._last_id = db.session.query(db.func.max(TradeEvent.id)).scalar() or 0
+            self._thread = threading.Thread(target=self._run, name='event-hub', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        with self.app.app_context():
+            while True:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                try:
+                    self.poll()
+                except Exception as e:
+                    print(f"Error polling trade events: {str(e)}")
+                finally:
+                    db.session.remove()
+
+    def poll(self):
+        """
+        Dispatch every event committed since the last poll
+        """
+        with self._lock:
+            user_ids = list(self._subscribers.keys())
+
+        last_id = self._last_id or 0
+        rows = TradeEvent.query.filter(TradeEvent.id > last_id).order_by(TradeEvent.id).all()
+
+        for row in rows:
+            self._last_id = row.id
+            if row.user_id not in user_ids:
+                continue
+
+            event = row.to_dict()
+            with self._lock:
+                subscribers = list(self._subscribers.get(row.user_id, ()))
+            for subscription in subscribers:
+                subscription.queue.put(event)
+
+        self._prune()
+
+    def _prune(self):
+        # Old events are only needed for reconnecting clients, so trim them occasionally
+        now = time.monotonic()
+        if now - self._last_prune < 60:
+            return
+        self._last_prune = now
+
+        cutoff = datetime.utcnow() - timedelta(seconds=self.retention)
+        TradeEvent.query.filter(TradeEvent.created_at < cutoff).delete(synchronize_session=False)
+        db.session.commit()
+
+def stream_events(hub, subscription, last_event_id=None, heartbeat=15):
+    """
+    Generate SSE frames for a subscription, replaying missed events first
+    """
+    try:
+        yield 'retry: 3000\n\n'
+
+        # Replay anything the client missed while disconnected
+        delivered_id = last_event_id or 0
+        if last_event_id is not None:
+            with hub.app.app_context():
+                missed = TradeEvent.query.filter(
+                    TradeEvent.user_id == subscription.user_id,
+                    TradeEvent.id > last_event_id
+                ).order_by(TradeEvent.id).all()
+                missed = [row.to_dict() for row in missed]
+            for event in missed:
+                delivered_id = event['id']
+                yield format_sse(event)
+
+        while True:
+            try:
+                event = subscription.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ': keep-alive\n\n'
+                continue
+
+            # Skip events already sent during the replay
+            if event['id'] <= delivered_id:
+                continue
+            delivered_id = event['id']
+            yield format_sse(event)
+    finally:
+        hub.unsubscribe(subscription)
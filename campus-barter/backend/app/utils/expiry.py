@@ -0,0 +1,89 @@
+"""
+Listing Expiry for Campus Barter
+Listings expire LISTING_TTL_DAYS after they are posted or last renewed, so
+the matching engines, the cycle index and GET /api/items only carry items
+someone still wants to trade. Owners renew a listing to keep it up, or to
+bring back an expired one.
+
+The 'items.expire' job sweeps expired listings in chunks of
+ITEM_EXPIRY_BATCH_SIZE, one transaction each, pausing ITEM_EXPIRY_BATCH_PAUSE
+seconds between chunks and stopping after ITEM_EXPIRY_MAX_PER_RUN items so a
+backlog cannot hog the database; the next run picks up the rest. Every
+expired listing is logged to the change feed and dropped from this worker's
+candidate and cycle indexes, like any other status change.
+"""
+
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from app.models.item import Item
+from app.utils import candidates
+from app.utils.changes import record_item_change
+from app.utils.cycles import notify_item_changed
+from app import db
+
+def listing_expiry(now=None):
+    """
+    When a listing posted or renewed now expires
+    """
+    return (now or datetime.utcnow()) + timedelta(days=current_app.config['LISTING_TTL_DAYS'])
+
+def renew_item(item, now=None):
+    """
+    Extend a listing's expiry, making it available again if it had expired
+    """
+    item.expires_at = listing_expiry(now)
+    if item.status == 'expired':
+        item.status = 'available'
+
+def expire_items(batch_size=None, max_items=None, pause=None):
+    """
+    Mark available listings past their expiry as expired, a chunk per
+    transaction. Returns the number of listings expired and whether any
+    expired ones were left for the next run
+    """
+    config = current_app.config
+    batch_size = batch_size or config['ITEM_EXPIRY_BATCH_SIZE']
+    max_items = max_items or config['ITEM_EXPIRY_MAX_PER_RUN']
+    pause = config['ITEM_EXPIRY_BATCH_PAUSE'] if pause is None else pause
+
+    expired = 0
+    while True:
+        now = datetime.utcnow()
+        due = (Item.status == 'available') & (Item.expires_at < now)
+        item_ids = [
+            item_id for item_id, in
+            db.session.query(Item.id).filter(due).order_by(Item.expires_at, Item.id).limit(min(batch_size, max_items - expired))
+        ]
+        if not item_ids:
+            return {'expired': expired, 'more': False}
+
+        # Re-check the expiry in the UPDATE so a renewal since the read wins
+        db.session.execute(
+            db.update(Item)
+            .where(Item.id.in_(item_ids), due)
+            .values(status='expired')
+            .execution_options(synchronize_session=False)
+        )
+        items = Item.query.filter(Item.id.in_(item_ids), Item.status == 'expired').populate_existing().all()
+        for item in items:
+            record_item_change(item, 'update')
+        db.session.commit()
+
+        for item in items:
+            notify_item_changed(item)
+            candidates.notify_item_changed(item)
+        expired += len(items)
+
+        if expired >= max_items:
+            return {'expired': expired, 'more': db.session.query(Item.id).filter(due).first() is not None}
+        if pause:
+            time.sleep(pause)
+
+def backfill_expiry():
+    """
+    Give listings posted before expiry was tracked a full term from now
+    """
+    Item.query.filter(Item.expires_at.is_(None)).update(
+        {'expires_at': listing_expiry()}, synchronize_session=False
+    )
@@ -0,0 +1,87 @@
+"""
+Password Hashing for Campus Barter
+This module runs password hashing in a small bounded executor so a burst of
+logins cannot tie up every worker thread with PBKDF2.
+
+At most PASSWORD_HASH_WORKERS hashes run at once and at most
+PASSWORD_HASH_QUEUE more may wait; anything beyond that is refused with
+HasherBusy so the caller can answer 503 straight away instead of queueing.
+A hash that takes longer than the timeout is reported the same way.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+class HasherBusy(Exception):
+    """
+    Raised when the hashing queue is full or a hash times out
+    """
+    pass
+
+def get_password_hasher():
+    """
+    Get the password hasher for the current app, creating it on first use
+    """
+    app = current_app._get_current_object()
+    hasher = app.extensions.get('password_hasher')
+    if hasher is None:
+        hasher = PasswordHasher(
+            method=app.config['PASSWORD_HASH_METHOD'],
+            salt_length=app.config['PASSWORD_SALT_LENGTH'],
+            max_workers=app.config['PASSWORD_HASH_WORKERS'],
+            max_queue=app.config['PASSWORD_HASH_QUEUE']
+        )
+        app.extensions['password_hasher'] = hasher
+    return hasher
+
+class PasswordHasher:
+    """
+    Bounded executor around werkzeug's password hashing
+    """
+
+    def __init__(self, method='pbkdf2:sha256:260000', salt_length=16, max_workers=2, max_queue=16, timeout=10):
+        self.method = method
+        self.salt_length = salt_length
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+
+    def _run(self, func, *args):
+        # Refuse work instead of queueing without bound
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy()
+        try:
+            future = self._executor.submit(func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise HasherBusy()
+
+    def hash(self, password):
+        """
+        Hash a password with the configured parameters
+        """
+        return self._run(generate_password_hash, password, self.method, self.salt_length)
+
+    def verify(self, password_hash, password):
+        """
+        Check a password against a stored hash
+        """
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """
+        Check whether a stored hash was made with different parameters
+        """
+        stored_method = password_hash.split('$', 1)[0]
+        if stored_method == self.method:
+            return False
+
+        # A method without an explicit iteration count matches werkzeug's default for it
+        return not stored_method.startswith(self.method + ':')
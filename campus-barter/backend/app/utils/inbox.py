@@ -0,0 +1,160 @@
+"""
+Trade Badges for Campus Barter
+The frontend shows how many trade messages are unread and how many trade
+requests are waiting. Counting them from the trade and message tables means
+loading every trade a user has, so each user has a TradeCounters row that
+the trade routes keep current, and GET /api/trades/summary reads that one
+row by primary key.
+
+Unread messages are also counted per trade, in a TradeReadMarker for each
+party. A new message adds one to the other party's marker and counters;
+marking the trade read (or replying) takes the marker's count back off.
+
+As with UserStats, every update is relative (x = x + delta) and runs in the
+caller's transaction, so counters commit or roll back with the change they
+count and concurrent requests cannot lose each other's increments.
+"""
+
+from collections import Counter
+from sqlalchemy.exc import IntegrityError
+from app.models.inbox import TradeCounters, TradeReadMarker
+from app.models.message import Message
+from app.models.trade import Trade
+from app.utils.negotiation import proposer_id, responder_id
+from app import db
+
+def _increment(model, key, **deltas):
+    """
+    Add to counters on the row of model with primary key `key`, creating it
+    if needed
+    """
+    if not db.session.get(model, key):
+        # A concurrent request may create the row first; keep the caller's transaction intact
+        try:
+            with db.session.begin_nested():
+                db.session.add(model(**key, **{name: 0 for name in deltas}))
+        except IntegrityError:
+            pass
+
+    columns = {getattr(model, name): getattr(model, name) + delta for name, delta in deltas.items() if delta}
+    if columns:
+        model.query.filter_by(**key).update(columns, synchronize_session=False)
+
+    # Later reads in this session should see the new totals
+    row = db.session.get(model, key)
+    if row is not None:
+        db.session.expire(row)
+
+def increment_counters(user_id, **deltas):
+    """
+    Add to a user's trade counters in the current transaction
+    """
+    _increment(TradeCounters, {'user_id': user_id}, **deltas)
+
+def get_trade_summary(user_id):
+    """
+    Get a user's trade counters, all zero if they have none yet
+    """
+    counters = db.session.get(TradeCounters, user_id)
+    if counters is None:
+        counters = TradeCounters(user_id=user_id, unread_messages=0, pending_received=0, pending_sent=0)
+    return counters
+
+def pending_deltas(status, proposer, responder):
+    if status != 'pending':
+        return Counter()
+    return Counter({(responder, 'pending_received'): 1, (proposer, 'pending_sent'): 1})
+
+def record_pending_change(trade, previous_status=None, previous_proposer_id=None):
+    """
+    Update both parties' pending counts for a trade that was created, changed
+    status or changed hands through a counter-offer. previous_status is None
+    for a new trade
+    """
+    deltas = pending_deltas(trade.status, proposer_id(trade), responder_id(trade))
+    if previous_status is not None:
+        previous_proposer = previous_proposer_id or trade.initiator_id
+        previous_responder = trade.recipient_id if previous_proposer == trade.initiator_id else trade.initiator_id
+        deltas.subtract(pending_deltas(previous_status, previous_proposer, previous_responder))
+
+    by_user = {}
+    for (user_id, name), delta in deltas.items():
+        if delta:
+            by_user.setdefault(user_id, {})[name] = delta
+    for user_id, user_deltas in by_user.items():
+        increment_counters(user_id, **user_deltas)
+
+def record_message(message, trade):
+    """
+    Count a new message as unread for the other party. Sending a message
+    marks the trade read for the sender
+    """
+    other_id = trade.recipient_id if message.sender_id == trade.initiator_id else trade.initiator_id
+    _increment(TradeReadMarker, {'trade_id': trade.id, 'user_id': other_id}, unread=1)
+    increment_counters(other_id, unread_messages=1)
+    mark_trade_read(trade, message.sender_id, message.id)
+
+def mark_trade_read(trade, user_id, last_message_id=None):
+    """
+    Mark a trade's messages read for user_id, up to last_message_id or the
+    latest. Returns the read marker
+    """
+    if last_message_id is None:
+        last_message_id = db.session.query(db.func.max(Message.id)).filter(Message.trade_id == trade.id).scalar()
+
+    key = {'trade_id': trade.id, 'user_id': user_id}
+    marker = db.session.get(TradeReadMarker, key)
+    read = marker.unread if marker else 0
+    if read:
+        # Relative, so messages arriving meanwhile stay unread
+        _increment(TradeReadMarker, key, unread=-read)
+        increment_counters(user_id, unread_messages=-read)
+    else:
+        _increment(TradeReadMarker, key)
+
+    marker = db.session.get(TradeReadMarker, key)
+    marker.last_read_message_id = last_message_id
+    return marker
+
+def forget_trades(trade_ids):
+    """
+    Take the unread messages of trades about to be deleted off their
+    readers' counters and drop the markers
+    """
+    unread = Counter()
+    for user_id, count in (
+        db.session.query(TradeReadMarker.user_id, db.func.sum(TradeReadMarker.unread))
+        .filter(TradeReadMarker.trade_id.in_(trade_ids), TradeReadMarker.unread > 0)
+        .group_by(TradeReadMarker.user_id)
+    ):
+        unread[user_id] += count
+    for user_id, count in unread.items():
+        increment_counters(user_id, unread_messages=-count)
+
+    db.session.execute(
+        db.delete(TradeReadMarker).where(TradeReadMarker.trade_id.in_(trade_ids))
+        .execution_options(synchronize_session=False)
+    )
+
+def rebuild_trade_counters():
+    """
+    Recompute every user's counters from the pending trades and read markers.
+    Messages sent before markers were kept count as read
+    """
+    totals = Counter()
+    for trade in Trade.query.filter(Trade.status == 'pending'):
+        totals.update(pending_deltas(trade.status, proposer_id(trade), responder_id(trade)))
+    for user_id, count in (
+        db.session.query(TradeReadMarker.user_id, db.func.sum(TradeReadMarker.unread))
+        .group_by(TradeReadMarker.user_id)
+    ):
+        totals[(user_id, 'unread_messages')] += count or 0
+
+    TradeCounters.query.delete(synchronize_session=False)
+    users = {}
+    for (user_id, name), count in totals.items():
+        users.setdefault(user_id, {'unread_messages': 0, 'pending_received': 0, 'pending_sent': 0})[name] = count
+    for user_id, counts in users.items():
+        db.session.add(TradeCounters(user_id=user_id, **counts))
+    db.session.commit()
+    return len(users)
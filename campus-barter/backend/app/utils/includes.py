@@ -0,0 +1,154 @@
+"""
+Relation Expansion for Campus Barter
+Read endpoints return foreign keys (a trade's initiator_id, an item's
+user_id), so a client showing a trade used to make one more request per item
+and user it references. ?include=items.offered_item,initiator asks the
+endpoint to embed those records instead.
+
+Expansion works on the serialized dicts, one level of the include tree at a
+time. Every relation on a level queues the keys it needs with a Loader, and
+the loader then fetches each model with a single IN query, however many rows
+are being expanded: a page of 50 trades with include=initiator,recipient
+costs one extra query for users, not 100.
+"""
+
+from collections import namedtuple
+from app.models.item import Item
+from app.models.user import User
+
+# Deepest include path accepted, e.g. items.offered_item.owner
+MAX_INCLUDE_DEPTH = 3
+
+# A relation of a serialized entity, embedded under its name:
+# - target: entity name of the related record(s)
+# - key: field of the parent dict holding the lookup key
+# - column: column of the target model matched against that key, None if
+#   the relation is already embedded by to_dict and only needs descending into
+# - many: whether the relation is a list
+Relation = namedtuple('Relation', 'target key column many')
+
+RELATIONS = {
+    'trade': {
+        'items': Relation('trade_item', 'items', None, True),
+        'messages': Relation('message', 'messages', None, True),
+        'initiator': Relation('user', 'initiator_id', User.id, False),
+        'recipient': Relation('user', 'recipient_id', User.id, False)
+    },
+    'trade_item': {
+        'offered_item': Relation('item', 'offered_item_id', Item.id, False),
+        'requested_item': Relation('item', 'requested_item_id', Item.id, False)
+    },
+    'item': {
+        'owner': Relation('user', 'user_id', User.id, False),
+        'original': Relation('item', 'duplicate_of', Item.id, False)
+    },
+    'user': {
+        'items': Relation('item', 'id', Item.user_id, True)
+    },
+    'message': {
+        'sender': Relation('user', 'sender_id', User.id, False)
+    }
+}
+
+class InvalidInclude(Exception):
+    """
+    Raised when an include parameter names an unknown relation
+    """
+    pass
+
+def parse_include(value, entity):
+    """
+    Parse an include parameter into a tree of relation names, checked against
+    the relations of entity. 'items.offered_item,initiator' becomes
+    {'items': {'offered_item': {}}, 'initiator': {}}
+    """
+    tree = {}
+    for path in (value or '').split(','):
+        path = path.strip()
+        if not path:
+            continue
+        names = path.split('.')
+        if len(names) > MAX_INCLUDE_DEPTH:
+            raise InvalidInclude(f'Include paths may be at most {MAX_INCLUDE_DEPTH} levels deep: {path}')
+
+        node, current = tree, entity
+        for name in names:
+            relation = RELATIONS[current].get(name)
+            if relation is None:
+                raise InvalidInclude(f'Unknown relation for {current}: {name}')
+            node = node.setdefault(name, {})
+            current = relation.target
+    return tree
+
+class Loader:
+    """
+    Batches lookups by column: queue keys with load(), then fetch() runs one
+    IN query per column for everything queued. Results are cached, so a
+    record referenced twice is only fetched once
+    """
+    def __init__(self):
+        self.columns = {}
+        self.pending = {}
+        self.cache = {}
+
+    @staticmethod
+    def name(column):
+        # Column attributes overload ==, so key them by name instead
+        return (column.class_.__name__, column.key)
+
+    def load(self, column, keys):
+        name = self.name(column)
+        self.columns[name] = column
+        cached = self.cache.setdefault(name, {})
+        self.pending.setdefault(name, set()).update(
+            key for key in keys if key is not None and key not in cached
+        )
+
+    def fetch(self):
+        for name, keys in self.pending.items():
+            if not keys:
+                continue
+            column = self.columns[name]
+            model = column.class_
+            cached = self.cache[name]
+            for key in keys:
+                cached[key] = []
+            for row in model.query.filter(column.in_(keys)).order_by(model.id):
+                cached[getattr(row, column.key)].append(row)
+        self.pending = {}
+
+    def get(self, column, key):
+        return self.cache.get(self.name(column), {}).get(key, [])
+
+def expand(records, entity, include):
+    """
+    Embed the relations in an include tree into serialized records of entity,
+    in place, one level of the tree at a time. Returns records
+    """
+    loader = Loader()
+    level = [(records, entity, include)] if include and records else []
+    while level:
+        # Queue every key this level needs before querying anything
+        for group, current, tree in level:
+            for name in tree:
+                relation = RELATIONS[current][name]
+                if relation.column is not None:
+                    loader.load(relation.column, [record.get(relation.key) for record in group])
+        loader.fetch()
+
+        next_level = []
+        for group, current, tree in level:
+            for name, children in tree.items():
+                relation = RELATIONS[current][name]
+                if relation.column is None:
+                    related = [child for record in group for child in record.get(relation.key) or []]
+                else:
+                    related = []
+                    for record in group:
+                        rows = [row.to_dict() for row in loader.get(relation.column, record.get(relation.key))]
+                        record[name] = rows if relation.many else (rows[0] if rows else None)
+                        related.extend(rows)
+                if children and related:
+                    next_level.append((related, relation.target, children))
+        level = next_level
+    return records
@@ -0,0 +1,217 @@
+"""
+Background Jobs for Campus Barter
+This module implements a small durable job queue stored in the Job table.
+
+Route handlers call enqueue() inside their own transaction and return right
+away; worker processes started with `python worker.py` claim jobs, run the
+registered handler and record the result.
+
+- Idempotent keys: a job enqueued with a key that is already queued is not
+  added again, the existing job is returned instead. A running job may have
+  read its data before the caller's change, so it is queued again and the
+  outcome of the run in progress is dropped.
+- Visibility timeout: a claimed job is locked for JOB_VISIBILITY_TIMEOUT
+  seconds. If its worker dies the lock expires and another worker picks it
+  up, so handlers must be safe to run more than once.
+- Retries: a failing job is retried with exponential backoff until it has
+  been attempted max_attempts times, then it is marked failed. That includes
+  attempts whose worker died.
+"""
+
+import json
+import os
+import random
+import socket
+import time
+import traceback
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from app.models.job import Job
+from app import db
+
+# kind -> handler(payload) returning a JSON-serialisable result
+HANDLERS = {}
+
+def job_handler(kind):
+    """
+    Register a function as the handler for a job kind
+    """
+    def decorator(func):
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+def enqueue(kind, payload=None, key=None, user_id=None, delay=0, max_attempts=5):
+    """
+    Add a job to the current session; it is committed with the caller's change.
+    With a key, an equivalent queued job is reused instead.
+    Returns the Job
+    """
+    run_at = datetime.utcnow() + timedelta(seconds=delay)
+
+    if key:
+        job = Job.query.filter_by(key=key).first()
+        if job:
+            # Still waiting, so it will see the caller's change
+            if job.status == 'queued':
+                return job
+
+            # Finished or in progress, so run it again under the same key.
+            # Clearing the lock makes the current run drop its outcome
+            job.payload = json.dumps(payload) if payload is not None else None
+            job.status = 'queued'
+            job.attempts = 0
+            job.max_attempts = max_attempts
+            job.run_at = run_at
+            job.result = None
+            job.last_error = None
+            job.finished_at = None
+            job.locked_by = None
+            job.locked_until = None
+            return job
+
+    job = Job(
+        kind=kind,
+        key=key,
+        payload=json.dumps(payload) if payload is not None else None,
+        user_id=user_id,
+        max_attempts=max_attempts,
+        run_at=run_at
+    )
+
+    # A concurrent request may insert the same key first; keep the caller's transaction intact
+    try:
+        with db.session.begin_nested():
+            db.session.add(job)
+    except IntegrityError:
+        return Job.query.filter_by(key=key).first()
+    return job
+
+def claim_job(worker_id, visibility_timeout):
+    """
+    Lock the next runnable job for this worker.
+    Jobs whose lock expired are runnable again, unless they have used all
+    their attempts. Returns the Job or None
+    """
+    now = datetime.utcnow()
+    expired = db.and_(Job.status == 'running', Job.locked_until < now)
+
+    # Their last worker died, and there are no attempts left to retry with
+    exhausted = Job.query.filter(expired, Job.attempts >= Job.max_attempts).update({
+        'status': 'failed',
+        'last_error': 'Worker lock expired on the last attempt',
+        'finished_at': now,
+        'locked_by': None,
+        'locked_until': None
+    }, synchronize_session=False)
+    if exhausted:
+        db.session.commit()
+
+    runnable = db.or_(
+        db.and_(Job.status == 'queued', Job.run_at <= now),
+        db.and_(expired, Job.attempts < Job.max_attempts)
+    )
+
+    candidates = db.session.query(Job.id).filter(runnable).order_by(Job.run_at).limit(10).all()
+    for (job_id,) in candidates:
+        # Conditional update so only one worker wins each job
+        claimed = Job.query.filter(Job.id == job_id, runnable).update({
+            'status': 'running',
+            'locked_by': worker_id,
+            'locked_until': now + timedelta(seconds=visibility_timeout),
+            'attempts': Job.attempts + 1
+        }, synchronize_session=False)
+        db.session.commit()
+
+        if claimed:
+            return Job.query.get(job_id)
+    return None
+
+def retry_delay(attempts, base, cap=600):
+    """
+    Exponential backoff with jitter for the given attempt number
+    """
+    delay = min(cap, base * (2 ** (attempts - 1)))
+    return delay * random.uniform(0.5, 1.0)
+
+def run_job(job, worker_id):
+    """
+    Run a claimed job and record the outcome.
+    Returns True if the job succeeded
+    """
+    job_id = job.id
+    handler = HANDLERS.get(job.kind)
+    payload = json.loads(job.payload) if job.payload else {}
+
+    try:
+        if handler is None:
+            raise LookupError(f'No handler registered for job kind {job.kind}')
+        result = handler(payload)
+        error = None
+    except Exception as e:
+        db.session.rollback()
+        result = None
+        error = f'{e.__class__.__name__}: {e}\n{traceback.format_exc(limit=5)}'
+
+    # Only record the outcome if we still hold the lock
+    job = Job.query.get(job_id)
+    if job.locked_by != worker_id or job.status != 'running':
+        db.session.rollback()
+        return False
+
+    now = datetime.utcnow()
+    if error is None:
+        job.status = 'done'
+        job.result = json.dumps(result) if result is not None else None
+        job.last_error = None
+        job.finished_at = now
+    elif job.attempts >= job.max_attempts:
+        print(f"Job {job.id} ({job.kind}) failed permanently: {error.splitlines()[0]}")
+        job.status = 'failed'
+        job.last_error = error
+        job.finished_at = now
+    else:
+        job.status = 'queued'
+        job.last_error = error
+        job.run_at = now + timedelta(seconds=retry_delay(job.attempts, current_app.config['JOB_RETRY_BASE_SECONDS']))
+
+    job.locked_by = None
+    job.locked_until = None
+    db.session.commit()
+    return error is None
+
+def work(app, worker_id=None, once=False, stop_event=None):
+    """
+    Claim and run jobs until stopped. With once=True, drain the runnable
+    jobs and return how many were run
+    """
+    # Make sure every handler is registered
+    from app.utils import tasks  # noqa: F401
+
+    worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}'
+    processed = 0
+
+    with app.app_context():
+        poll_interval = app.config['JOB_POLL_INTERVAL']
+        visibility_timeout = app.config['JOB_VISIBILITY_TIMEOUT']
+
+        while not (stop_event and stop_event.is_set()):
+            try:
+                job = claim_job(worker_id, visibility_timeout)
+                if job:
+                    run_job(job, worker_id)
+                    processed += 1
+            except Exception as e:
+                db.session.rollback()
+                job = None
+                print(f"Error in job worker {worker_id}: {str(e)}")
+            finally:
+                db.session.remove()
+
+            if job is None:
+                if once:
+                    return processed
+                time.sleep(poll_interval)
+
+    return processed
@@ -0,0 +1,151 @@
+"""
+Media Storage for Campus Barter
+This module stores uploaded item images on disk under the SHA-256 of their
+contents, so the same photo uploaded twice is kept once. The thumbnail and
+WebP variants are built by the 'media.variants' background job.
+
+Layout under MEDIA_ROOT:
+    ab/cd/<hash>.<ext>        original upload
+    ab/cd/<hash>.webp         full-size WebP
+    ab/cd/<hash>.thumb.webp   thumbnail
+
+A WebP original is its own full-size WebP variant, so it is never re-encoded
+over the file its hash names.
+
+Pillow is imported inside the functions that need it to keep it out of startup.
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+from flask import current_app
+
+# Pillow format name -> (extension, content type)
+ALLOWED_FORMATS = {
+    'JPEG': ('jpg', 'image/jpeg'),
+    'PNG': ('png', 'image/png'),
+    'GIF': ('gif', 'image/gif'),
+    'WEBP': ('webp', 'image/webp'),
+}
+
+VARIANTS = ('thumb', 'webp')
+
+class InvalidImage(Exception):
+    """
+    Raised when an upload is not an image we accept
+    """
+    pass
+
+def get_media_store():
+    """
+    Get the media store for the current app, creating it on first use
+    """
+    app = current_app._get_current_object()
+    store = app.extensions.get('media_store')
+    if store is None:
+        store = MediaStore(
+            app.config['MEDIA_ROOT'],
+            thumbnail_size=app.config['MEDIA_THUMBNAIL_SIZE']
+        )
+        app.extensions['media_store'] = store
+    return store
+
+def media_url(digest, variant=None):
+    return f'/api/media/{digest}/{variant}' if variant else f'/api/media/{digest}'
+
+def thumbnail_url(url):
+    """
+    Map an image URL to its thumbnail, leaving external URLs unchanged
+    """
+    if url.startswith('/api/media/') and url.count('/') == 3:
+        return url + '/thumb'
+    return url
+
+class MediaStore:
+    """
+    Content-addressed image files on the local filesystem
+    """
+
+    def __init__(self, root, thumbnail_size=320):
+        self.root = root
+        self.thumbnail_size = thumbnail_size
+
+    def _directory(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4])
+
+    def path(self, digest, extension):
+        return os.path.join(self._directory(digest), f'{digest}.{extension}')
+
+    def variant_path(self, digest, variant):
+        if variant == 'thumb':
+            return os.path.join(self._directory(digest), f'{digest}.thumb.webp')
+        return os.path.join(self._directory(digest), f'{digest}.webp')
+
+    def inspect(self, data):
+        """
+        Identify an upload without decoding the pixel data.
+        Returns (format, width, height)
+        """
+        from PIL import Image, UnidentifiedImageError
+
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                image_format = image.format
+                width, height = image.size
+                image.verify()
+        except (UnidentifiedImageError, OSError, SyntaxError):
+            raise InvalidImage('File is not a valid image')
+
+        if image_format not in ALLOWED_FORMATS:
+            raise InvalidImage(f'Unsupported image format: {image_format}')
+        return image_format, width, height
+
+    def save(self, data, extension):
+        """
+        Write an upload under its content hash.
+        Returns (hash, created) where created is False for a duplicate
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest, extension)
+        if os.path.exists(path):
+            return digest, False
+
+        directory = self._directory(digest)
+        os.makedirs(directory, exist_ok=True)
+
+        # Write to a temporary file first so readers never see a partial image
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as tmp:
+            tmp.write(data)
+        os.replace(tmp_path, path)
+        return digest, True
+
+    def generate_variants(self, digest, extension):
+        """
+        Build the WebP and thumbnail variants for a stored original
+        """
+        # Keep the original's bytes matching its hash
+        if extension == 'webp':
+            variants = ('thumb',)
+        else:
+            variants = VARIANTS
+
+        from PIL import Image, ImageOps
+
+        with Image.open(self.path(digest, extension)) as image:
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+            if 'webp' in variants:
+                self._write(image, self.variant_path(digest, 'webp'), quality=85)
+
+            image.thumbnail((self.thumbnail_size, self.thumbnail_size))
+            self._write(image, self.variant_path(digest, 'thumb'), quality=75)
+
+    def _write(self, image, path, quality):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as tmp:
+            image.save(tmp, 'WEBP', quality=quality, method=4)
+        os.replace(tmp_path, path)
@@ -0,0 +1,248 @@
+"""
+Metrics for Campus Barter
+This module collects request, SQL, remote-call and cache metrics in process
+and renders them in the Prometheus text exposition format for /metrics.
+
+- Every request records its latency per endpoint, plus how many SQL
+  statements it ran and how long they took, counted with SQLAlchemy cursor
+  events.
+- OpenAI calls record their latency and errors per operation.
+- Caches record hits and misses so hit rates can be derived in Prometheus.
+
+In dev mode (QUERY_BUDGET_WARNINGS, on by default when debugging) requests
+that run more statements than their endpoint's budget are logged, which
+catches N+1 queries before they ship.
+
+Metrics live in process memory, so under gunicorn each worker reports its
+own series and Prometheus sums them across the scrape targets.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Prometheus' default latency buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """
+    A monotonically increasing value per label set
+    """
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for label_values, value in sorted(values.items()):
+            yield f'{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}'
+
+class Histogram:
+    """
+    Observations counted into cumulative buckets per label set
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets) + (float('inf'),)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    def count(self, *label_values):
+        series = self._series.get(label_values)
+        return series['count'] if series else 0
+
+    def samples(self):
+        with self._lock:
+            snapshot = {key: (list(s['counts']), s['sum'], s['count']) for key, s in self._series.items()}
+        for label_values, (counts, total, count) in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                yield f'{self.name}_bucket{_format_labels(self.labels, label_values, le)} {cumulative}'
+            yield f'{self.name}_sum{_format_labels(self.labels, label_values)} {_format_value(total)}'
+            yield f'{self.name}_count{_format_labels(self.labels, label_values)} {count}'
+
+class Registry:
+    """
+    The metrics known to this process
+    """
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+
+REQUEST_LATENCY = REGISTRY.register(Histogram(
+    'campus_barter_request_duration_seconds', 'Request latency by endpoint',
+    labels=('endpoint', 'method', 'status')
+))
+REQUEST_QUERIES = REGISTRY.register(Histogram(
+    'campus_barter_request_sql_queries', 'SQL statements run per request by endpoint',
+    labels=('endpoint',), buckets=QUERY_COUNT_BUCKETS
+))
+SQL_QUERIES = REGISTRY.register(Counter(
+    'campus_barter_sql_queries_total', 'SQL statements run by endpoint',
+    labels=('endpoint',)
+))
+SQL_SECONDS = REGISTRY.register(Counter(
+    'campus_barter_sql_seconds_total', 'Time spent running SQL statements by endpoint',
+    labels=('endpoint',)
+))
+QUERY_BUDGET_EXCEEDED = REGISTRY.register(Counter(
+    'campus_barter_query_budget_exceeded_total', 'Requests that ran more SQL statements than their budget',
+    labels=('endpoint',)
+))
+REMOTE_LATENCY = REGISTRY.register(Histogram(
+    'campus_barter_remote_call_duration_seconds', 'Latency of remote API calls by operation',
+    labels=('service', 'operation')
+))
+REMOTE_ERRORS = REGISTRY.register(Counter(
+    'campus_barter_remote_call_errors_total', 'Failed remote API calls by operation',
+    labels=('service', 'operation')
+))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    'campus_barter_cache_requests_total', 'Cache lookups by cache and result (hit or miss)',
+    labels=('cache', 'result')
+))
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.inc(cache, 'hit' if hit else 'miss')
+
+@contextmanager
+def track_remote_call(service, operation):
+    """
+    Time a remote API call, counting it as an error if it raises
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        REMOTE_ERRORS.inc(service, operation)
+        raise
+    finally:
+        REMOTE_LATENCY.observe(time.perf_counter() - start, service, operation)
+
+def _endpoint():
+    # Route patterns keep the label set small, e.g. /api/items/<int:item_id>
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+def init_metrics(app):
+    """
+    Record metrics for every request served by the app
+    """
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+
+_sql_listeners_installed = False
+
+def install_sql_listeners():
+    """
+    Count SQL statements run during requests, on every engine in the process
+    """
+    global _sql_listeners_installed
+    if _sql_listeners_installed:
+        return
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_start = time.perf_counter()
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not has_request_context() or 'sql_queries' not in g:
+            return
+        g.sql_queries += 1
+        g.sql_seconds += time.perf_counter() - getattr(context, '_metrics_start', time.perf_counter())
+
+    _sql_listeners_installed = True
+
+def _start_request():
+    g.request_start = time.perf_counter()
+    g.sql_queries = 0
+    g.sql_seconds = 0.0
+
+def _finish_request(response):
+    if 'request_start' not in g:
+        return response
+
+    endpoint = _endpoint()
+    REQUEST_LATENCY.observe(time.perf_counter() - g.request_start, endpoint, request.method, response.status_code)
+    REQUEST_QUERIES.observe(g.sql_queries, endpoint)
+    SQL_QUERIES.inc(endpoint, amount=g.sql_queries)
+    SQL_SECONDS.inc(endpoint, amount=g.sql_seconds)
+
+    # Dev mode: flag endpoints that run more statements than they should
+    config = current_app.config
+    if config['QUERY_BUDGET_WARNINGS']:
+        budget = config['QUERY_BUDGETS'].get(endpoint, config['QUERY_BUDGET'])
+        if g.sql_queries > budget:
+            QUERY_BUDGET_EXCEEDED.inc(endpoint)
+            current_app.logger.warning(
+                'Query budget exceeded: %s %s ran %d SQL statements (budget %d, %.1f ms in SQL)',
+                request.method, endpoint, g.sql_queries, budget, g.sql_seconds * 1000
+            )
+            response.headers['X-Query-Count'] = str(g.sql_queries)
+
+    # Count each request once, even if a nested request reuses the context
+    del g.request_start
+    return response
@@ -0,0 +1,185 @@
+"""
+Standing Needs for Campus Barter
+This module turns instant needs into standing needs that are matched as new
+listings arrive, instead of students re-running /instant-matches.
+
+Each need stores its keyword set in a NeedKeyword reverse index. When an item
+is created, the 'needs.match_item' job looks up only the needs sharing a
+keyword with the listing and scores those, using embeddings when the OpenAI
+matching system is available and keyword overlap otherwise. Matches are
+recorded as NeedMatch rows for the need's owner to fetch.
+"""
+
+import json
+import re
+from app.models.item import Item
+from app.models.need import StandingNeed, NeedKeyword, NeedMatch
+from app.utils.metrics import record_cache
+from app import db
+
+STOPWORDS = {
+    'the', 'and', 'for', 'with', 'that', 'this', 'need', 'needs', 'want', 'wants', 'looking',
+    'anyone', 'have', 'has', 'can', 'someone', 'some', 'any', 'please', 'from', 'who', 'get',
+    'you', 'your', 'are', 'will', 'would', 'like', 'just', 'one', 'good', 'used', 'new'
+}
+
+# Scores follow MockAIMatchingSystem.find_instant_matches
+BASE_SCORE = 0.3
+KEYWORD_SCORE = 0.1
+MAX_KEYWORD_SCORE = 0.9
+
+# Minimum score for a listing to be recorded against a need
+MIN_MATCH_SCORE = 0.4
+
+def extract_keywords(text, limit=20):
+    """
+    Extract distinct lowercase keywords from free text, in order of appearance
+    """
+    keywords = []
+    for word in re.findall(r'[a-z0-9]+', text.lower()):
+        if len(word) < 3 or word in STOPWORDS or word in keywords:
+            continue
+        keywords.append(word)
+        if len(keywords) >= limit:
+            break
+    return keywords
+
+def item_keywords(item):
+    return set(extract_keywords(f"{item.title} {item.description} {item.category} {(item.tags or '').replace(',', ' ')}", limit=200))
+
+def create_need(user_id, description, campus=None):
+    """
+    Create a standing need and its reverse-index entries on the current session
+    """
+    keywords = extract_keywords(description)
+    need = StandingNeed(user_id=user_id, campus=campus, description=description, keywords=','.join(keywords))
+    need.keyword_entries = [NeedKeyword(keyword=keyword, campus=campus) for keyword in keywords]
+    db.session.add(need)
+    return need
+
+def deactivate_need(need):
+    """
+    Stop matching a need; its keywords leave the reverse index
+    """
+    need.active = False
+    need.keyword_entries = []
+
+def candidate_needs(item):
+    """
+    Find the active needs on the item's campus sharing at least one keyword
+    with it, excluding the item owner's own needs
+    """
+    keywords = item_keywords(item)
+    if not keywords:
+        return []
+
+    need_ids = db.session.query(NeedKeyword.need_id).filter(NeedKeyword.keyword.in_(keywords))
+    if item.campus:
+        need_ids = need_ids.filter(NeedKeyword.campus == item.campus)
+    need_ids = need_ids.distinct()
+    return StandingNeed.query.filter(
+        StandingNeed.id.in_(need_ids),
+        StandingNeed.active == True,  # noqa: E712
+        StandingNeed.user_id != item.user_id
+    ).all()
+
+def keyword_score(need, keywords):
+    matched = [keyword for keyword in need.keywords.split(',') if keyword and keyword in keywords]
+    score = min(BASE_SCORE + len(matched) * KEYWORD_SCORE, MAX_KEYWORD_SCORE)
+    reason = f"Matched keywords: {', '.join(matched)}" if matched else None
+    return score, reason
+
+def record_match(need, item, score, reason):
+    """
+    Record a match unless this need already has one for the item
+    """
+    if NeedMatch.query.filter_by(need_id=need.id, item_id=item.id).first():
+        return None
+    match = NeedMatch(need_id=need.id, user_id=need.user_id, item_id=item.id, score=score, reason=reason)
+    db.session.add(match)
+    return match
+
+def match_item_to_needs(item_id):
+    """
+    Evaluate a new listing against the standing needs that could match it.
+    Returns the number of matches recorded
+    """
+    from app.utils.ai_matching import get_matching_system, AIMatchingSystem, matching_deadline
+
+    item = Item.query.get(item_id)
+    if not item or item.status != 'available':
+        return 0
+
+    needs = candidate_needs(item)
+    if not needs:
+        return 0
+
+    keywords = item_keywords(item)
+    matching_system = get_matching_system()
+
+    # With the OpenAI system, score by embedding similarity, fetching the item's
+    # embedding and any missing need embeddings in one concurrent batch
+    embeddings = {}
+    if matching_system is AIMatchingSystem:
+        texts = {}
+        for need in needs:
+            record_cache('need_embedding', bool(need.embedding))
+            if not need.embedding:
+                texts[need.id] = need.description
+        texts['item'] = AIMatchingSystem.get_item_text(item)
+        embeddings = AIMatchingSystem.get_embeddings(texts, matching_deadline())
+        for need in needs:
+            if need.id in embeddings:
+                need.embedding = json.dumps(embeddings[need.id])
+
+    recorded = 0
+    for need in needs:
+        need_embedding = need.get_embedding()
+        if embeddings.get('item') and need_embedding:
+            score = float(AIMatchingSystem.calculate_similarity(need_embedding, embeddings['item']))
+            reason = AIMatchingSystem.generate_match_reason(need.description, item, score)
+        else:
+            score, reason = keyword_score(need, keywords)
+
+        if score >= MIN_MATCH_SCORE and record_match(need, item, score, reason):
+            recorded += 1
+
+    db.session.commit()
+    return recorded
+
+def backfill_need(need_id, limit=20, scan=200):
+    """
+    Match a new need against the listings that already exist, once.
+    The OpenAI system ranks them with find_instant_matches; otherwise the
+    newest `scan` listings are scored by keyword overlap, as for new items
+    """
+    from app.utils.ai_matching import get_matching_system, AIMatchingSystem
+
+    need = StandingNeed.query.get(need_id)
+    if not need or not need.active:
+        return 0
+
+    if get_matching_system() is AIMatchingSystem:
+        candidates = []
+        for match in AIMatchingSystem.find_instant_matches(need_description=need.description, limit=limit, campus=need.campus):
+            item = Item.query.get(match['item']['id'])
+            if item:
+                candidates.append((item, match['score'], match['reason']))
+    else:
+        query = Item.query.filter(Item.status == 'available', Item.user_id != need.user_id)
+        if need.campus:
+            query = query.filter(Item.campus == need.campus)
+        items = query.order_by(Item.id.desc()).limit(scan).all()
+        candidates = [(item,) + keyword_score(need, item_keywords(item)) for item in items]
+        candidates.sort(key=lambda candidate: candidate[1], reverse=True)
+        candidates = candidates[:limit]
+
+    recorded = 0
+    for item, score, reason in candidates:
+        if item.user_id == need.user_id or score < MIN_MATCH_SCORE:
+            continue
+        if record_match(need, item, score, reason):
+            recorded += 1
+
+    db.session.commit()
+    return recorded
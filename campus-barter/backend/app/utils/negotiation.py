@@ -0,0 +1,169 @@
+"""
+Trade Negotiation for Campus Barter
+Status changes and counter-offers are applied with optimistic concurrency:
+every trade carries a version, and each change is a conditional
+UPDATE ... WHERE id = ? AND version = ? that bumps it. If two parties act on
+the same version only one UPDATE matches a row; the other gets a
+TradeConflict and can reload the trade and retry, without any table or row
+locks held between reading the trade and writing it.
+
+Which changes are allowed is an explicit state machine. The party who did
+not make the current proposal (the recipient, until a counter-offer) answers
+it: they may accept, reject or counter. Counter-offers keep the trade
+pending, hand the answer to the other party and store a TradeRevision with
+only the item sets that changed.
+"""
+
+import json
+from datetime import datetime
+from app.models.item import Item
+from app.models.trade import Trade, TradeItem, TradeRevision
+from app import db
+
+# Allowed status changes, and who may make them: the party answering the
+# current proposal, or either party
+TRANSITIONS = {
+    'pending': {'accepted': 'responder', 'rejected': 'responder', 'completed': 'party'},
+    'accepted': {'completed': 'party'},
+    'completed': {'completed': 'party'},  # Confirming again, e.g. with a rating
+    'rejected': {}
+}
+
+class InvalidTransition(Exception):
+    """
+    Raised when a user may not make a change to a trade. status_code is the
+    HTTP status to answer with
+    """
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+class TradeConflict(Exception):
+    """
+    Raised when a trade changed since the caller read it
+    """
+    pass
+
+def proposer_id(trade):
+    """
+    The user whose terms the trade currently holds
+    """
+    return trade.proposer_id or trade.initiator_id
+
+def responder_id(trade):
+    """
+    The user who answers the current proposal
+    """
+    return trade.recipient_id if proposer_id(trade) == trade.initiator_id else trade.initiator_id
+
+def check_party(trade, user_id, role):
+    if user_id not in (trade.initiator_id, trade.recipient_id):
+        raise InvalidTransition('Not authorized to update this trade', 403)
+    if role == 'responder' and user_id != responder_id(trade):
+        raise InvalidTransition('Only the other party can answer your proposal', 403)
+
+def check_version(trade, expected_version):
+    """
+    Resolve the version a change applies to: the one the client read if it
+    sent one, else the one just loaded. Trades from before versioning count
+    as version 1
+    """
+    current = trade.version or 1
+    if expected_version is None:
+        return current
+    if expected_version != current:
+        raise TradeConflict(f'Trade is at version {current}, not {expected_version}')
+    return expected_version
+
+def conditional_update(trade, version, **values):
+    """
+    Apply values to the trade only if it is still at version, bumping it.
+    Raises TradeConflict if another request got there first
+    """
+    result = db.session.execute(
+        db.update(Trade)
+        .where(Trade.id == trade.id, db.func.coalesce(Trade.version, 1) == version)
+        .values(version=version + 1, **values)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        raise TradeConflict('Trade was changed by someone else')
+
+    # Later reads in this session should see the new row
+    db.session.expire(trade)
+
+def transition(trade, user_id, new_status, expected_version=None, changed_at=None):
+    """
+    Move the trade to new_status on behalf of user_id. Returns the previous status
+    """
+    # A client acting on a stale read hears about the conflict first
+    version = check_version(trade, expected_version)
+    allowed = TRANSITIONS.get(trade.status, {})
+    if new_status not in allowed:
+        raise InvalidTransition(f'Cannot move a {trade.status} trade to {new_status}')
+    check_party(trade, user_id, allowed[new_status])
+
+    previous_status = trade.status
+    if new_status == previous_status:
+        return previous_status
+
+    values = {'status': new_status}
+    if new_status == 'completed':
+        values['completion_date'] = changed_at or datetime.utcnow()
+    conditional_update(trade, version, **values)
+    return previous_status
+
+def item_diff(current, proposed):
+    changes = {
+        'added': sorted(proposed - current),
+        'removed': sorted(current - proposed)
+    }
+    return changes if changes['added'] or changes['removed'] else None
+
+def counter_offer(trade, user_id, offered_ids, requested_ids, expected_version=None):
+    """
+    Replace the trade's item sets with a counter-offer from user_id.
+    Returns the new TradeRevision
+    """
+    version = check_version(trade, expected_version)
+    if trade.status != 'pending':
+        raise InvalidTransition(f'Cannot counter a {trade.status} trade')
+    check_party(trade, user_id, 'responder')
+
+    proposed = {'offered': set(offered_ids), 'requested': set(requested_ids)}
+    owners = {'offered': trade.initiator_id, 'requested': trade.recipient_id}
+    items = {item.id: item for item in Item.query.filter(Item.id.in_(proposed['offered'] | proposed['requested']))}
+    for side, item_ids in proposed.items():
+        for item_id in item_ids:
+            if item_id not in items or items[item_id].user_id != owners[side]:
+                raise InvalidTransition(f'Invalid {side} item: {item_id}')
+
+    current = {'offered': set(), 'requested': set()}
+    for trade_item in trade.items:
+        if trade_item.offered_item_id:
+            current['offered'].add(trade_item.offered_item_id)
+        if trade_item.requested_item_id:
+            current['requested'].add(trade_item.requested_item_id)
+
+    changes = {side: item_diff(current[side], proposed[side]) for side in proposed}
+    changes = {side: diff for side, diff in changes.items() if diff}
+    if not changes:
+        raise InvalidTransition('A counter-offer must change the items')
+
+    number = (trade.revision or 0) + 1
+    existing = list(trade.items)
+    conditional_update(trade, version, revision=number, proposer_id=user_id)
+
+    # Only the request that won the version check gets here
+    for trade_item in existing:
+        if trade_item.offered_item_id in changes.get('offered', {}).get('removed', ()) or \
+                trade_item.requested_item_id in changes.get('requested', {}).get('removed', ()):
+            db.session.delete(trade_item)
+    for item_id in changes.get('offered', {}).get('added', ()):
+        db.session.add(TradeItem(trade_id=trade.id, offered_item_id=item_id))
+    for item_id in changes.get('requested', {}).get('added', ()):
+        db.session.add(TradeItem(trade_id=trade.id, requested_item_id=item_id))
+
+    revision = TradeRevision(trade_id=trade.id, number=number, author_id=user_id, changes=json.dumps(changes))
+    db.session.add(revision)
+    return revision
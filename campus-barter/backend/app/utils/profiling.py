@@ -0,0 +1,97 @@
+"""
+Request Profiling for Campus Barter
+This module profiles single requests on demand, so a slow production call
+can be examined without redeploying.
+
+Profiling is off unless PROFILING_ENABLED is set and PROFILING_TOKEN is
+configured. A request is then profiled with cProfile when it carries the
+token in the X-Profile header:
+
+    curl -H "X-Profile: $PROFILING_TOKEN" -H "X-Profile-Top: 10" .../api/trades
+
+The stats are written to PROFILE_DIR as <request id>.prof for snakeviz or
+pstats. The request id comes from X-Request-ID when the client sends a safe
+one, and is echoed in the response. With X-Profile-Top, the N functions with
+the highest cumulative time are also returned in the X-Profile-Summary header.
+"""
+
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import re
+import uuid
+from flask import current_app, g, request
+
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+# Keep the summary header well under common proxy header limits
+MAX_SUMMARY_LINES = 25
+
+def init_profiling(app):
+    """
+    Install the profiling hooks when profiling is enabled for the app
+    """
+    if not app.config['PROFILING_ENABLED'] or not app.config['PROFILING_TOKEN']:
+        return
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
+
+def request_id():
+    """
+    Get the id of the current request, taken from X-Request-ID if it is safe
+    to use in a file name, generated otherwise
+    """
+    if 'request_id' not in g:
+        supplied = request.headers.get('X-Request-ID', '')
+        g.request_id = supplied if REQUEST_ID_PATTERN.match(supplied) else uuid.uuid4().hex
+    return g.request_id
+
+def _wants_profile():
+    supplied = request.headers.get('X-Profile')
+    return bool(supplied) and hmac.compare_digest(supplied, current_app.config['PROFILING_TOKEN'])
+
+def _start_profile():
+    g.pop('profiler', None)
+    if not _wants_profile():
+        return
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler is already active on this thread
+        return
+    g.profiler = profiler
+
+def _finish_profile(response):
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return response
+    profiler.disable()
+
+    directory = current_app.config['PROFILE_DIR']
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{request_id()}.prof')
+    profiler.dump_stats(path)
+    current_app.logger.info('Profiled %s %s to %s', request.method, request.path, path)
+
+    response.headers['X-Request-ID'] = request_id()
+    top = request.headers.get('X-Profile-Top', type=int)
+    if top:
+        response.headers['X-Profile-Summary'] = summarize(profiler, min(top, MAX_SUMMARY_LINES))
+    return response
+
+def summarize(profiler, top):
+    """
+    Describe the top functions by cumulative time on one header-safe line
+    """
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = sorted(stats.stats.items(), key=lambda row: row[1][3], reverse=True)[:top]
+
+    entries = []
+    for (filename, line, function), (_, calls, _, cumulative, _) in rows:
+        location = f'{os.path.basename(filename)}:{line}' if line else filename
+        entries.append(f'{cumulative * 1000:.1f}ms {calls}x {function} ({location})')
+    return '; '.join(entries).encode('ascii', 'replace').decode('ascii')
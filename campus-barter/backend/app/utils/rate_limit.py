@@ -0,0 +1,239 @@
+"""
+Rate Limiting for Campus Barter
+This module implements token buckets keyed by client IP, account or user,
+used to keep bursts on expensive endpoints from starving the rest of the API.
+
+Rates are written as "<requests>/<seconds>", e.g. "10/60" allows a burst of
+10 requests that refills over a minute.
+
+Buckets live in process memory by default. With RATE_LIMIT_STORE set to a
+file path they live in a SQLite file instead, so every web and job worker on
+the host draws from the same buckets.
+
+The matching endpoints also spend from a per-user budget for remote model
+calls, REMOTE_BUDGET_PER_USER, weighted by REMOTE_CALL_COSTS: a chat
+completion costs far more than an embedding. Calls made while no user is
+being charged (e.g. needs matching for a new listing) are not budgeted.
+"""
+
+import math
+import os
+import sqlite3
+import threading
+import time
+from flask import current_app, g, jsonify
+
+# Budget units spent per remote call, by operation
+REMOTE_CALL_COSTS = {
+    'embedding': 1,
+    'chat_completion': 20
+}
+
+class RemoteBudgetExceeded(Exception):
+    """
+    Raised when the current user cannot afford a remote call
+    """
+    def __init__(self, retry_after):
+        super().__init__('Remote call budget exhausted')
+        self.retry_after = retry_after
+
+def parse_rate(rate):
+    """
+    Parse a "<requests>/<seconds>" rate into (capacity, refill per second)
+    """
+    requests, seconds = rate.split('/')
+    capacity = float(requests)
+    return capacity, capacity / float(seconds)
+
+class TokenBucket:
+    """
+    A single token bucket
+    """
+
+    def __init__(self, capacity, refill_rate):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def consume(self, cost=1):
+        """
+        Take tokens from the bucket.
+        Returns (allowed, seconds until enough tokens are available)
+        """
+        granted, retry_after = self.consume_up_to(cost, 1)
+        return bool(granted), retry_after
+
+    def consume_up_to(self, cost, count):
+        """
+        Take tokens for as many of `count` units of `cost` as the bucket
+        affords. Returns (units granted, seconds until one more is available)
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_rate)
+        self.updated = now
+
+        granted = min(count, int(self.tokens // cost)) if cost > 0 else count
+        self.tokens -= granted * cost
+        return granted, 0 if granted else (cost - self.tokens) / self.refill_rate
+
+class RateLimiter:
+    """
+    A set of token buckets sharing one rate, keyed by an arbitrary string
+    """
+
+    def __init__(self, rate, max_keys=10000):
+        self.capacity, self.refill_rate = parse_rate(rate)
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def consume(self, key, cost=1):
+        granted, retry_after = self.consume_up_to(key, cost, 1)
+        return bool(granted), retry_after
+
+    def consume_up_to(self, key, cost, count):
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_keys:
+                    self._prune()
+                bucket = self._buckets[key] = TokenBucket(self.capacity, self.refill_rate)
+            return bucket.consume_up_to(cost, count)
+
+    def _prune(self):
+        # Drop buckets that have refilled completely, they behave like new ones
+        now = time.monotonic()
+        full_after = self.capacity / self.refill_rate
+        for key in [k for k, b in self._buckets.items() if now - b.updated >= full_after]:
+            del self._buckets[key]
+
+        # Still too many keys, so forget the oldest half
+        if len(self._buckets) >= self.max_keys:
+            oldest = sorted(self._buckets.items(), key=lambda kv: kv[1].updated)
+            for key, _ in oldest[:len(oldest) // 2]:
+                del self._buckets[key]
+
+class SharedRateLimiter:
+    """
+    Token buckets sharing one rate, stored in a SQLite file so every process
+    on the host sees the same tokens. Each consume is one short write
+    transaction
+    """
+
+    # Full buckets are deleted every this many consumes
+    PRUNE_EVERY = 1000
+
+    def __init__(self, rate, path, name):
+        self.capacity, self.refill_rate = parse_rate(rate)
+        self.path = path
+        self.name = name
+        self._local = threading.local()
+        self._calls = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with sqlite3.connect(path) as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS bucket ('
+                'name TEXT NOT NULL, key TEXT NOT NULL, tokens REAL NOT NULL, updated REAL NOT NULL, '
+                'PRIMARY KEY (name, key))'
+            )
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        return connection
+
+    def consume(self, key, cost=1):
+        granted, retry_after = self.consume_up_to(key, cost, 1)
+        return bool(granted), retry_after
+
+    def consume_up_to(self, key, cost, count):
+        """
+        Take tokens for as many of `count` units of `cost` as the bucket
+        affords, in one transaction. Returns (units granted, seconds until
+        one more is available)
+        """
+        connection = self._connection()
+        now = time.time()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT tokens, updated FROM bucket WHERE name = ? AND key = ?', (self.name, str(key))
+            ).fetchone()
+            tokens = self.capacity if row is None else min(self.capacity, row[0] + max(now - row[1], 0) * self.refill_rate)
+
+            granted = min(count, int(tokens // cost)) if cost > 0 else count
+            tokens -= granted * cost
+            connection.execute(
+                'INSERT OR REPLACE INTO bucket (name, key, tokens, updated) VALUES (?, ?, ?, ?)',
+                (self.name, str(key), tokens, now)
+            )
+
+            self._calls += 1
+            if self._calls % self.PRUNE_EVERY == 0:
+                connection.execute(
+                    'DELETE FROM bucket WHERE name = ? AND updated < ?',
+                    (self.name, now - self.capacity / self.refill_rate)
+                )
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        return granted, 0 if granted else (cost - tokens) / self.refill_rate
+
+def get_rate_limiter(name):
+    """
+    Get the limiter configured as <name> for the current app
+    """
+    app = current_app._get_current_object()
+    limiters = app.extensions.setdefault('rate_limiters', {})
+    limiter = limiters.get(name)
+    if limiter is None:
+        if app.config.get('RATE_LIMIT_STORE'):
+            limiter = SharedRateLimiter(app.config[name], app.config['RATE_LIMIT_STORE'], name)
+        else:
+            limiter = RateLimiter(app.config[name])
+        limiters[name] = limiter
+    return limiter
+
+def check_rate_limits(*checks):
+    """
+    Consume from each (limiter name, key) pair in order.
+    Returns a 429 response if any bucket is empty, otherwise None
+    """
+    for name, key in checks:
+        allowed, retry_after = get_rate_limiter(name).consume(key)
+        if not allowed:
+            return too_many_requests(retry_after)
+    return None
+
+def too_many_requests(retry_after):
+    response = jsonify({'error': 'Too many requests, please try again later'})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+def charge_remote_calls_to(user_id):
+    """
+    Bill remote calls made for the rest of this request or job to user_id
+    """
+    g.remote_budget_user = user_id
+
+def spend_remote_budget(operation, calls=1):
+    """
+    Take the cost of up to `calls` remote calls from the current user's
+    budget. Returns how many calls may go ahead; raises RemoteBudgetExceeded
+    if not even one can
+    """
+    user_id = g.get('remote_budget_user')
+    if user_id is None or calls <= 0:
+        return calls
+
+    # One bucket read and write however many calls are asked for
+    cost = REMOTE_CALL_COSTS.get(operation, 1)
+    granted, retry_after = get_rate_limiter('REMOTE_BUDGET_PER_USER').consume_up_to(user_id, cost, calls)
+    if not granted:
+        raise RemoteBudgetExceeded(retry_after)
+    return granted
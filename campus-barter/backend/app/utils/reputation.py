@@ -0,0 +1,187 @@
+"""
+Reputation and Trade Statistics for Campus Barter
+This module keeps each user's UserStats row up to date as their trades change,
+so profiles read reputation, completed-trade counts and response times from a
+single row instead of aggregating over the trade tables.
+
+All updates are relative (x = x + delta) and run in the caller's transaction,
+so they commit or roll back together with the trade change and concurrent
+workers cannot lose each other's increments. User.reputation_score is kept in
+step for clients that read it from the user record.
+"""
+
+from datetime import datetime
+from itertools import chain
+from sqlalchemy.exc import IntegrityError
+from app.models.reputation import TradeRating, UserStats
+from app.models.archive import TradeArchive
+from app.models.trade import Trade
+from app.models.user import User
+from app import db
+
+MIN_RATING = 1
+MAX_RATING = 5
+
+# Statuses whose trades are counted in the stats, by column
+OUTCOME_COLUMNS = {
+    'completed': 'trades_completed',
+    'rejected': 'trades_rejected',
+}
+
+class InvalidRating(Exception):
+    """
+    Raised when a rating cannot be recorded for a trade
+    """
+    pass
+
+def get_user_stats(user_id):
+    """
+    Get a user's stats row, or an unsaved all-zero one if they have none yet
+    """
+    stats = db.session.get(UserStats, user_id)
+    if stats is None:
+        stats = UserStats(
+            user_id=user_id,
+            trades_completed=0,
+            trades_rejected=0,
+            rating_count=0,
+            rating_total=0,
+            response_count=0,
+            response_seconds_total=0.0
+        )
+    return stats
+
+def increment_stats(user_id, **deltas):
+    """
+    Add to a user's counters in the current transaction, creating the row if needed
+    """
+    if not db.session.get(UserStats, user_id):
+        # A concurrent request may create the row first; keep the caller's transaction intact
+        try:
+            with db.session.begin_nested():
+                db.session.add(get_user_stats(user_id))
+        except IntegrityError:
+            pass
+
+    columns = {getattr(UserStats, name): getattr(UserStats, name) + delta for name, delta in deltas.items()}
+    columns[UserStats.updated_at] = datetime.utcnow()
+    UserStats.query.filter_by(user_id=user_id).update(columns, synchronize_session=False)
+
+    # Later reads in this session should see the new totals
+    stats = db.session.get(UserStats, user_id)
+    if stats is not None:
+        db.session.expire(stats)
+
+def record_status_change(trade, previous_status, changed_at=None):
+    """
+    Update both parties' stats for a trade moving from previous_status to trade.status
+    """
+    if trade.status == previous_status:
+        return
+    changed_at = changed_at or datetime.utcnow()
+
+    deltas = {}
+    if previous_status in OUTCOME_COLUMNS:
+        deltas[OUTCOME_COLUMNS[previous_status]] = -1
+    if trade.status in OUTCOME_COLUMNS:
+        deltas[OUTCOME_COLUMNS[trade.status]] = deltas.get(OUTCOME_COLUMNS[trade.status], 0) + 1
+
+    if deltas:
+        increment_stats(trade.initiator_id, **deltas)
+        increment_stats(trade.recipient_id, **deltas)
+
+    # The recipient's first answer to an offer counts towards their response time
+    if previous_status == 'pending' and trade.status in ('accepted', 'rejected') and trade.creation_date:
+        seconds = max((changed_at - trade.creation_date).total_seconds(), 0.0)
+        increment_stats(trade.recipient_id, response_count=1, response_seconds_total=seconds)
+
+def record_rating(trade, rater_id, score, comment=None):
+    """
+    Record rater_id's rating of the other party to a completed trade.
+    Raises InvalidRating if the rating is not allowed
+    """
+    if trade.status != 'completed':
+        raise InvalidRating('Only completed trades can be rated')
+    if rater_id not in (trade.initiator_id, trade.recipient_id):
+        raise InvalidRating('Only trade participants can rate a trade')
+    if isinstance(score, bool) or not isinstance(score, int) or not MIN_RATING <= score <= MAX_RATING:
+        raise InvalidRating(f'Rating must be a whole number from {MIN_RATING} to {MAX_RATING}')
+    if TradeRating.query.filter_by(trade_id=trade.id, rater_id=rater_id).first():
+        raise InvalidRating('You have already rated this trade')
+
+    ratee_id = trade.recipient_id if rater_id == trade.initiator_id else trade.initiator_id
+    rating = TradeRating(trade_id=trade.id, rater_id=rater_id, ratee_id=ratee_id, score=score, comment=comment)
+    db.session.add(rating)
+
+    increment_stats(ratee_id, rating_count=1, rating_total=score)
+
+    # Mirror the new average onto the user record in the same statement
+    average = (
+        db.select(db.cast(UserStats.rating_total, db.Float) / UserStats.rating_count)
+        .where(UserStats.user_id == ratee_id)
+        .scalar_subquery()
+    )
+    User.query.filter_by(id=ratee_id).update({User.reputation_score: average}, synchronize_session=False)
+    ratee = db.session.get(User, ratee_id)
+    if ratee is not None:
+        db.session.expire(ratee, ['reputation_score'])
+    return rating
+
+def rebuild_user_stats():
+    """
+    Recompute every user's stats from the trade and rating tables.
+    Only needed to seed stats for trades made before they were tracked
+    """
+    # Response times are only known for answers given while they were tracked
+    responses = {
+        user_id: (count, seconds)
+        for user_id, count, seconds in db.session.query(
+            UserStats.user_id, UserStats.response_count, UserStats.response_seconds_total
+        )
+    }
+    totals = {}
+
+    def stats_for(user_id):
+        if user_id not in totals:
+            stats = get_user_stats(user_id)
+            stats.trades_completed = stats.trades_rejected = 0
+            stats.rating_count = stats.rating_total = 0
+            stats.response_count, stats.response_seconds_total = responses.get(user_id, (0, 0.0))
+            totals[user_id] = stats
+        return totals[user_id]
+
+    for user_id in responses:
+        stats_for(user_id)
+
+    # Archived trades count too; their ratings are only in the snapshots
+    outcomes = chain(
+        db.session.query(Trade.initiator_id, Trade.recipient_id, Trade.status),
+        db.session.query(TradeArchive.initiator_id, TradeArchive.recipient_id, TradeArchive.status)
+    )
+    for initiator_id, recipient_id, status in outcomes:
+        if status in OUTCOME_COLUMNS:
+            for user_id in (initiator_id, recipient_id):
+                stats = stats_for(user_id)
+                setattr(stats, OUTCOME_COLUMNS[status], getattr(stats, OUTCOME_COLUMNS[status]) + 1)
+
+    ratings = chain(
+        db.session.query(TradeRating.ratee_id, TradeRating.score),
+        (
+            (rating['ratee_id'], rating['score'])
+            for archived in TradeArchive.query.filter(TradeArchive.status == 'completed')
+            for rating in archived.data['ratings']
+        )
+    )
+    for ratee_id, score in ratings:
+        stats = stats_for(ratee_id)
+        stats.rating_count += 1
+        stats.rating_total += score
+
+    for user_id, stats in totals.items():
+        db.session.add(stats)
+        user = db.session.get(User, user_id)
+        if user is not None:
+            user.reputation_score = stats.reputation
+
+    db.session.commit()
+    return len(totals)
@@ -0,0 +1,191 @@
+"""
+Startup Helpers for Campus Barter
+This module keeps cold starts cheap on the serverless deployment: it skips
+db.create_all() when the schema marker is current and can report where
+create_app spends its time, broken down by imported module.
+"""
+
+import builtins
+import sys
+import time
+from contextlib import contextmanager
+from sqlalchemy.exc import SQLAlchemyError
+from app import db
+
+# Bump whenever a model or table is added or changed so fast starts rebuild the schema
+SCHEMA_VERSION = 12
+
+def ensure_schema(app):
+    """
+    Create the database tables unless the fast startup mode finds a current
+    schema marker. Returns True if create_all ran
+    """
+    from app.models.schema_version import SchemaVersion
+
+    with app.app_context():
+        if app.config['STARTUP_MODE'] == 'fast':
+            try:
+                marker = SchemaVersion.query.order_by(SchemaVersion.id.desc()).first()
+            except SQLAlchemyError:
+                db.session.rollback()
+                marker = None
+            if marker and marker.version == SCHEMA_VERSION:
+                return False
+
+        # Databases from before schema markers have tables but no marker
+        had_tables = bool(db.inspect(db.engine).get_table_names())
+        db.create_all()
+
+        # create_all skips tables that already exist, so add columns and
+        # indexes declared on them since
+        add_missing_columns()
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(db.engine, checkfirst=True)
+
+        # Record the version we just built
+        marker = SchemaVersion.query.order_by(SchemaVersion.id.desc()).first()
+        if not marker or marker.version != SCHEMA_VERSION:
+            # Without a marker, existing tables predate every tracked version
+            previous = marker.version if marker else (0 if had_tables else SCHEMA_VERSION)
+
+            # Trade stats are tracked from version 5; seed them from existing trades
+            if previous < 5:
+                from app.utils.reputation import rebuild_user_stats
+                rebuild_user_stats()
+
+            # Campuses are tracked from version 6; derive them for existing users
+            if previous < 6:
+                from app.utils.campus import backfill_campuses
+                backfill_campuses()
+
+            # Listings are signed for duplicate detection from version 7; cluster existing ones
+            if previous < 7:
+                from app.utils.jobs import enqueue
+                enqueue('duplicates.cluster', key='duplicates.cluster')
+
+            # Trades are versioned from version 9; start existing ones at 1
+            if previous < 9:
+                from app.models.trade import Trade
+                Trade.query.filter(Trade.version.is_(None)).update({'version': 1}, synchronize_session=False)
+
+            # Listings expire from version 11; give existing ones a full term
+            if previous < 11:
+                from app.utils.expiry import backfill_expiry
+                backfill_expiry()
+
+            # Trade badges are counted from version 12; seed them from pending trades
+            if previous < 12:
+                from app.utils.inbox import rebuild_trade_counters
+                rebuild_trade_counters()
+
+            db.session.add(SchemaVersion(version=SCHEMA_VERSION))
+            db.session.commit()
+        return True
+
+def add_missing_columns():
+    """
+    Add nullable or server-defaulted columns declared on models but missing
+    from existing tables. Returns the names of the columns added
+    """
+    inspector = db.inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not (column.nullable or column.server_default is not None):
+                    continue
+
+                # Existing rows take the server default, so NOT NULL holds for them
+                definition = column.type.compile(dialect=db.engine.dialect)
+                if column.server_default is not None:
+                    definition += f" NOT NULL DEFAULT {column.server_default.arg}"
+                connection.execute(db.text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {definition}'))
+                added.append(f'{table.name}.{column.name}')
+    return added
+
+class ImportProfiler:
+    """
+    Times every module first imported while active, like python -X importtime.
+    Records inclusive time (with nested imports) and self time per module
+    """
+
+    def __init__(self):
+        self.modules = {}
+        self._stack = []
+        self._original_import = None
+
+    def __enter__(self):
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._import
+        return self
+
+    def __exit__(self, *exc):
+        builtins.__import__ = self._original_import
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        # Already loaded modules cost nothing, only time first imports
+        if level or name in sys.modules:
+            return self._original_import(name, globals, locals, fromlist, level)
+
+        self._stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += elapsed
+            self.modules[name] = {'total': elapsed, 'self': elapsed - nested}
+
+class StartupTimer:
+    """
+    Collects named startup phases and per-module import times for create_app
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.phases = []
+        self.imports = ImportProfiler()
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        with self.imports:
+            yield
+        self.phases.append((name, time.perf_counter() - start))
+
+    def report(self, top=15):
+        """
+        Build the startup report as a dict of milliseconds
+        """
+        modules = sorted(self.imports.modules.items(), key=lambda kv: kv[1]['total'], reverse=True)
+        return {
+            'total_ms': round((time.perf_counter() - self._start) * 1000, 2),
+            'phases': [{'name': name, 'ms': round(elapsed * 1000, 2)} for name, elapsed in self.phases],
+            'imports': [
+                {'module': name, 'total_ms': round(t['total'] * 1000, 2), 'self_ms': round(t['self'] * 1000, 2)}
+                for name, t in modules[:top]
+            ]
+        }
+
+    def print_report(self, top=15):
+        report = self.report(top)
+        print(f"Startup finished in {report['total_ms']} ms")
+        for phase in report['phases']:
+            print(f"  {phase['name']:<24} {phase['ms']:>9} ms")
+        print("Slowest imports (inclusive / self):")
+        for module in report['imports']:
+            print(f"  {module['module']:<40} {module['total_ms']:>9} ms {module['self_ms']:>9} ms")
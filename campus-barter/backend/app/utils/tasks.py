@@ -0,0 +1,128 @@
+"""
+Job Handlers for Campus Barter
+This module registers the handlers run by the background job workers.
+Every handler receives the job payload dict and returns a JSON-serialisable
+result. Handlers may run more than once for the same job, so they must be
+idempotent.
+"""
+
+from app.utils.jobs import job_handler, enqueue
+from app.models.item import Item
+from app import db
+
+@job_handler('media.variants')
+def build_media_variants(payload):
+    """
+    Build the thumbnail and WebP variants for an uploaded image
+    """
+    from app.models.media import MediaFile
+    from app.utils.media import get_media_store
+
+    media = MediaFile.query.get(payload['hash'])
+    if not media or media.variants_ready:
+        return None
+
+    get_media_store().generate_variants(media.hash, media.extension)
+    media.variants_ready = True
+    db.session.commit()
+    return {'hash': media.hash}
+
+def enqueue_recommendations(user_id, item_id=None, limit=10):
+    """
+    Queue a recommendations job, reusing one that is already pending for the
+    same user, item and limit
+    """
+    return enqueue(
+        'matching.recommendations',
+        {'user_id': user_id, 'item_id': item_id, 'limit': limit},
+        key=f"matching.recommendations:{user_id}:{item_id or 'all'}:{limit}",
+        user_id=user_id
+    )
+
+@job_handler('matching.recommendations')
+def refresh_recommendations(payload):
+    """
+    Compute trade recommendations for a user
+    """
+    from app.utils.ai_matching import get_matching_system
+    from app.utils.rate_limit import charge_remote_calls_to
+
+    charge_remote_calls_to(payload['user_id'])
+    return get_matching_system().get_trade_recommendations(
+        user_id=payload['user_id'],
+        item_id=payload.get('item_id'),
+        limit=payload.get('limit', 10)
+    )
+
+@job_handler('matching.item_analysis')
+def analyze_item(payload):
+    """
+    Run the AI listing analysis for an item
+    """
+    from app.utils.ai_matching import get_matching_system
+    from app.utils.rate_limit import charge_remote_calls_to
+
+    item = Item.query.get(payload['item_id'])
+    if not item:
+        return None
+
+    charge_remote_calls_to(item.user_id)
+    matching_system = get_matching_system()
+    if not hasattr(matching_system, 'get_ai_analysis'):
+        raise RuntimeError('AI analysis not available')
+    return {'analysis': matching_system.get_ai_analysis(item)}
+
+@job_handler('needs.match_item')
+def match_item_to_needs(payload):
+    """
+    Check a new listing against the standing needs that could match it
+    """
+    from app.utils.needs import match_item_to_needs
+
+    return {'matches': match_item_to_needs(payload['item_id'])}
+
+@job_handler('needs.backfill')
+def backfill_need(payload):
+    """
+    Match a new standing need against existing listings
+    """
+    from app.utils.needs import backfill_need
+
+    return {'matches': backfill_need(payload['need_id'])}
+
+@job_handler('duplicates.cluster')
+def cluster_duplicates(payload):
+    """
+    Sign existing listings and cluster near-duplicates
+    """
+    from app.utils.duplicates import cluster_duplicates
+
+    return cluster_duplicates()
+
+@job_handler('embeddings.compact')
+def compact_embeddings(payload):
+    """
+    Fold appended embeddings into a new store generation, dropping unlisted items
+    """
+    from app.utils.embedding_store import get_embedding_store
+
+    live_ids = {item_id for item_id, in db.session.query(Item.id).filter(Item.status == 'available')}
+    return {'rows': get_embedding_store(payload['provider']).compact(live_ids)}
+
+@job_handler('trades.archive')
+def archive_trades(payload):
+    """
+    Move old completed and rejected trades into the archive
+    """
+    from app.utils.archive import archive_trades
+
+    return archive_trades(payload.get('older_than_days'), payload.get('batch_size'))
+
+@job_handler('items.expire')
+def expire_items(payload):
+    """
+    Mark listings past their expiry as expired
+    """
+    from app.utils.expiry import expire_items
+
+    return expire_items(payload.get('batch_size'), payload.get('max_items'), payload.get('pause'))
@@ -0,0 +1,473 @@
+"""
+End-to-end API benchmark
+
+Seeds SQLite databases with synthetic campuses, users, items and trades at
+each requested scale, then drives every blueprint (auth, items, trades,
+users, matching) through the Flask test client and through a real gunicorn
+server. Reports throughput and p50/p99 latency per scenario, writes the
+results as JSON and exits non-zero when any scenario had failed requests
+(unless --allow-errors) or, given a baseline file, regressed by more than
+the threshold. Timings of failed requests say nothing about the endpoint.
+
+Seeded databases are kept in --db-dir and reused by later runs at the same
+scale, since seeding 1M items takes a while.
+
+Usage:
+    python benchmarks/bench_api.py --sizes 10k,100k --requests 200
+    python benchmarks/bench_api.py --sizes 1m --modes gunicorn --workers 4 --concurrency 16
+    python benchmarks/bench_api.py --sizes 10k --baseline benchmarks/results/baseline.json --threshold 0.2
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+CATEGORIES = ['Textbooks', 'Electronics', 'Furniture', 'Clothing', 'Services', 'Food', 'Other']
+WORDS = [
+    'calculator', 'textbook', 'lamp', 'desk', 'chair', 'laptop', 'charger', 'jacket', 'bike', 'guitar',
+    'monitor', 'kettle', 'poster', 'notes', 'tutoring', 'headphones', 'backpack', 'printer', 'rug', 'mug'
+]
+
+# Keep the limits of the app under test out of the way of the load generator
+BENCH_CONFIG = {
+    'LOGIN_RATE_PER_IP': '1000000/1',
+    'LOGIN_RATE_PER_ACCOUNT': '1000000/1',
+    'REGISTER_RATE_PER_IP': '1000000/1',
+    'MATCHING_RATE_PER_USER': '1000000/1',
+    'RECOMMENDATIONS_RATE_PER_USER': '1000000/1',
+    'INSTANT_MATCHES_RATE_PER_USER': '1000000/1',
+    'REMOTE_BUDGET_PER_USER': '1000000000/1',
+    'JWT_SECRET_KEY': 'bench-secret',
+    'STARTUP_MODE': 'fast',
+}
+BENCH_PASSWORD = 'password123'
+
+def parse_size(value):
+    value = value.strip().lower()
+    for suffix, factor in (('k', 1000), ('m', 1000000)):
+        if value.endswith(suffix):
+            return int(float(value[:-len(suffix)]) * factor)
+    return int(value)
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] if values else 0.0
+
+def make_app(db_path):
+    from app import create_app
+    return create_app(dict(BENCH_CONFIG, SQLALCHEMY_DATABASE_URI=f'sqlite:///{db_path}'))
+
+def seed(db_path, items, items_per_user=5, campuses=10, chunk=10000, seed_value=42):
+    """
+    Bulk insert a synthetic dataset with `items` listings
+    """
+    from app import db
+    from app.models.user import User
+    from app.models.item import Item
+    from app.models.trade import Trade, TradeItem
+    from app.models.message import Message
+
+    rng = random.Random(seed_value)
+    app = make_app(db_path)
+    users = max(2, items // items_per_user)
+    now = datetime.utcnow()
+
+    with app.app_context():
+        # Every benchmark user shares one hash, hashing 200k passwords would dominate seeding
+        from app.utils.hashing import get_password_hasher
+        password_hash = get_password_hasher().hash(BENCH_PASSWORD)
+
+        def insert(model, rows):
+            db.session.execute(db.insert(model), rows)
+
+        for start in range(1, users + 1, chunk):
+            insert(User, [{
+                'id': user_id,
+                'name': f'Student {user_id}',
+                'email': f'student{user_id}@uni{user_id % campuses}.edu',
+                'campus': f'uni{user_id % campuses}.edu',
+                'password_hash': password_hash,
+                'reputation_score': 5.0,
+                'join_date': now - timedelta(days=rng.randint(0, 700))
+            } for user_id in range(start, min(start + chunk, users + 1))])
+
+        for start in range(1, items + 1, chunk):
+            rows = []
+            for item_id in range(start, min(start + chunk, items + 1)):
+                user_id = rng.randint(1, users)
+                words = rng.sample(WORDS, 3)
+                rows.append({
+                    'id': item_id,
+                    'title': f'{words[0].title()} {words[1]}',
+                    'description': f'A used {words[0]} with a {words[1]} and {words[2]}',
+                    'category': rng.choice(CATEGORIES),
+                    'condition': 'Good',
+                    'tags': ','.join(words[1:]),
+                    'status': 'available' if rng.random() < 0.9 else 'traded',
+                    'campus': f'uni{user_id % campuses}.edu',
+                    'user_id': user_id,
+                    'date_listed': now - timedelta(minutes=rng.randint(0, 500000))
+                })
+            insert(Item, rows)
+
+        # Trades between users of the same campus, one in twenty items
+        trades = max(1, items // 20)
+        for start in range(1, trades + 1, chunk):
+            trade_rows, trade_items, messages = [], [], []
+            for trade_id in range(start, min(start + chunk, trades + 1)):
+                initiator = rng.randint(1, users)
+                recipient = initiator + campuses if initiator + campuses <= users else initiator - campuses
+                if recipient < 1:
+                    recipient = initiator
+                status = rng.choice(['pending', 'accepted', 'rejected', 'completed'])
+                trade_rows.append({
+                    'id': trade_id,
+                    'initiator_id': initiator,
+                    'recipient_id': recipient,
+                    'status': status,
+                    'creation_date': now - timedelta(hours=rng.randint(1, 5000)),
+                    'completion_date': now if status == 'completed' else None
+                })
+                trade_items.append({'trade_id': trade_id, 'offered_item_id': rng.randint(1, items)})
+                trade_items.append({'trade_id': trade_id, 'requested_item_id': rng.randint(1, items)})
+                messages.append({'trade_id': trade_id, 'sender_id': initiator, 'content': 'Would you trade?', 'timestamp': now})
+            insert(Trade, trade_rows)
+            insert(TradeItem, trade_items)
+            insert(Message, messages)
+
+        db.session.commit()
+        db.session.remove()
+
+    return users
+
+class Scenarios:
+    """
+    The requests each benchmark run makes, one list per blueprint
+    """
+
+    def __init__(self, app, users, items, seed_value=7):
+        from flask_jwt_extended import create_access_token
+        from app.models.user import User
+        from app.models.trade import Trade
+
+        self.rng = random.Random(seed_value)
+        self.items = items
+        self.users = users
+
+        with app.app_context():
+            self.sample_users = self.rng.sample(range(1, users + 1), min(50, users))
+            self.tokens = {}
+            self.emails = {}
+            for user in User.query.filter(User.id.in_(self.sample_users)):
+                self.tokens[user.id] = create_access_token(identity=user.id, additional_claims={'campus': user.campus})
+                self.emails[user.id] = user.email
+
+            self.trades = {}
+            for trade in Trade.query.filter(Trade.initiator_id.in_(self.sample_users)).limit(200):
+                self.trades.setdefault(trade.initiator_id, []).append(trade.id)
+
+    def _user(self):
+        user_id = self.rng.choice(self.sample_users)
+        return user_id, {'Authorization': f'Bearer {self.tokens[user_id]}'}
+
+    def _trade(self):
+        owners = list(self.trades)
+        if not owners:
+            return self._user() + (None,)
+        user_id = self.rng.choice(owners)
+        return user_id, {'Authorization': f'Bearer {self.tokens[user_id]}'}, self.rng.choice(self.trades[user_id])
+
+    def all(self):
+        """
+        Scenario name -> function returning (method, path, headers, json body)
+        """
+        def login():
+            user_id = self.rng.choice(self.sample_users)
+            return 'POST', '/api/auth/login', {}, {'email': self.emails[user_id], 'password': BENCH_PASSWORD}
+
+        def me():
+            _, headers = self._user()
+            return 'GET', '/api/auth/me', headers, None
+
+        def list_items():
+            _, headers = self._user()
+            return 'GET', f'/api/items?category={self.rng.choice(CATEGORIES)}', headers, None
+
+        def get_item():
+            return 'GET', f'/api/items/{self.rng.randint(1, self.items)}', {}, None
+
+        def create_item():
+            _, headers = self._user()
+            words = self.rng.sample(WORDS, 2)
+            return 'POST', '/api/items', headers, {
+                'title': f'Bench {words[0]}',
+                'description': f'Benchmark listing with a {words[1]}',
+                'category': self.rng.choice(CATEGORIES),
+                'tags': words
+            }
+
+        def list_trades():
+            _, headers, _ = self._trade()
+            return 'GET', '/api/trades', headers, None
+
+        def get_trade():
+            _, headers, trade_id = self._trade()
+            return 'GET', f'/api/trades/{trade_id or 1}', headers, None
+
+        def get_user():
+            return 'GET', f'/api/users/{self.rng.randint(1, self.users)}', {}, None
+
+        def user_items():
+            return 'GET', f'/api/users/{self.rng.randint(1, self.users)}/items', {}, None
+
+        def user_trades():
+            return 'GET', f'/api/users/{self.rng.randint(1, self.users)}/trades', {}, None
+
+        def recommendations():
+            _, headers = self._user()
+            return 'GET', '/recommendations?limit=10', headers, None
+
+        def instant_matches():
+            _, headers = self._user()
+            return 'POST', '/instant-matches', headers, {'description': ' '.join(self.rng.sample(WORDS, 2))}
+
+        def cycle_suggestions():
+            _, headers = self._user()
+            return 'GET', '/cycle-suggestions', headers, None
+
+        return {
+            'auth.login': login,
+            'auth.me': me,
+            'items.list': list_items,
+            'items.get': get_item,
+            'items.create': create_item,
+            'trades.list': list_trades,
+            'trades.get': get_trade,
+            'users.get': get_user,
+            'users.items': user_items,
+            'users.trades': user_trades,
+            'matching.recommendations': recommendations,
+            'matching.instant_matches': instant_matches,
+            'matching.cycle_suggestions': cycle_suggestions,
+        }
+
+def summarize(latencies, errors, elapsed):
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+    }
+
+def run_test_client(app, scenarios, requests_per_scenario):
+    """
+    Run each scenario sequentially in process through the Flask test client
+    """
+    client = app.test_client()
+    results = {}
+    for name, make_request in scenarios.items():
+        latencies, errors = [], 0
+        started = time.perf_counter()
+        for _ in range(requests_per_scenario):
+            method, path, headers, body = make_request()
+            start = time.perf_counter()
+            response = client.open(path, method=method, headers=headers, json=body)
+            latencies.append((time.perf_counter() - start) * 1000)
+            errors += response.status_code >= 400
+        results[name] = summarize(latencies, errors, time.perf_counter() - started)
+        print(f"  test client {name:28} {results[name]}")
+    return results
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_gunicorn(db_path, workers, threads):
+    port = free_port()
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{db_path}', **BENCH_CONFIG)
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--threads', str(threads),
+         '--bind', f'127.0.0.1:{port}', '--log-level', 'warning', 'run:app'],
+        cwd=BACKEND_DIR, env=env
+    )
+
+    import requests
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('gunicorn exited during startup')
+        try:
+            requests.get(f'http://127.0.0.1:{port}/api/items/categories', timeout=1)
+            return process, f'http://127.0.0.1:{port}'
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('gunicorn did not start within 60 seconds')
+
+def run_gunicorn(base_url, scenarios, requests_per_scenario, concurrency):
+    """
+    Run each scenario against a live gunicorn server from `concurrency` client threads
+    """
+    import requests
+    local = threading.local()
+
+    def session():
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        return local.session
+
+    results = {}
+    for name, make_request in scenarios.items():
+        planned = [make_request() for _ in range(requests_per_scenario)]
+        latencies, errors = [], []
+
+        def send(planned_request):
+            method, path, headers, body = planned_request
+            start = time.perf_counter()
+            try:
+                response = session().request(method, base_url + path, headers=headers, json=body, timeout=60)
+                failed = response.status_code >= 400
+            except requests.RequestException:
+                failed = True
+            latencies.append((time.perf_counter() - start) * 1000)
+            errors.append(failed)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(send, planned))
+        results[name] = summarize(latencies, sum(errors), time.perf_counter() - started)
+        print(f"  gunicorn    {name:28} {results[name]}")
+    return results
+
+def errored(results):
+    """
+    List the scenarios with failed requests
+    """
+    return [
+        f"{size} {mode} {name}: {current['errors']} of {current['requests']} requests failed"
+        for size, modes in results['results'].items()
+        for mode, scenarios in modes.items()
+        for name, current in scenarios.items()
+        if current['errors']
+    ]
+
+def compare(results, baseline, threshold):
+    """
+    List the scenarios whose p99 latency rose or throughput fell by more than threshold
+    """
+    failures = []
+    for size, modes in results['results'].items():
+        for mode, scenarios in modes.items():
+            for name, current in scenarios.items():
+                previous = baseline.get('results', {}).get(size, {}).get(mode, {}).get(name)
+                if not previous:
+                    continue
+                if previous['p99_ms'] and current['p99_ms'] > previous['p99_ms'] * (1 + threshold):
+                    failures.append(f"{size} {mode} {name}: p99 {current['p99_ms']} ms vs baseline {previous['p99_ms']} ms")
+                if previous['throughput_rps'] and current['throughput_rps'] < previous['throughput_rps'] * (1 - threshold):
+                    failures.append(f"{size} {mode} {name}: {current['throughput_rps']} rps vs baseline {previous['throughput_rps']} rps")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end API benchmark')
+    parser.add_argument('--sizes', default='10k', help='comma-separated item counts, e.g. 10k,100k,1m')
+    parser.add_argument('--modes', default='client,gunicorn', help='client, gunicorn or both')
+    parser.add_argument('--requests', type=int, default=100, help='requests per scenario')
+    parser.add_argument('--scenarios', default='', help='comma-separated scenario name prefixes to run')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=4, help='gunicorn threads per worker')
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads for the gunicorn run')
+    parser.add_argument('--db-dir', default=os.path.join(tempfile.gettempdir(), 'campus-barter-bench'))
+    parser.add_argument('--reseed', action='store_true', help='rebuild seeded databases')
+    parser.add_argument('--output', default=os.path.join(BACKEND_DIR, 'benchmarks', 'results', 'latest.json'))
+    parser.add_argument('--baseline', help='results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=float(os.environ.get('BENCH_REGRESSION_THRESHOLD', 0.2)),
+                        help='allowed relative regression in p99 latency or throughput')
+    parser.add_argument('--allow-errors', action='store_true', help='only warn when requests fail')
+    args = parser.parse_args()
+
+    modes = [mode.strip() for mode in args.modes.split(',') if mode.strip()]
+    prefixes = [prefix.strip() for prefix in args.scenarios.split(',') if prefix.strip()]
+    os.makedirs(args.db_dir, exist_ok=True)
+
+    results = {
+        'meta': {
+            'started_at': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'requests_per_scenario': args.requests,
+            'workers': args.workers,
+            'threads': args.threads,
+            'concurrency': args.concurrency,
+        },
+        'results': {}
+    }
+
+    for size in [parse_size(value) for value in args.sizes.split(',')]:
+        db_path = os.path.join(args.db_dir, f'bench_{size}.db')
+        if args.reseed and os.path.exists(db_path):
+            os.unlink(db_path)
+        if not os.path.exists(db_path):
+            print(f"Seeding {size} items into {db_path}")
+            start = time.perf_counter()
+            seed(db_path, size)
+            print(f"  seeded in {time.perf_counter() - start:.1f} s")
+
+        app = make_app(db_path)
+        with app.app_context():
+            from app import db
+            from app.models.user import User
+            users = db.session.query(db.func.max(User.id)).scalar()
+
+        scenarios = Scenarios(app, users, size).all()
+        if prefixes:
+            scenarios = {name: func for name, func in scenarios.items() if name.startswith(tuple(prefixes))}
+
+        print(f"Benchmarking {size} items")
+        size_results = results['results'][str(size)] = {}
+        if 'client' in modes:
+            size_results['test_client'] = run_test_client(app, scenarios, args.requests)
+        if 'gunicorn' in modes:
+            process, base_url = start_gunicorn(db_path, args.workers, args.threads)
+            try:
+                size_results['gunicorn'] = run_gunicorn(base_url, scenarios, args.requests, args.concurrency)
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    failures = []
+    for error in errored(results):
+        if args.allow_errors:
+            print(f"WARNING: {error}")
+        else:
+            failures.append(error)
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures += compare(results, json.load(f), args.threshold)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark for the barter cycle discovery engine
+
+Builds a synthetic catalog in memory and measures index build time, cycle
+search latency and incremental update cost. Exits non-zero if the p99
+search latency exceeds the time budget by more than the allowed slack.
+
+Usage:
+    python benchmarks/bench_cycles.py --items 100000 --queries 200
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.cycles import CycleEngine
+
+CATEGORIES = ['Textbooks', 'Electronics', 'Furniture', 'Clothing', 'Services', 'Food', 'Other']
+
+def synthetic_items(count, items_per_user=5, tag_vocabulary=500, seed=42):
+    """
+    Generate (item id, user id, category, tags) rows with skewed tag popularity
+    """
+    rng = random.Random(seed)
+    tags = [f'tag{i}' for i in range(tag_vocabulary)]
+    weights = [1.0 / (i + 1) for i in range(tag_vocabulary)]
+    users = max(1, count // items_per_user)
+
+    for item_id in range(1, count + 1):
+        item_tags = set(rng.choices(tags, weights=weights, k=rng.randint(1, 4)))
+        yield item_id, rng.randint(1, users), rng.choice(CATEGORIES), ','.join(item_tags)
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark barter cycle discovery')
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--budget-ms', type=float, default=200)
+    parser.add_argument('--max-out-degree', type=int, default=10)
+    parser.add_argument('--bucket-scan', type=int, default=200)
+    parser.add_argument('--slack', type=float, default=1.5, help='allowed p99 / budget ratio')
+    args = parser.parse_args()
+
+    rows = list(synthetic_items(args.items))
+    users = sorted({row[1] for row in rows})
+    rng = random.Random(7)
+
+    engine = CycleEngine(max_out_degree=args.max_out_degree, bucket_scan=args.bucket_scan)
+    start = time.perf_counter()
+    engine.load(rows)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    latencies = []
+    found = 0
+    complete = 0
+    for user_id in rng.sample(users, min(args.queries, len(users))):
+        start = time.perf_counter()
+        cycles, finished = engine.find_cycles(user_id, max_length=4, limit=10, time_budget=args.budget_ms / 1000)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found += bool(cycles)
+        complete += finished
+
+    # Incremental updates: re-list random items under new tags
+    update_latencies = []
+    for item_id in rng.sample(range(1, args.items + 1), 200):
+        user_id = engine.items[item_id][0] if item_id in engine.items else 1
+        start = time.perf_counter()
+        engine.update_item(item_id, user_id, rng.choice(CATEGORIES), f'tag{rng.randint(0, 50)}')
+        update_latencies.append((time.perf_counter() - start) * 1000)
+
+    results = {
+        'items': args.items,
+        'users': len(users),
+        'build_ms': round(build_ms, 1),
+        'search_p50_ms': round(percentile(latencies, 50), 2),
+        'search_p99_ms': round(percentile(latencies, 99), 2),
+        'queries_with_cycles': found,
+        'queries_completed_in_budget': complete,
+        'queries': len(latencies),
+        'update_p50_ms': round(percentile(update_latencies, 50), 3),
+        'update_p99_ms': round(percentile(update_latencies, 99), 3),
+    }
+    print(json.dumps(results, indent=2))
+
+    if results['search_p99_ms'] > args.budget_ms * args.slack:
+        print(f"FAIL: p99 search latency above {args.budget_ms * args.slack} ms")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
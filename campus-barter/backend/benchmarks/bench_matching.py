@@ -0,0 +1,258 @@
+"""
+Matching quality vs latency benchmark
+
+Generates a labelled synthetic catalog, where every item belongs to a topic,
+plus need queries and recommendation requests with known relevant items. It
+then runs every registered matching engine (see matching_engine() in
+app/utils/ai_matching.py) over them and reports per engine:
+
+- recall@k and nDCG@k against the labels
+- overlap@k with the reference engine's results, to check a faster engine
+  against the current exact behaviour
+- p50/p99 latency per call and peak Python memory
+
+Embeddings come from the deterministic fake provider (MATCHING_EMBEDDINGS=fake),
+so runs are reproducible offline and need no API key.
+
+Usage:
+    python benchmarks/bench_matching.py --items 5000 --queries 50 --k 10
+    python benchmarks/bench_matching.py --engines openai,mock --output matching.json
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Offline, reproducible embeddings
+os.environ['MATCHING_EMBEDDINGS'] = 'fake'
+
+# Topic -> (category, vocabulary). Several topics share a category so that
+# category alone is not enough to find the relevant items
+TOPICS = {
+    'calculus': ('Textbooks', ['calculus', 'derivative', 'integral', 'limits', 'stewart', 'series']),
+    'chemistry': ('Textbooks', ['chemistry', 'organic', 'molecule', 'reaction', 'lab', 'periodic']),
+    'history': ('Textbooks', ['history', 'empire', 'revolution', 'medieval', 'war', 'ancient']),
+    'gaming': ('Electronics', ['console', 'controller', 'gaming', 'joystick', 'playstation', 'xbox']),
+    'audio': ('Electronics', ['headphones', 'speaker', 'bluetooth', 'earbuds', 'amplifier', 'microphone']),
+    'computing': ('Electronics', ['laptop', 'keyboard', 'monitor', 'charger', 'mouse', 'usb']),
+    'seating': ('Furniture', ['chair', 'stool', 'beanbag', 'armchair', 'cushion', 'recliner']),
+    'lighting': ('Furniture', ['lamp', 'bulb', 'lantern', 'fairy', 'led', 'shade']),
+    'outerwear': ('Clothing', ['jacket', 'coat', 'parka', 'raincoat', 'hoodie', 'fleece']),
+    'footwear': ('Clothing', ['boots', 'sneakers', 'sandals', 'trainers', 'heels', 'loafers']),
+    'tutoring': ('Services', ['tutoring', 'lessons', 'essay', 'proofreading', 'coaching', 'homework']),
+    'baking': ('Food', ['cookies', 'cake', 'brownies', 'muffins', 'bread', 'pastry']),
+}
+FILLER = ['used', 'great', 'condition', 'cheap', 'student', 'campus', 'clean', 'barely', 'works', 'spare']
+
+def generate_catalog(items, users, rng):
+    """
+    Items as dicts with their topic label, spread over users
+    """
+    names = list(TOPICS)
+    catalog = []
+    for item_id in range(1, items + 1):
+        topic = rng.choice(names)
+        category, words = TOPICS[topic]
+        chosen = rng.sample(words, 4)
+        noise = rng.choice(TOPICS[rng.choice(names)][1])
+        catalog.append({
+            'id': item_id,
+            'topic': topic,
+            'user_id': rng.randint(1, users),
+            'title': f'{chosen[0].title()} {chosen[1]}',
+            'description': ' '.join([chosen[2]] + rng.sample(FILLER, 3) + [noise]),
+            'category': category,
+            'tags': ','.join(chosen[1:3]),
+            'words': set(chosen),
+        })
+    return catalog
+
+def generate_queries(count, rng):
+    """
+    Need descriptions as (topic, description words)
+    """
+    names = list(TOPICS)
+    queries = []
+    for _ in range(count):
+        topic = rng.choice(names)
+        queries.append((topic, rng.sample(TOPICS[topic][1], 2)))
+    return queries
+
+def need_relevance(catalog, topic, words):
+    # Same topic is relevant, and mentioning both query words more so
+    return {item['id']: 2 if set(words) <= item['words'] else 1 for item in catalog if item['topic'] == topic}
+
+def seed(app, catalog, users):
+    from app import db
+    from app.models.user import User
+    from app.models.item import Item
+
+    with app.app_context():
+        db.session.execute(db.insert(User), [
+            {'id': user_id, 'name': f'Student {user_id}', 'email': f'student{user_id}@bench.edu',
+             'campus': 'bench.edu', 'password_hash': 'x'}
+            for user_id in range(1, users + 1)
+        ])
+        db.session.execute(db.insert(Item), [
+            {'id': item['id'], 'title': item['title'], 'description': item['description'],
+             'category': item['category'], 'tags': item['tags'], 'status': 'available',
+             'campus': 'bench.edu', 'user_id': item['user_id']}
+            for item in catalog
+        ])
+        db.session.commit()
+        db.session.remove()
+
+def recall_at_k(ranked, relevance, k):
+    if not relevance:
+        return None
+    hits = sum(1 for item_id in ranked[:k] if item_id in relevance)
+    return hits / min(k, len(relevance))
+
+def ndcg_at_k(ranked, relevance, k):
+    if not relevance:
+        return None
+    dcg = sum(relevance.get(item_id, 0) / math.log2(rank + 2) for rank, item_id in enumerate(ranked[:k]))
+    ideal = sorted(relevance.values(), reverse=True)[:k]
+    idcg = sum(grade / math.log2(rank + 2) for rank, grade in enumerate(ideal))
+    return dcg / idcg if idcg else 0.0
+
+def overlap_at_k(ranked, reference, k):
+    if not reference:
+        return None
+    return len(set(ranked[:k]) & set(reference[:k])) / min(k, len(reference))
+
+def mean(values):
+    values = [value for value in values if value is not None]
+    return round(sum(values) / len(values), 4) if values else None
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] if values else 0.0
+
+def run_engine(app, engine, tasks, k):
+    """
+    Run an engine over every task. Returns (ranked ids per task, latencies in ms)
+    """
+    rankings, latencies = [], []
+    with app.test_request_context():
+        for kind, argument in tasks:
+            start = time.perf_counter()
+            if kind == 'need':
+                results = engine.find_instant_matches(need_description=argument, limit=k)
+                ranked = [result['item']['id'] for result in results]
+            else:
+                results = engine.get_trade_recommendations(user_id=argument, limit=k)
+                ranked = [result['recommended_item']['id'] for result in results]
+            latencies.append((time.perf_counter() - start) * 1000)
+            rankings.append(ranked)
+    return rankings, latencies
+
+def peak_memory_kb(app, engine, tasks, k):
+    tracemalloc.start()
+    try:
+        run_engine(app, engine, tasks, k)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+def main():
+    parser = argparse.ArgumentParser(description='Matching quality vs latency benchmark')
+    parser.add_argument('--items', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=0, help='defaults to items / 5')
+    parser.add_argument('--queries', type=int, default=40, help='need queries and recommendation requests each')
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--engines', default='', help='comma-separated engine names, default all registered')
+    parser.add_argument('--reference', default='openai', help='engine whose results define the exact behaviour')
+    parser.add_argument('--memory-tasks', type=int, default=5, help='tasks run under tracemalloc per engine')
+    parser.add_argument('--embedding-dtype', default='float32', choices=('float32', 'int8'), help='embedding store row type')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the results JSON here')
+    args = parser.parse_args()
+
+    from app import create_app
+    from app.utils.ai_matching import ENGINES
+
+    engines = [name.strip() for name in args.engines.split(',') if name.strip()] or list(ENGINES)
+    unknown = [name for name in engines + [args.reference] if name not in ENGINES]
+    if unknown:
+        parser.error(f"Unknown engines: {', '.join(unknown)}. Registered: {', '.join(ENGINES)}")
+    if args.reference not in engines:
+        engines.insert(0, args.reference)
+
+    rng = random.Random(args.seed)
+    users = args.users or max(2, args.items // 5)
+    catalog = generate_catalog(args.items, users, rng)
+
+    # Need queries, and recommendation requests for users with at least one item
+    tasks, relevance = [], []
+    for topic, words in generate_queries(args.queries, rng):
+        tasks.append(('need', 'Looking for ' + ' '.join(words)))
+        relevance.append(need_relevance(catalog, topic, words))
+
+    owners = {}
+    for item in catalog:
+        owners.setdefault(item['user_id'], []).append(item)
+    for user_id in rng.sample(sorted(owners), min(args.queries, len(owners))):
+        own_topics = {item['topic'] for item in owners[user_id]}
+        tasks.append(('recommendations', user_id))
+        relevance.append({item['id']: 1 for item in catalog if item['topic'] in own_topics and item['user_id'] != user_id})
+
+    db_fd, db_path = tempfile.mkstemp(suffix='.db')
+    store_dir = tempfile.TemporaryDirectory()
+    try:
+        app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+            'EMBEDDING_STORE_DIR': store_dir.name,
+            'EMBEDDING_STORE_DTYPE': args.embedding_dtype,
+            'MATCHING_DEADLINE_SECONDS': 600,  # No deadline cutting runs short
+        })
+        seed(app, catalog, users)
+
+        results = {
+            'meta': {'items': args.items, 'users': users, 'queries': args.queries, 'k': args.k,
+                     'seed': args.seed, 'reference': args.reference, 'embedding_dtype': args.embedding_dtype},
+            'engines': {}
+        }
+        reference_rankings = None
+
+        for name in engines:
+            engine = ENGINES[name]
+            rankings, latencies = run_engine(app, engine, tasks, args.k)
+            if name == args.reference:
+                reference_rankings = rankings
+
+            report = {}
+            for kind in ('need', 'recommendations'):
+                indexes = [i for i, (task_kind, _) in enumerate(tasks) if task_kind == kind]
+                report[kind] = {
+                    f'recall@{args.k}': mean([recall_at_k(rankings[i], relevance[i], args.k) for i in indexes]),
+                    f'ndcg@{args.k}': mean([ndcg_at_k(rankings[i], relevance[i], args.k) for i in indexes]),
+                    f'overlap@{args.k}': mean([overlap_at_k(rankings[i], reference_rankings[i], args.k) for i in indexes]),
+                    'p50_ms': round(percentile([latencies[i] for i in indexes], 50), 2),
+                    'p99_ms': round(percentile([latencies[i] for i in indexes], 99), 2),
+                }
+            report['peak_memory_kb'] = peak_memory_kb(app, engine, tasks[:args.memory_tasks], args.k)
+            results['engines'][name] = report
+            print(f"{name}: {json.dumps(report)}")
+    finally:
+        os.close(db_fd)
+        os.unlink(db_path)
+        store_dir.cleanup()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from app import create_app, db
+from app.models.archive import TradeArchive
+from app.models.message import Message
+from app.models.reputation import UserStats
+from app.models.trade import Trade
+from app.utils.jobs import enqueue, work
+from app.utils.reputation import rebuild_user_stats
+
+class TestTradeArchive(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.db_path}',
+            'TRADE_ARCHIVE_AFTER_DAYS': 30
+        })
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+        self.users, self.headers = [], []
+        for i in range(3):
+            response = self.client.post('/api/auth/register', json={
+                'name': f'User {i}',
+                'email': f'user{i}@example.com',
+                'password': 'password123'
+            })
+            data = response.get_json()
+            self.users.append(data['user']['id'])
+            self.headers.append({'Authorization': f"Bearer {data['access_token']}"})
+
+    def tearDown(self):
+        db.session.remove()
+        self.app_context.pop()
+        os.close(self.db_fd)
+        os.unlink(self.db_path)
+
+    def create_trade(self, status, **extra):
+        items = []
+        for i in range(2):
+            response = self.client.post('/api/items', json={
+                'title': f'Item {i}', 'description': 'Something to trade', 'category': 'Books'
+            }, headers=self.headers[i])
+            items.append(response.get_json()['item']['id'])
+        trade_id = self.client.post('/api/trades', json={
+            'recipient_id': self.users[1],
+            'offered_items': [items[0]],
+            'requested_items': [items[1]],
+            'message': 'Swap?'
+        }, headers=self.headers[0]).get_json()['trade']['id']
+        if status != 'pending':
+            self.client.put(f'/api/trades/{trade_id}', json=dict(status=status, **extra), headers=self.headers[1])
+        return trade_id
+
+    def age(self, trade_id, days):
+        ended = datetime.utcnow() - timedelta(days=days)
+        db.session.execute(
+            db.update(Trade).where(Trade.id == trade_id).values(completion_date=ended, updated_at=ended, creation_date=ended)
+        )
+        db.session.commit()
+
+    def archive(self):
+        job = enqueue('trades.archive')
+        db.session.commit()
+        work(self.app, once=True)
+        db.session.expire_all()
+        return job
+
+    def test_old_finished_trades_are_archived(self):
+        old_completed = self.create_trade('completed', rating=4)
+        old_rejected = self.create_trade('rejected')
+        old_pending = self.create_trade('pending')
+        recent = self.create_trade('completed')
+        for trade_id in (old_completed, old_rejected, old_pending):
+            self.age(trade_id, 90)
+        before = self.client.get(f'/api/trades/{old_completed}', headers=self.headers[0]).get_json()
+
+        self.archive()
+        self.assertEqual(sorted(archived.trade_id for archived in TradeArchive.query), [old_completed, old_rejected])
+        self.assertEqual(sorted(trade.id for trade in Trade.query), [old_pending, recent])
+        self.assertEqual(Message.query.filter(Message.trade_id.in_([old_completed, old_rejected])).count(), 0)
+
+        # Reads fall back to the archive
+        response = self.client.get(f'/api/trades/{old_completed}', headers=self.headers[0])
+        self.assertEqual(response.status_code, 200)
+        after = response.get_json()
+        self.assertTrue(after.pop('archived'))
+        self.assertEqual(after, before)
+        self.assertEqual(self.client.get(f'/api/trades/{old_completed}', headers=self.headers[2]).status_code, 403)
+
+        # Lists leave archived trades out unless asked
+        trades = self.client.get('/api/trades', headers=self.headers[0]).get_json()
+        self.assertEqual(sorted(trade['id'] for trade in trades), sorted([old_pending, recent]))
+        trades = self.client.get('/api/trades?archived=1', headers=self.headers[0]).get_json()
+        self.assertEqual(sorted(trade['id'] for trade in trades), sorted([old_completed, old_rejected, old_pending, recent]))
+        pending = self.client.get('/api/trades?status=pending', headers=self.headers[0]).get_json()
+        self.assertEqual([trade['id'] for trade in pending], [old_pending])
+
+        history = self.client.get(f'/api/users/{self.users[0]}/trades?per_page=1&page=2').get_json()
+        self.assertEqual([trade['trade_id'] for trade in history['trades']], [old_completed])
+
+    def test_archived_ratings_survive_a_stats_rebuild(self):
+        trade_id = self.create_trade('completed', rating=2)
+        self.create_trade('pending')
+        self.age(trade_id, 90)
+        self.archive()
+        self.assertIsNotNone(db.session.get(TradeArchive, trade_id))
+
+        before = {stats.user_id: stats.to_dict() for stats in UserStats.query.all()}
+        rebuild_user_stats()
+        db.session.expire_all()
+        after = {stats.user_id: stats.to_dict() for stats in UserStats.query.all()}
+        self.assertEqual(before, after)
+        self.assertEqual(after[self.users[0]]['rating_count'], 1)
+
+        # Running again moves nothing
+        job = self.archive()
+        self.assertEqual(job.to_dict()['result'], {'trades': 0, 'messages': 0})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from app import create_app, db
+from app.models.user import User
+from app.utils.hashing import PasswordHasher, HasherBusy
+
+class TestLoginProtection(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.db_path}',
+            'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+            'LOGIN_RATE_PER_ACCOUNT': '3/60'
+        })
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        
+        self.client.post('/api/auth/register', json={
+            'name': 'Test User',
+            'email': 'test@example.com',
+            'password': 'password123'
+        })
+
+    def tearDown(self):
+        db.session.remove()
+        self.app_context.pop()
+        os.close(self.db_fd)
+        os.unlink(self.db_path)
+
+    def test_rehash_on_login(self):
+        self.app.extensions['password_hasher'].method = 'pbkdf2:sha256:2000'
+        
+        response = self.client.post('/api/auth/login', json={
+            'email': 'test@example.com',
+            'password': 'password123'
+        })
+        self.assertEqual(response.status_code, 200)
+        
+        db.session.expire_all()
+        user = User.query.filter_by(email='test@example.com').first()
+        self.assertTrue(user.password_hash.startswith('pbkdf2:sha256:2000$'))
+
+    def test_login_throttled_per_account(self):
+        statuses = []
+        for _ in range(4):
+            response = self.client.post('/api/auth/login', json={
+                'email': 'Test@Example.com',
+                'password': 'wrong'
+            })
+            statuses.append(response.status_code)
+        
+        self.assertEqual(statuses, [401, 401, 401, 429])
+        self.assertIn('Retry-After', response.headers)
+
+    def test_hasher_refuses_work_when_queue_full(self):
+        hasher = PasswordHasher(max_workers=1, max_queue=1)
+        release = threading.Event()
+        
+        threads = [threading.Thread(target=hasher._run, args=(release.wait,)) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        while hasher._slots._value:
+            time.sleep(0.01)
+        
+        with self.assertRaises(HasherBusy):
+            hasher.hash('password123')
+        
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(hasher.verify(hasher.hash('password123'), 'password123'))
+
+    def test_slow_hash_reports_busy(self):
+        hasher = PasswordHasher(max_workers=1, max_queue=0, timeout=0.05)
+        release = threading.Event()
+        
+        with self.assertRaises(HasherBusy):
+            hasher._run(release.wait)
+        release.set()
+
+    def test_non_string_email_is_rejected(self):
+        for path in ('/api/auth/register', '/api/auth/login'):
+            response = self.client.post(path, json={
+                'name': 'Test User', 'email': ['test@example.com'], 'password': 'password123'
+            })
+            self.assertEqual(response.status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
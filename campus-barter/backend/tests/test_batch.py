@@ -0,0 +1,89 @@
+import os
+import tempfile
+import unittest
+from app import create_app, db
+from app.models.item import Item
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.db_path}',
+            'LOGIN_RATE_PER_IP': '2/600'
+        })
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+        response = self.client.post('/api/auth/register', json={
+            'name': 'User', 'email': 'user@example.com', 'password': 'password123'
+        })
+        data = response.get_json()
+        self.headers = {'Authorization': f"Bearer {data['access_token']}"}
+        self.user_id = data['user']['id']
+
+    def tearDown(self):
+        db.session.remove()
+        self.app_context.pop()
+        os.close(self.db_fd)
+        os.unlink(self.db_path)
+
+    def batch(self, requests, headers=None):
+        return self.client.post('/api/batch', json={'requests': requests}, headers=self.headers if headers is None else headers)
+
+    def test_dashboard_loads_in_one_round_trip(self):
+        response = self.batch([
+            {'id': 'me', 'path': '/api/auth/me'},
+            {'id': 'items', 'path': f'/api/users/{self.user_id}/items'},
+            {'id': 'trades', 'path': '/api/trades'},
+            {'id': 'categories', 'path': '/api/items/categories'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        responses = {entry['id']: entry for entry in response.get_json()['responses']}
+        self.assertEqual([entry['status'] for entry in responses.values()], [200, 200, 200, 200])
+        self.assertEqual(responses['me']['body']['id'], self.user_id)
+        self.assertEqual(responses['trades']['body'], [])
+
+    def test_writes_are_seen_by_later_reads(self):
+        responses = self.batch([
+            {'id': 'create', 'method': 'POST', 'path': '/api/items',
+             'body': {'title': 'Desk lamp', 'description': 'LED', 'category': 'Furniture'}},
+            {'id': 'mine', 'path': f'/api/users/{self.user_id}/items'},
+            {'id': 'all', 'path': '/api/items?category=Furniture'},
+        ]).get_json()['responses']
+
+        self.assertEqual(responses[0]['status'], 201)
+        self.assertEqual([item['title'] for item in responses[1]['body']], ['Desk lamp'])
+        self.assertEqual(len(responses[2]['body']), 1)
+        self.assertEqual(Item.query.count(), 1)
+
+    def test_sub_requests_share_the_batch_identity(self):
+        responses = self.batch([{'path': '/api/auth/me'}], headers={}).get_json()['responses']
+        self.assertEqual(responses[0]['status'], 401)
+
+    def test_invalid_batches_are_rejected(self):
+        self.assertEqual(self.batch([]).status_code, 400)
+        self.assertEqual(self.batch([{'path': '/api/batch', 'method': 'POST'}]).status_code, 400)
+        self.assertEqual(self.batch([{'path': '/api/auth/me'}] * 21).status_code, 400)
+
+    def test_http_errors_pass_through(self):
+        responses = self.batch([
+            {'path': '/api/nope'},
+            {'method': 'DELETE', 'path': '/api/items/categories'},
+        ]).get_json()['responses']
+        self.assertEqual([entry['status'] for entry in responses], [404, 405])
+        self.assertIn('Not Found', responses[0]['body'])
+
+    def test_sub_requests_count_against_the_callers_ip(self):
+        login = {'method': 'POST', 'path': '/api/auth/login', 'body': {'email': 'user@example.com', 'password': 'wrong'}}
+        
+        def statuses(ip):
+            response = self.client.post('/api/batch', json={'requests': [login]}, environ_base={'REMOTE_ADDR': ip})
+            return response.get_json()['responses'][0]['status']
+        
+        self.assertEqual([statuses('1.2.3.4') for _ in range(3)], [401, 401, 429])
+        self.assertEqual(statuses('9.9.9.9'), 401)
+
+if __name__ == '__main__':
+    unittest.main()
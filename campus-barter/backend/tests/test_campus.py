@@ -0,0 +1,133 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import timedelta
+from flask_jwt_extended import create_access_token
+from app import create_app, db
+from app.models.user import User
+from app.models.item import Item
+from app.models.schema_version import SchemaVersion
+from app.utils.campus import campus_from_email
+from app.utils.jobs import work
+from app.utils.startup import SCHEMA_VERSION
+
+class TestCampusFromEmail(unittest.TestCase):
+    def test_registrable_domain(self):
+        self.assertEqual(campus_from_email('jane@cs.Stanford.edu'), 'stanford.edu')
+        self.assertEqual(campus_from_email('sam@ox.ac.uk'), 'ox.ac.uk')
+        self.assertEqual(campus_from_email('sam@students.ox.ac.uk'), 'ox.ac.uk')
+        self.assertIsNone(campus_from_email('not-an-email'))
+        self.assertIsNone(campus_from_email('root@localhost'))
+
+class TestCampusPartitioning(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.db_path}'
+        })
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        
+        self.users = []
+        self.headers = []
+        self.items = []
+        for email in ('a@north.edu', 'b@mail.north.edu', 'c@south.edu'):
+            response = self.client.post('/api/auth/register', json={
+                'name': email,
+                'email': email,
+                'password': 'password123'
+            })
+            data = response.get_json()
+            self.users.append(data['user'])
+            self.headers.append({'Authorization': f"Bearer {data['access_token']}"})
+            response = self.client.post('/api/items', json={
+                'title': 'Graphing calculator',
+                'description': 'Works fine',
+                'category': 'Electronics',
+                'tags': ['math']
+            }, headers=self.headers[-1])
+            self.items.append(response.get_json()['item'])
+
+    def tearDown(self):
+        db.session.remove()
+        self.app_context.pop()
+        os.close(self.db_fd)
+        os.unlink(self.db_path)
+
+    def test_register_derives_campus(self):
+        self.assertEqual([user['campus'] for user in self.users], ['north.edu', 'north.edu', 'south.edu'])
+        self.assertEqual([item['campus'] for item in self.items], ['north.edu', 'north.edu', 'south.edu'])
+
+    def test_listings_and_matching_stay_on_campus(self):
+        listed = self.client.get('/api/items', headers=self.headers[0]).get_json()
+        self.assertEqual({item['campus'] for item in listed}, {'north.edu'})
+        
+        listed = self.client.get('/api/items?campus=south.edu').get_json()
+        self.assertEqual([item['id'] for item in listed], [self.items[2]['id']])
+        
+        recommendations = self.client.get('/recommendations', headers=self.headers[0]).get_json()
+        self.assertEqual([match['recommended_item']['id'] for match in recommendations], [self.items[1]['id']])
+        
+        matches = self.client.post('/instant-matches', json={'description': 'calculator'}, headers=self.headers[2]).get_json()
+        self.assertEqual([match['item']['id'] for match in matches], [self.items[2]['id']])
+        
+        cycles = self.client.get('/cycle-suggestions', headers=self.headers[0]).get_json()
+        self.assertEqual([cycle['participants'] for cycle in cycles], [[self.users[0]['id'], self.users[1]['id']]])
+
+    def test_bad_token_on_public_listing_is_anonymous(self):
+        expired = create_access_token(identity=self.users[0]['id'], expires_delta=timedelta(seconds=-1))
+        for token in (expired, 'not-a-token'):
+            response = self.client.get('/api/items', headers={'Authorization': f'Bearer {token}'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.get_json()), 3)
+
+    def test_standing_needs_stay_on_campus(self):
+        self.client.post('/instant-needs', json={'description': 'graphing calculator'}, headers=self.headers[2])
+        work(self.app, once=True)
+        
+        matches = self.client.get('/instant-needs/matches', headers=self.headers[2]).get_json()
+        self.assertEqual(matches, [])
+
+    def test_cross_campus_trade_rejected(self):
+        response = self.client.post('/api/trades', json={
+            'recipient_id': self.users[2]['id'],
+            'offered_items': [self.items[0]['id']],
+            'requested_items': [self.items[2]['id']]
+        }, headers=self.headers[0])
+        self.assertEqual(response.status_code, 400)
+
+class TestCampusUpgrade(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, self.db_path = tempfile.mkstemp(suffix='.db')
+
+    def tearDown(self):
+        os.close(self.db_fd)
+        os.unlink(self.db_path)
+
+    def test_existing_database_gains_campus_columns(self):
+        # A version 5 database without the campus columns
+        connection = sqlite3.connect(self.db_path)
+        connection.executescript('''
+            CREATE TABLE user (id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, email VARCHAR(120) NOT NULL UNIQUE,
+                password_hash VARCHAR(200) NOT NULL, profile_picture VARCHAR(200), bio TEXT, reputation_score FLOAT, join_date DATETIME);
+            CREATE TABLE item (id INTEGER PRIMARY KEY, title VARCHAR(100) NOT NULL, description TEXT NOT NULL, category VARCHAR(50) NOT NULL,
+                condition VARCHAR(50), images TEXT, tags VARCHAR(200), date_listed DATETIME, status VARCHAR(20), user_id INTEGER NOT NULL);
+            CREATE TABLE schema_version (id INTEGER PRIMARY KEY, version INTEGER NOT NULL, created_at DATETIME);
+            INSERT INTO user (id, name, email, password_hash) VALUES (1, 'Old', 'old@west.edu', 'x');
+            INSERT INTO item (id, title, description, category, status, user_id) VALUES (1, 'Lamp', 'Bright', 'Furniture', 'available', 1);
+            INSERT INTO schema_version (version) VALUES (5);
+        ''')
+        connection.close()
+        
+        app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.db_path}'})
+        with app.app_context():
+            self.assertEqual(db.session.get(User, 1).campus, 'west.edu')
+            self.assertEqual(db.session.get(Item, 1).campus, 'west.edu')
+            self.assertEqual(SchemaVersion.query.order_by(SchemaVersion.id.desc()).first().version, SCHEMA_VERSION)
+            db.session.remove()
+
+if __name__ == '__main__':
+    unittest.main()
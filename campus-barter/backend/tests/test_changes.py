@@ -0,0 +1,111 @@
+import os
+import tempfile
+import unittest
+from app import create_app, db
+from app.models.change import Change
+from app.utils.changes import changes_since
+
+class TestChangeFeed(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.db_path}',
+            'CHANGES_TOKEN': 'indexer-secret'
+        })
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+        # Two students on one campus and one elsewhere
+        self.headers, self.user_ids = [], []
+        for email in ('a@example.edu', 'b@example.edu', 'c@other.edu'):
+            response = self.client.post('/api/auth/register', json={
+                'name': email, 'email': email, 'password': 'password123'
+            })
+            data = response.get_json()
+            self.headers.append({'Authorization': f"Bearer {data['access_token']}"})
+            self.user_ids.append(data['user']['id'])
+
+    def tearDown(self):
+        db.session.remove()
+        self.app_context.pop()
+        os.close(self.db_fd)
+        os.unlink(self.db_path)
+
+    def create_item(self, headers, title):
+        return self.client.post('/api/items', json={
+            'title': title, 'description': 'Barely used', 'category': 'Electronics'
+        }, headers=headers).get_json()['item']
+
+    def changes(self, headers, since=0, **params):
+        params['since'] = since
+        response = self.client.get('/api/changes', query_string=params, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()
+
+    def test_mutations_are_logged_in_order(self):
+        lamp = self.create_item(self.headers[0], 'Desk lamp')
+        self.client.put(f"/api/items/{lamp['id']}", json={'title': 'LED desk lamp'}, headers=self.headers[0])
+        cursor = self.changes(self.headers[1])['cursor']
+
+        book = self.create_item(self.headers[1], 'Calculus textbook')
+        trade = self.client.post('/api/trades', json={
+            'recipient_id': self.user_ids[1],
+            'offered_items': [lamp['id']],
+            'requested_items': [book['id']],
+            'message': 'Swap?'
+        }, headers=self.headers[0]).get_json()['trade']
+        self.client.put(f"/api/trades/{trade['id']}", json={'status': 'accepted'}, headers=self.headers[1])
+        self.client.delete(f"/api/items/{lamp['id']}", headers=self.headers[0])
+
+        feed = self.changes(self.headers[1], since=cursor)
+        self.assertEqual(
+            [(change['entity'], change['operation']) for change in feed['changes']],
+            [('item', 'create'), ('trade', 'create'), ('message', 'create'), ('trade', 'update'), ('item', 'delete')]
+        )
+        self.assertEqual(feed['changes'][3]['data']['status'], 'accepted')
+        self.assertIsNone(feed['changes'][4]['data'])
+
+        # Nothing new after the returned cursor
+        self.assertEqual(self.changes(self.headers[1], since=feed['cursor'])['changes'], [])
+
+    def test_readers_only_see_their_campus_and_trades(self):
+        self.create_item(self.headers[0], 'Desk lamp')
+        self.create_item(self.headers[2], 'Winter jacket')
+
+        titles = [change['data']['title'] for change in self.changes(self.headers[1])['changes']]
+        self.assertEqual(titles, ['Desk lamp'])
+
+        # Indexers see everything
+        indexer = {'Authorization': 'Bearer indexer-secret'}
+        self.assertEqual(len(self.changes(indexer)['changes']), 2)
+        self.assertEqual(self.client.get('/api/changes').status_code, 401)
+
+    def test_paging(self):
+        for i in range(3):
+            self.create_item(self.headers[0], f'Book {i}')
+
+        page = self.changes(self.headers[0], limit=2)
+        self.assertTrue(page['has_more'])
+        rest = self.changes(self.headers[0], since=page['cursor'], limit=2)
+        self.assertFalse(rest['has_more'])
+        self.assertEqual(len(page['changes']) + len(rest['changes']), Change.query.count())
+
+    def test_cursor_only_passes_scanned_entries(self):
+        for i in range(3):
+            self.create_item(self.headers[2], f'Jacket {i}')
+        ids = [change.id for change in Change.query.order_by(Change.id)]
+
+        # Another campus's entries are skipped a window at a time
+        changes, cursor, has_more = changes_since(0, 10, user_id=self.user_ids[0], campus='example.edu', scan_limit=2)
+        self.assertEqual((changes, cursor, has_more), ([], ids[1], True))
+
+        # An entry added after the scan is still ahead of the cursor
+        lamp = self.create_item(self.headers[1], 'Desk lamp')
+        changes, cursor, has_more = changes_since(cursor, 10, user_id=self.user_ids[0], campus='example.edu', scan_limit=2)
+        self.assertEqual([change.entity_id for change in changes], [lamp['id']])
+        self.assertFalse(has_more)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+import os
+import tempfile
+import threading
+import unittest
+from app import create_app, db
+from app.utils.cycles import CycleEngine
+
+class TestCycleEngine(unittest.TestCase):
+    def setUp(self):
+        # Users 1, 2 and 3 each share one tag with the next, in different categories
+        self.engine = CycleEngine()
+        self.engine.load([
+            (10, 1, 'Textbooks', 'math,art'),
+            (20, 2, 'Electronics', 'math,music'),
+            (30, 3, 'Furniture', 'music,art'),
+            (40, 4, 'Food', 'snacks'),
+        ])
+
+    def test_finds_three_party_cycle(self):
+        cycles, complete = self.engine.find_cycles(1, max_length=4)
+        
+        self.assertTrue(complete)
+        participants = [tuple(cycle['participants']) for cycle in cycles]
+        self.assertIn((1, 2, 3), participants)
+        self.assertIn((1, 2), participants)
+        
+        three_way = next(cycle for cycle in cycles if cycle['participants'] == [1, 2, 3])
+        self.assertEqual(three_way['steps'], [(1, 2, 20), (2, 3, 30), (3, 1, 10)])
+
+    def test_unrelated_user_has_no_cycles(self):
+        cycles, _ = self.engine.find_cycles(4)
+        self.assertEqual(cycles, [])
+
+    def test_incremental_update_invalidates_edges(self):
+        self.engine.find_cycles(1)
+        self.engine.remove_item(30)
+        
+        cycles, _ = self.engine.find_cycles(1)
+        self.assertEqual([cycle['participants'] for cycle in cycles], [[1, 2]])
+        
+        self.engine.update_item(50, 4, 'Food', 'art')
+        cycles, _ = self.engine.find_cycles(1)
+        self.assertIn([1, 4], [cycle['participants'] for cycle in cycles])
+
+    def test_concurrent_updates_and_searches(self):
+        errors = []
+        
+        def churn(offset):
+            try:
+                for i in range(300):
+                    item_id = 1000 + offset * 1000 + i
+                    self.engine.update_item(item_id, 5 + i % 7, 'Textbooks', 'math,art')
+                    self.engine.find_cycles(1 + i % 3)
+                    self.engine.remove_item(item_id - 1)
+            except Exception as e:
+                errors.append(e)
+        
+        threads = [threading.Thread(target=churn, args=(offset,)) for offset in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_updates_do_not_wait_for_a_running_search(self):
+        edge = self.engine.edge
+        waited = []
+
+        def edge_with_update(from_user, to_user):
+            # An item change from another thread partway through the search
+            if not waited:
+                thread = threading.Thread(target=self.engine.update_item, args=(50, 4, 'Food', 'art'))
+                thread.start()
+                thread.join(timeout=1)
+                waited.append(thread.is_alive())
+            return edge(from_user, to_user)
+
+        self.engine.edge = edge_with_update
+        self.engine.find_cycles(1)
+        self.assertEqual(waited, [False])
+        self.assertIn(50, self.engine.items)
+
+class TestCycleSuggestionsEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.db_path}'
+        })
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        
+        self.tokens = []
+        for i, tags in enumerate([['math', 'art'], ['math', 'music'], ['music', 'art']]):
+            response = self.client.post('/api/auth/register', json={
+                'name': f'User {i}',
+                'email': f'user{i}@example.com',
+                'password': 'password123'
+            })
+            token = response.get_json()['access_token']
+            self.tokens.append(token)
+            self.client.post('/api/items', json={
+                'title': f'Item {i}',
+                'description': 'Something to trade',
+                'category': ['Textbooks', 'Electronics', 'Furniture'][i],
+                'tags': tags
+            }, headers={'Authorization': f'Bearer {token}'})
+
+    def tearDown(self):
+        db.session.remove()
+        self.app_context.pop()
+        os.close(self.db_fd)
+        os.unlink(self.db_path)
+
+    def test_cycle_suggestions(self):
+        response = self.client.get('/cycle-suggestions', headers={'Authorization': f'Bearer {self.tokens[0]}'})
+        self.assertEqual(response.status_code, 200)
+        
+        suggestions = response.get_json()
+        lengths = sorted(len(suggestion['participants']) for suggestion in suggestions)
+        self.assertIn(3, lengths)
+        self.assertEqual(suggestions[0]['steps'][0]['item']['status'], 'available')
+
+    def test_negative_limit_is_rejected(self):
+        response = self.client.get('/cycle-suggestions?limit=-1', headers={'Authorization': f'Bearer {self.tokens[0]}'})
+        self.assertEqual(response.status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
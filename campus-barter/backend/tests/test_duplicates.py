@@ -0,0 +1,114 @@
+import os
+import tempfile
+import unittest
+from app import create_app, db
+from app.models.item import Item
+from app.utils.ai_matching import MockAIMatchingSystem
+from app.utils.duplicates import cluster_duplicates, compute_signature, similarity
+from app.utils.jobs import enqueue, work
+
+TEXTBOOK = 'Calculus Early Transcendentals 8th edition by Stewart, some highlighting in chapter 3'
+
+class TestMinHash(unittest.TestCase):
+    def test_signatures_estimate_similarity(self):
+        original = compute_signature(TEXTBOOK)
+        self.assertEqual(similarity(original, compute_signature(TEXTBOOK)), 1.0)
+        self.assertGreater(similarity(original, compute_signature(TEXTBOOK + ' and 4')), 0.8)
+        self.assertLess(similarity(original, compute_signature('Desk lamp with LED bulb, barely used')), 0.2)
+
+class TestDuplicateListings(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.db_path}'
+        })
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+        self.headers = []
+        for i in range(2):
+            response = self.client.post('/api/auth/register', json={
+                'name': f'User {i}',
+                'email': f'user{i}@example.com',
+                'password': 'password123'
+            })
+            token = response.get_json()['access_token']
+            self.headers.append({'Authorization': f'Bearer {token}'})
+
+    def tearDown(self):
+        db.session.remove()
+        self.app_context.pop()
+        os.close(self.db_fd)
+        os.unlink(self.db_path)
+
+    def create_item(self, headers, title, description=TEXTBOOK):
+        return self.client.post('/api/items', json={
+            'title': title,
+            'description': description,
+            'category': 'Textbooks',
+            'tags': ['math']
+        }, headers=headers).get_json()
+
+    def test_repost_is_flagged_at_creation(self):
+        original = self.create_item(self.headers[0], 'Calculus textbook')
+        self.assertEqual(original['duplicates'], [])
+
+        repost = self.create_item(self.headers[0], 'Calculus textbook')
+        self.assertEqual(repost['item']['duplicate_of'], original['item']['id'])
+        self.assertEqual(repost['duplicates'], [{'item_id': original['item']['id'], 'similarity': 1.0}])
+
+        other = self.create_item(self.headers[0], 'Desk lamp', 'LED desk lamp with a spare bulb')
+        self.assertIsNone(other['item']['duplicate_of'])
+
+        # Deleting the original promotes the repost
+        self.client.delete(f"/api/items/{original['item']['id']}", headers=self.headers[0])
+        self.assertIsNone(db.session.get(Item, repost['item']['id']).duplicate_of)
+
+    def test_same_listing_from_different_owners_is_kept(self):
+        first = self.create_item(self.headers[0], 'TI-84 Plus calculator')['item']
+        second = self.create_item(self.headers[1], 'TI-84 Plus calculator')
+        self.assertIsNone(second['item']['duplicate_of'])
+        self.assertEqual(second['duplicates'], [])
+
+        # The cluster job keeps owners apart too
+        db.session.execute(db.update(Item).values(minhash=None))
+        db.session.commit()
+        self.assertEqual(cluster_duplicates()['duplicates'], 0)
+
+        matches = MockAIMatchingSystem.find_instant_matches('TI-84 Plus calculator', campus='example.com')
+        self.assertEqual(
+            sorted(match['item']['id'] for match in matches),
+            sorted([first['id'], second['item']['id']])
+        )
+
+    def test_matches_collapse_duplicates(self):
+        for _ in range(3):
+            self.create_item(self.headers[1], 'Calculus textbook')
+        lamp = self.create_item(self.headers[1], 'Desk lamp', 'LED desk lamp with a spare bulb')
+
+        matches = MockAIMatchingSystem.find_instant_matches('calculus textbook', campus='example.com')
+        self.assertEqual(len(matches), 2)
+        self.assertIn(lamp['item']['id'], [match['item']['id'] for match in matches])
+
+    def test_cluster_job_groups_existing_listings(self):
+        user_id = self.create_item(self.headers[0], 'Desk lamp', 'LED desk lamp with a spare bulb')['item']['user_id']
+
+        # Listings from before duplicate detection have no signature
+        db.session.execute(db.insert(Item), [
+            {'title': 'Calculus textbook', 'description': TEXTBOOK, 'category': 'Textbooks',
+             'status': 'available', 'campus': 'example.com', 'user_id': user_id}
+            for _ in range(3)
+        ])
+        enqueue('duplicates.cluster', key='duplicates.cluster')
+        db.session.commit()
+        work(self.app, once=True)
+
+        items = Item.query.filter_by(title='Calculus textbook').order_by(Item.id).all()
+        self.assertTrue(all(item.minhash for item in items))
+        self.assertEqual([item.duplicate_of for item in items], [None, items[0].id, items[0].id])
+        self.assertEqual(cluster_duplicates(), {'signed': 0, 'clusters': 1, 'duplicates': 2})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from app import create_app, db
+from app.models.user import User
+from app.models.item import Item
+from app.utils.ai_matching import AIMatchingSystem, fake_embedding
+from app.utils.embedding_store import EmbeddingStore, fingerprint
+
+class TestEmbeddingStore(unittest.TestCase):
+    def setUp(self):
+        self.store_dir = tempfile.TemporaryDirectory()
+        self.texts = {1: 'graphing calculator', 2: 'winter jacket', 3: 'desk lamp'}
+        self.fingerprints = {item_id: fingerprint(text) for item_id, text in self.texts.items()}
+
+    def tearDown(self):
+        self.store_dir.cleanup()
+
+    def fill(self, dtype):
+        store = EmbeddingStore(self.store_dir.name, dtype=dtype)
+        store.append({
+            item_id: (self.fingerprints[item_id], fake_embedding(text))
+            for item_id, text in self.texts.items()
+        })
+        return store
+
+    def test_other_workers_see_appends_and_compactions(self):
+        for dtype in ('float32', 'int8'):
+            with self.subTest(dtype=dtype):
+                writer = self.fill(dtype)
+                reader = EmbeddingStore(self.store_dir.name, dtype=dtype)
+                self.assertEqual(reader.delta_rows, 3)
+
+                writer.compact(live_ids={1, 2})
+                self.assertEqual(reader.delta_rows, 0)
+                self.assertEqual(reader.contains(self.fingerprints), {1, 2})
+
+                scores = reader.similarities(fake_embedding('graphing calculator'), self.fingerprints)
+                self.assertAlmostEqual(scores[1], 1.0, places=2)
+                self.assertLess(scores[2], 0.5)
+
+                writer.compact(live_ids=set())
+
+    def test_threads_share_one_reader(self):
+        writer = EmbeddingStore(self.store_dir.name)
+        reader = EmbeddingStore(self.store_dir.name)
+        texts = {item_id: f'listing number {item_id}' for item_id in range(1, 201)}
+        
+        for start in range(1, 201, 20):
+            writer.append({
+                item_id: (fingerprint(texts[item_id]), fake_embedding(texts[item_id]))
+                for item_id in range(start, start + 20)
+            })
+            # Every thread tails the new records at once
+            barrier = threading.Barrier(8)
+            def tail():
+                barrier.wait()
+                reader.refresh()
+            threads = [threading.Thread(target=tail) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        
+        # Every record was decoded once, at its own offset
+        self.assertEqual(reader.delta_rows, 200)
+        self.assertEqual(reader.contains({item_id: fingerprint(text) for item_id, text in texts.items()}), set(texts))
+
+    def test_edited_text_is_not_served(self):
+        store = self.fill('float32')
+        self.assertIsNone(store.get(1, fingerprint('scientific calculator')))
+        self.assertIsNotNone(store.get(1, self.fingerprints[1]))
+
+    def test_dimension_change_is_rejected(self):
+        store = self.fill('float32')
+        with self.assertRaises(ValueError):
+            store.append({4: (fingerprint('lamp'), [1.0, 0.0])})
+
+@mock.patch.dict(os.environ, {'MATCHING_EMBEDDINGS': 'fake'})
+class TestStoredMatching(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        self.store_dir = tempfile.TemporaryDirectory()
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.db_path}',
+            'EMBEDDING_STORE_DIR': self.store_dir.name,
+            'EMBEDDING_DELTA_MAX_ROWS': 2
+        })
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+        owner = User(name='Owner', email='owner@example.com', password_hash='x')
+        db.session.add(owner)
+        db.session.commit()
+        for title in ('Graphing calculator', 'Winter jacket', 'Desk lamp'):
+            db.session.add(Item(title=title, description='Barely used', category='Other', user_id=owner.id))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        self.app_context.pop()
+        os.close(self.db_fd)
+        os.unlink(self.db_path)
+        self.store_dir.cleanup()
+
+    def test_item_embeddings_are_fetched_once(self):
+        with self.app.test_request_context():
+            first = AIMatchingSystem.find_instant_matches('graphing calculator')
+            with mock.patch.object(AIMatchingSystem, 'get_text_embedding', side_effect=lambda text, timeout=None: fake_embedding(text)) as embed:
+                second = AIMatchingSystem.find_instant_matches('graphing calculator')
+
+        # Only the need is embedded the second time
+        self.assertEqual(embed.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(first[0]['item']['title'], 'Graphing calculator')
+
+    def test_large_delta_schedules_compaction(self):
+        from app.models.job import Job
+        from app.utils.jobs import work
+
+        with self.app.test_request_context():
+            AIMatchingSystem.find_instant_matches('graphing calculator')
+        self.assertEqual(Job.query.filter_by(kind='embeddings.compact').count(), 1)
+
+        work(self.app, once=True)
+        self.assertEqual(Job.query.filter_by(kind='embeddings.compact').one().status, 'done')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import os
+import json
+import tempfile
+import unittest
+from app import create_app, db
+from app.models.item import Item
+from app.utils.events import get_event_hub
+
+class TestTradeEvents(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.db_path}',
+            'EVENT_POLL_INTERVAL': 0.05,
+            'EVENT_HEARTBEAT_INTERVAL': 0.2
+        })
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        
+        self.user1 = self._register('Test User 1', 'test1@example.com')
+        self.user2 = self._register('Test User 2', 'test2@example.com')
+        
+        item1 = Item(title='Item 1', description='Desc 1', category='Books', user_id=self.user1['id'])
+        item2 = Item(title='Item 2', description='Desc 2', category='Books', user_id=self.user2['id'])
+        db.session.add_all([item1, item2])
+        db.session.commit()
+        
+        response = self.client.post('/api/trades', json={
+            'recipient_id': self.user2['id'],
+            'offered_items': [item1.id],
+            'requested_items': [item2.id]
+        }, headers=self._auth(self.user1))
+        self.trade_id = response.get_json()['trade']['id']
+
+    def tearDown(self):
+        db.session.remove()
+        self.app_context.pop()
+        os.close(self.db_fd)
+        os.unlink(self.db_path)
+
+    def _register(self, name, email):
+        response = self.client.post('/api/auth/register', json={
+            'name': name,
+            'email': email,
+            'password': 'password123'
+        })
+        data = response.get_json()
+        return dict(data['user'], token=data['access_token'])
+
+    def _auth(self, user):
+        return {'Authorization': f"Bearer {user['token']}"}
+
+    def _read_events(self, response, count):
+        events = []
+        for chunk in response.response:
+            chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+            for line in chunk.splitlines():
+                if line.startswith('data: '):
+                    events.append(json.loads(line[len('data: '):]))
+            if len(events) >= count:
+                break
+        response.close()
+        return events
+
+    def test_replay_after_last_event_id(self):
+        self.client.post(f'/api/trades/{self.trade_id}/messages', json={'content': 'Hello'},
+                         headers=self._auth(self.user1))
+        self.client.put(f'/api/trades/{self.trade_id}', json={'status': 'accepted'},
+                        headers=self._auth(self.user2))
+        
+        response = self.client.get('/api/trades/events', headers=dict(self._auth(self.user2), **{'Last-Event-ID': '0'}),
+                                   buffered=False)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        
+        events = self._read_events(response, 3)
+        self.assertEqual([event['type'] for event in events], ['trade', 'message', 'status'])
+        self.assertEqual(events[1]['data']['content'], 'Hello')
+        self.assertEqual(events[2]['data']['status'], 'accepted')
+
+    def test_live_event_delivered_to_other_party(self):
+        hub = get_event_hub()
+        subscription = hub.subscribe(self.user2['id'])
+        
+        self.client.post(f'/api/trades/{self.trade_id}/messages', json={'content': 'Still available?'},
+                         headers=self._auth(self.user1))
+        
+        event = subscription.get(timeout=2)
+        self.assertEqual(event['type'], 'message')
+        self.assertEqual(event['data']['sender_id'], self.user1['id'])
+        hub.unsubscribe(subscription)
+        self.assertEqual(hub.subscriber_count(), 0)
+
+    def test_token_accepted_in_query_string(self):
+        response = self.client.get(f"/api/trades/events?jwt={self.user1['token']}&last_event_id=0", buffered=False)
+        self.assertEqual(response.status_code, 200)
+        events = self._read_events(response, 1)
+        self.assertEqual(events[0]['data']['trade_id'], self.trade_id)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from app import create_app, db
+from app.models.change import Change
+from app.models.item import Item
+from app.utils.candidates import get_candidate_index
+from app.utils.expiry import expire_items
+from app.utils.jobs import enqueue, work
+
+class TestListingExpiry(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.db_path}',
+            'LISTING_TTL_DAYS': 30,
+            'ITEM_EXPIRY_BATCH_PAUSE': 0
+        })
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+        response = self.client.post('/api/auth/register', json={
+            'name': 'Seller', 'email': 'seller@example.com', 'password': 'password123'
+        })
+        self.headers = {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+    def tearDown(self):
+        db.session.remove()
+        self.app_context.pop()
+        os.close(self.db_fd)
+        os.unlink(self.db_path)
+
+    def create_item(self, title):
+        return self.client.post('/api/items', json={
+            'title': title, 'description': 'Barely used', 'category': 'Electronics'
+        }, headers=self.headers).get_json()['item']
+
+    def age(self, item_ids, days):
+        db.session.execute(
+            db.update(Item).where(Item.id.in_(item_ids))
+            .values(expires_at=datetime.utcnow() - timedelta(days=days))
+        )
+        db.session.commit()
+
+    def test_listings_get_a_term(self):
+        item = self.create_item('Desk lamp')
+        expires_at = datetime.fromisoformat(item['expires_at'])
+        self.assertAlmostEqual((expires_at - datetime.utcnow()).days, 29, delta=1)
+
+    def test_sweeper_expires_in_chunks_and_updates_indexes(self):
+        items = [self.create_item(f'Calculator {i}') for i in range(5)]
+        fresh = self.create_item('Fresh lamp')
+        with self.app.test_request_context():
+            index = get_candidate_index('example.com')
+        self.age([item['id'] for item in items], 1)
+        cursor = Change.query.order_by(Change.id.desc()).first().id
+
+        # Two per chunk, at most three per run
+        self.assertEqual(expire_items(batch_size=2, max_items=3), {'expired': 3, 'more': True})
+        job = enqueue('items.expire')
+        db.session.commit()
+        work(self.app, once=True)
+        self.assertEqual(job.to_dict()['result'], {'expired': 2, 'more': False})
+
+        statuses = {item.id: item.status for item in Item.query}
+        self.assertEqual([statuses[item['id']] for item in items], ['expired'] * 5)
+        self.assertEqual(statuses[fresh['id']], 'available')
+        for item in items:
+            self.assertNotIn(item['id'], index.categories)
+        self.assertIn(fresh['id'], index.categories)
+
+        listed = self.client.get('/api/items?campus=example.com').get_json()
+        self.assertEqual([item['id'] for item in listed], [fresh['id']])
+        self.assertEqual(Change.query.filter(Change.id > cursor).count(), 5)
+
+    def test_renewal(self):
+        item = self.create_item('Desk lamp')
+        self.age([item['id']], 1)
+        expire_items()
+
+        response = self.client.post(f"/api/items/{item['id']}/renew", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        renewed = response.get_json()['item']
+        self.assertEqual(renewed['status'], 'available')
+        self.assertGreater(datetime.fromisoformat(renewed['expires_at']), datetime.utcnow())
+        self.assertEqual(expire_items(), {'expired': 0, 'more': False})
+
+        self.client.put(f"/api/items/{item['id']}", json={'status': 'traded'}, headers=self.headers)
+        self.assertEqual(self.client.post(f"/api/items/{item['id']}/renew", headers=self.headers).status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
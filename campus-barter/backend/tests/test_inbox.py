@@ -0,0 +1,130 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from app import create_app, db
+from app.models.inbox import TradeCounters, TradeReadMarker
+from app.models.trade import Trade
+from app.utils.archive import archive_trades
+from app.utils.inbox import rebuild_trade_counters
+
+class TestInbox(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.db_path}'
+        })
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+        self.users, self.headers, self.items = [], [], []
+        for i in range(2):
+            response = self.client.post('/api/auth/register', json={
+                'name': f'User {i}',
+                'email': f'user{i}@example.com',
+                'password': 'password123'
+            })
+            data = response.get_json()
+            self.users.append(data['user']['id'])
+            self.headers.append({'Authorization': f"Bearer {data['access_token']}"})
+
+            items = []
+            for j in range(2):
+                response = self.client.post('/api/items', json={
+                    'title': f'Item {i}-{j}', 'description': 'Something to trade', 'category': 'Books'
+                }, headers=self.headers[i])
+                items.append(response.get_json()['item']['id'])
+            self.items.append(items)
+
+    def tearDown(self):
+        db.session.remove()
+        self.app_context.pop()
+        os.close(self.db_fd)
+        os.unlink(self.db_path)
+
+    def create_trade(self, message=None):
+        response = self.client.post('/api/trades', json={
+            'recipient_id': self.users[1],
+            'offered_items': [self.items[0][0]],
+            'requested_items': [self.items[1][0]],
+            'message': message
+        }, headers=self.headers[0])
+        return response.get_json()['trade']['id']
+
+    def summary(self, user):
+        response = self.client.get('/api/trades/summary', headers=self.headers[user])
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()
+
+    def send(self, user, trade_id, content):
+        self.client.post(f'/api/trades/{trade_id}/messages', json={'content': content}, headers=self.headers[user])
+
+    def test_new_user_has_empty_summary(self):
+        self.assertEqual(self.summary(0), {'unread_messages': 0, 'pending_received': 0, 'pending_sent': 0})
+
+    def test_pending_counts_follow_the_trade(self):
+        trade_id = self.create_trade()
+        self.assertEqual(self.summary(0)['pending_sent'], 1)
+        self.assertEqual(self.summary(1)['pending_received'], 1)
+
+        # A counter-offer hands the answer back to the initiator
+        self.client.post(f'/api/trades/{trade_id}/counter', json={
+            'offered_items': [self.items[0][1]], 'requested_items': [self.items[1][0]]
+        }, headers=self.headers[1])
+        self.assertEqual(self.summary(0), {'unread_messages': 0, 'pending_received': 1, 'pending_sent': 0})
+        self.assertEqual(self.summary(1), {'unread_messages': 0, 'pending_received': 0, 'pending_sent': 1})
+
+        self.client.put(f'/api/trades/{trade_id}', json={'status': 'accepted'}, headers=self.headers[0])
+        self.assertEqual(self.summary(0)['pending_received'], 0)
+        self.assertEqual(self.summary(1)['pending_sent'], 0)
+
+    def test_unread_messages(self):
+        trade_id = self.create_trade(message='Interested?')
+        self.send(0, trade_id, 'Still available?')
+        self.assertEqual(self.summary(1)['unread_messages'], 2)
+        self.assertEqual(self.summary(0)['unread_messages'], 0)
+
+        # Replying reads the thread
+        self.send(1, trade_id, 'Yes')
+        self.assertEqual(self.summary(1)['unread_messages'], 0)
+        self.assertEqual(self.summary(0)['unread_messages'], 1)
+
+        response = self.client.post(f'/api/trades/{trade_id}/read', headers=self.headers[0])
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual(data['summary']['unread_messages'], 0)
+        self.assertEqual(data['marker']['unread'], 0)
+        self.assertIsNotNone(data['marker']['last_read_message_id'])
+
+        self.assertEqual(self.client.post(f'/api/trades/{trade_id}/read', headers=self.headers[1]).status_code, 200)
+        self.assertEqual(self.client.post('/api/trades/999/read', headers=self.headers[0]).status_code, 404)
+
+    def test_archiving_drops_unread_counts(self):
+        trade_id = self.create_trade(message='Interested?')
+        self.client.put(f'/api/trades/{trade_id}', json={'status': 'rejected'}, headers=self.headers[1])
+        self.create_trade()  # The newest trade is never archived
+        self.assertEqual(self.summary(1)['unread_messages'], 1)
+
+        trade = db.session.get(Trade, trade_id)
+        trade.updated_at = datetime.utcnow() - timedelta(days=400)
+        db.session.commit()
+        self.assertEqual(archive_trades(older_than_days=365)['trades'], 1)
+
+        self.assertEqual(self.summary(1)['unread_messages'], 0)
+        self.assertEqual(TradeReadMarker.query.filter_by(trade_id=trade_id).count(), 0)
+
+    def test_rebuild_matches_live_counters(self):
+        trade_id = self.create_trade(message='Interested?')
+        self.create_trade()
+        self.send(1, trade_id, 'Maybe')
+        expected = [self.summary(user) for user in range(2)]
+
+        TradeCounters.query.delete()
+        db.session.commit()
+        rebuild_trade_counters()
+        self.assertEqual([self.summary(user) for user in range(2)], expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import os
+import tempfile
+import unittest
+from sqlalchemy import event
+from app import create_app, db
+
+class TestIncludes(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.db_path}'
+        })
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+        self.users, self.headers = [], []
+        for i in range(2):
+            response = self.client.post('/api/auth/register', json={
+                'name': f'User {i}',
+                'email': f'user{i}@example.com',
+                'password': 'password123'
+            })
+            data = response.get_json()
+            self.users.append(data['user']['id'])
+            self.headers.append({'Authorization': f"Bearer {data['access_token']}"})
+
+        # Three trades, each offering a different item of user 0
+        self.items = []
+        for i in range(4):
+            response = self.client.post('/api/items', json={
+                'title': f'Item {i}', 'description': f'Thing number {i}', 'category': 'Books'
+            }, headers=self.headers[0 if i < 3 else 1])
+            self.items.append(response.get_json()['item']['id'])
+        for i in range(3):
+            self.client.post('/api/trades', json={
+                'recipient_id': self.users[1],
+                'offered_items': [self.items[i]],
+                'requested_items': [self.items[3]],
+                'message': 'Swap?'
+            }, headers=self.headers[0])
+
+    def tearDown(self):
+        db.session.remove()
+        self.app_context.pop()
+        os.close(self.db_fd)
+        os.unlink(self.db_path)
+
+    def count_queries(self, path, headers=None):
+        statements = []
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            response = self.client.get(path, headers=headers)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        self.assertEqual(response.status_code, 200)
+        return response.get_json(), statements
+
+    def test_trades_embed_items_and_users(self):
+        trades, plain = self.count_queries('/api/trades', self.headers[0])
+        self.assertNotIn('initiator', trades[0])
+
+        trades, expanded = self.count_queries(
+            '/api/trades?include=items.offered_item.owner,initiator,recipient,messages.sender', self.headers[0]
+        )
+        self.assertEqual(len(trades), 3)
+        for trade in trades:
+            self.assertEqual(trade['initiator']['id'], self.users[0])
+            self.assertEqual(trade['recipient']['id'], self.users[1])
+            self.assertEqual(trade['messages'][0]['sender']['id'], self.users[0])
+            offered = [item['offered_item'] for item in trade['items'] if item['offered_item_id']]
+            self.assertEqual(offered[0]['owner']['id'], self.users[0])
+        requested = [item for item in trades[0]['items'] if item['requested_item_id']]
+        self.assertIsNone(requested[0]['offered_item'])
+
+        # One users query and one items query; owners and senders come from the loader's cache
+        self.assertEqual(len(expanded) - len(plain), 2)
+
+    def test_items_and_users(self):
+        item = self.client.get(f'/api/items/{self.items[0]}?include=owner').get_json()
+        self.assertEqual(item['owner']['name'], 'User 0')
+
+        user = self.client.get(f'/api/users/{self.users[0]}?include=items').get_json()
+        self.assertEqual(sorted(item['id'] for item in user['items']), self.items[:3])
+        self.assertIn('stats', user)
+
+        items, _ = self.count_queries('/api/items?campus=example.com&include=owner')
+        self.assertTrue(all(item['owner']['id'] == item['user_id'] for item in items))
+
+    def test_unknown_relations_are_rejected(self):
+        response = self.client.get('/api/items?include=owner.password_hash')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/trades?include=items.offered_item.owner.items', headers=self.headers[0])
+        self.assertEqual(response.status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from app import create_app, db
+from app.models.job import Job
+from app.utils.jobs import enqueue, claim_job, run_job, work, job_handler
+
+calls = []
+
+@job_handler('test.flaky')
+def flaky(payload):
+    calls.append(payload['n'])
+    if len(calls) < payload['fail_times'] + 1:
+        raise RuntimeError('temporary failure')
+    return {'n': payload['n']}
+
+class TestJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.db_path}',
+            'JOB_RETRY_BASE_SECONDS': 0
+        })
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        calls.clear()
+
+    def tearDown(self):
+        db.session.remove()
+        self.app_context.pop()
+        os.close(self.db_fd)
+        os.unlink(self.db_path)
+
+    def test_idempotent_key_reuses_pending_job(self):
+        first = enqueue('test.flaky', {'n': 1, 'fail_times': 0}, key='flaky:1')
+        second = enqueue('test.flaky', {'n': 1, 'fail_times': 0}, key='flaky:1')
+        db.session.commit()
+        
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(Job.query.count(), 1)
+
+    def test_retries_until_success(self):
+        job_id = enqueue('test.flaky', {'n': 7, 'fail_times': 2}).id
+        db.session.commit()
+        
+        self.assertEqual(work(self.app, once=True), 3)
+        
+        job = Job.query.get(job_id)
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(job.attempts, 3)
+        self.assertEqual(job.to_dict()['result'], {'n': 7})
+
+    def test_gives_up_after_max_attempts(self):
+        job_id = enqueue('test.flaky', {'n': 1, 'fail_times': 5}, max_attempts=2).id
+        db.session.commit()
+        
+        work(self.app, once=True)
+        
+        job = Job.query.get(job_id)
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('temporary failure', job.last_error)
+
+    def test_expired_lock_is_reclaimed(self):
+        job_id = enqueue('test.flaky', {'n': 1, 'fail_times': 0}).id
+        db.session.commit()
+        
+        self.assertEqual(claim_job('dead-worker', 300).id, job_id)
+        self.assertIsNone(claim_job('other-worker', 300))
+        
+        # Simulate the first worker dying with the lock held
+        Job.query.filter_by(id=job_id).update({'locked_until': datetime.utcnow() - timedelta(seconds=1)})
+        db.session.commit()
+        
+        job = claim_job('other-worker', 300)
+        self.assertEqual(job.id, job_id)
+        self.assertTrue(run_job(job, 'other-worker'))
+        self.assertEqual(Job.query.get(job_id).attempts, 2)
+
+    def test_running_job_is_queued_again(self):
+        job_id = enqueue('test.flaky', {'n': 1, 'fail_times': 0}, key='flaky:1').id
+        db.session.commit()
+        job = claim_job('first-worker', 300)
+
+        # A change made while it runs needs another run
+        again = enqueue('test.flaky', {'n': 2, 'fail_times': 0}, key='flaky:1')
+        db.session.commit()
+        self.assertEqual(again.id, job_id)
+        self.assertEqual(again.status, 'queued')
+
+        # The stale run's outcome is dropped
+        self.assertFalse(run_job(job, 'first-worker'))
+        self.assertEqual(work(self.app, once=True), 1)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(Job.query.get(job_id).to_dict()['result'], {'n': 2})
+
+    def test_expired_lock_on_last_attempt_fails_the_job(self):
+        job_id = enqueue('test.flaky', {'n': 1, 'fail_times': 0}, max_attempts=1).id
+        db.session.commit()
+        claim_job('dead-worker', 300)
+
+        Job.query.filter_by(id=job_id).update({'locked_until': datetime.utcnow() - timedelta(seconds=1)})
+        db.session.commit()
+
+        self.assertIsNone(claim_job('other-worker', 300))
+        job = Job.query.get(job_id)
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNone(job.locked_by)
+        self.assertEqual(calls, [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+from app import create_app, db
+from app.models.user import User
+from app.models.item import Item
+from app.utils.ai_matching import AIMatchingSystem
+
+def fake_embedding(text, timeout=None):
+    # Items titled "Slow" take longer than the deadline
+    time.sleep(2 if 'Slow' in text else 0.2)
+    return [1.0, float(len(text) % 7), 0.5]
+
+class TestMatchingDeadline(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        self.store_dir = tempfile.TemporaryDirectory()
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.db_path}',
+            'EMBEDDING_STORE_DIR': self.store_dir.name,
+            'MATCHING_DEADLINE_SECONDS': 1
+        })
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        
+        owner = User(name='Owner', email='owner@example.com', password_hash='x')
+        other = User(name='Other', email='other@example.com', password_hash='x')
+        db.session.add_all([owner, other])
+        db.session.commit()
+        self.owner_id = owner.id
+        
+        db.session.add(Item(title='Lamp', description='Desk lamp', category='Furniture', user_id=owner.id))
+        for i in range(6):
+            db.session.add(Item(title=f'Book {i}', description='Used book', category='Textbooks', user_id=other.id))
+        db.session.add(Item(title='Slow item', description='Never arrives', category='Other', user_id=other.id))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        self.app_context.pop()
+        os.close(self.db_fd)
+        os.unlink(self.db_path)
+        self.store_dir.cleanup()
+
+    @mock.patch.object(AIMatchingSystem, 'get_text_embedding', side_effect=fake_embedding)
+    def test_embeddings_fetched_concurrently_with_partial_results(self, _):
+        with self.app.test_request_context():
+            start = time.monotonic()
+            recommendations = AIMatchingSystem.get_trade_recommendations(self.owner_id, limit=20)
+            elapsed = time.monotonic() - start
+        
+        # Eight 0.2s calls run in parallel, and the slow one is abandoned at the deadline
+        self.assertLess(elapsed, 1.5)
+        titles = {r['recommended_item']['title'] for r in recommendations}
+        self.assertEqual(len(titles), 6)
+        self.assertNotIn('Slow item', titles)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,30 @@
+import os
+import unittest
+from unittest import mock
+from app.utils.ai_matching import (
+    ENGINES, AIMatchingSystem, MockAIMatchingSystem, fake_embedding, get_matching_system
+)
+
+class TestMatchingEngines(unittest.TestCase):
+    def test_builtin_engines_are_registered(self):
+        self.assertIs(ENGINES['openai'], AIMatchingSystem)
+        self.assertIs(ENGINES['mock'], MockAIMatchingSystem)
+
+    @mock.patch.dict(os.environ, {'MATCHING_ENGINE': 'openai'})
+    def test_engine_selected_by_name(self):
+        self.assertIs(get_matching_system(), AIMatchingSystem)
+
+    def test_fake_embeddings_are_deterministic_and_similarity_preserving(self):
+        calculator = fake_embedding('graphing calculator for calculus')
+        self.assertEqual(calculator, fake_embedding('graphing calculator for calculus'))
+        
+        similar = AIMatchingSystem.calculate_similarity(calculator, fake_embedding('calculus calculator'))
+        unrelated = AIMatchingSystem.calculate_similarity(calculator, fake_embedding('winter jacket'))
+        self.assertGreater(similar, unrelated)
+
+    @mock.patch.dict(os.environ, {'MATCHING_EMBEDDINGS': 'fake'})
+    def test_fake_provider_needs_no_api(self):
+        self.assertEqual(AIMatchingSystem.get_text_embedding('desk lamp'), fake_embedding('desk lamp'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from PIL import Image
+from sqlalchemy import event
+from app import create_app, db
+from app.models.media import MediaFile
+from app.utils.jobs import work
+
+class TestMediaUpload(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.tmp_dir, 'test.db')}",
+            'MEDIA_ROOT': os.path.join(self.tmp_dir, 'media'),
+            'MEDIA_THUMBNAIL_SIZE': 64
+        })
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        
+        response = self.client.post('/api/auth/register', json={
+            'name': 'Test User',
+            'email': 'test@example.com',
+            'password': 'password123'
+        })
+        self.headers = {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+    def tearDown(self):
+        db.session.remove()
+        self.app_context.pop()
+        shutil.rmtree(self.tmp_dir)
+
+    def _image_bytes(self, color='red', size=(400, 300)):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, color).save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    def _upload(self, data, filename='photo.png'):
+        return self.client.post('/api/media', data={'file': (io.BytesIO(data), filename)},
+                                headers=self.headers, content_type='multipart/form-data')
+
+    def test_upload_deduplicates_by_content(self):
+        data = self._image_bytes()
+        
+        first = self._upload(data)
+        second = self._upload(data)
+        
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(first.get_json()['media']['hash'], second.get_json()['media']['hash'])
+
+    def test_rejects_non_images(self):
+        response = self._upload(b'not an image')
+        self.assertEqual(response.status_code, 400)
+
+    def test_thumbnail_served_with_cache_headers_and_ranges(self):
+        media = self._upload(self._image_bytes()).get_json()['media']
+        
+        # Serve the original until the background job has built the thumbnail
+        response = self.client.get(media['thumbnail_url'])
+        self.assertEqual(response.mimetype, 'image/png')
+        self.assertIn('max-age=60', response.headers['Cache-Control'])
+        response.close()
+        
+        self.assertEqual(work(self.app, once=True), 1)
+        response = self.client.get(media['thumbnail_url'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'image/webp')
+        self.assertIn('immutable', response.headers['Cache-Control'])
+        self.assertLessEqual(max(Image.open(io.BytesIO(response.data)).size), 64)
+        
+        response = self.client.get(media['url'], headers={'Range': 'bytes=0-9'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(len(response.data), 10)
+
+    def test_webp_original_keeps_its_hash(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (400, 300), 'blue').save(buffer, 'WEBP', quality=100)
+        data = buffer.getvalue()
+        
+        media = self._upload(data, 'photo.webp').get_json()['media']
+        self.assertEqual(work(self.app, once=True), 1)
+        
+        response = self.client.get(media['url'])
+        self.assertEqual(hashlib.sha256(response.data).hexdigest(), media['hash'])
+        self.assertEqual(self.client.get(f"{media['url']}/webp").data, data)
+        self.assertLessEqual(max(Image.open(io.BytesIO(self.client.get(media['thumbnail_url']).data)).size), 64)
+
+    def test_concurrent_identical_upload(self):
+        data = self._image_bytes('green')
+        digest = hashlib.sha256(data).hexdigest()
+        
+        # Another request records the same image just before this one commits
+        inserted = []
+        def insert_first(session, flush_context, instances):
+            if not inserted and any(isinstance(obj, MediaFile) for obj in session.new):
+                inserted.append(digest)
+                with db.engine.begin() as connection:
+                    connection.execute(db.insert(MediaFile).values(
+                        hash=digest, content_type='image/png', extension='png', size=len(data)
+                    ))
+        event.listen(db.session, 'before_flush', insert_first)
+        try:
+            response = self._upload(data)
+        finally:
+            event.remove(db.session, 'before_flush', insert_first)
+        self.assertIn(response.status_code, (200, 201))
+        self.assertEqual(response.get_json()['media']['hash'], digest)
+        self.assertEqual(MediaFile.query.count(), 1)
+
+if __name__ == '__main__':
+    unittest.main()
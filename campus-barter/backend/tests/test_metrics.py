@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+from app import create_app, db
+from app.utils.metrics import Histogram, Counter, REQUEST_LATENCY, SQL_QUERIES, REMOTE_ERRORS, track_remote_call
+
+class TestMetricTypes(unittest.TestCase):
+    def test_histogram_renders_cumulative_buckets(self):
+        histogram = Histogram('test_seconds', 'Test', labels=('endpoint',), buckets=(0.1, 1))
+        histogram.observe(0.05, '/a')
+        histogram.observe(0.5, '/a')
+        histogram.observe(5, '/a')
+        
+        lines = list(histogram.samples())
+        self.assertIn('test_seconds_bucket{endpoint="/a",le="0.1"} 1', lines)
+        self.assertIn('test_seconds_bucket{endpoint="/a",le="1"} 2', lines)
+        self.assertIn('test_seconds_bucket{endpoint="/a",le="+Inf"} 3', lines)
+        self.assertIn('test_seconds_count{endpoint="/a"} 3', lines)
+
+    def test_label_values_are_escaped(self):
+        counter = Counter('test_total', 'Test', labels=('name',))
+        counter.inc('say "hi"\n')
+        self.assertEqual(list(counter.samples()), ['test_total{name="say \\"hi\\"\\n"} 1'])
+
+    def test_remote_call_errors_are_counted(self):
+        before = REMOTE_ERRORS.value('test', 'fail')
+        with self.assertRaises(RuntimeError):
+            with track_remote_call('test', 'fail'):
+                raise RuntimeError('boom')
+        self.assertEqual(REMOTE_ERRORS.value('test', 'fail'), before + 1)
+
+class TestMetricsEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.db_path}',
+            'QUERY_BUDGET_WARNINGS': True,
+            'QUERY_BUDGETS': {'/api/items': 0}
+        })
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+    def tearDown(self):
+        db.session.remove()
+        self.app_context.pop()
+        os.close(self.db_fd)
+        os.unlink(self.db_path)
+
+    def test_requests_and_sql_are_recorded(self):
+        requests_before = REQUEST_LATENCY.count('/api/items', 'GET', 200)
+        queries_before = SQL_QUERIES.value('/api/items')
+        
+        with self.assertLogs(self.app.logger, 'WARNING'):
+            response = self.client.get('/api/items')
+        self.assertEqual(response.headers['X-Query-Count'], '1')
+        
+        self.assertEqual(REQUEST_LATENCY.count('/api/items', 'GET', 200), requests_before + 1)
+        self.assertEqual(SQL_QUERIES.value('/api/items'), queries_before + 1)
+        
+        body = self.client.get('/metrics').get_data(as_text=True)
+        self.assertIn('# TYPE campus_barter_request_duration_seconds histogram', body)
+        self.assertIn('campus_barter_request_sql_queries_count{endpoint="/api/items"}', body)
+
+    def test_metrics_token(self):
+        self.app.config['METRICS_TOKEN'] = 'secret'
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        response = self.client.get('/metrics', headers={'Authorization': 'Bearer secret'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain'))
+
+if __name__ == '__main__':
+    unittest.main()
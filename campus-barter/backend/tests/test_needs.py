@@ -0,0 +1,96 @@
+import os
+import tempfile
+import unittest
+from app import create_app, db
+from app.models.job import Job
+from app.models.need import NeedKeyword
+from app.utils.jobs import work
+from app.utils.needs import extract_keywords
+
+class TestStandingNeeds(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.db_path}'
+        })
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        
+        self.headers = []
+        for i in range(2):
+            response = self.client.post('/api/auth/register', json={
+                'name': f'User {i}',
+                'email': f'user{i}@example.com',
+                'password': 'password123'
+            })
+            token = response.get_json()['access_token']
+            self.headers.append({'Authorization': f'Bearer {token}'})
+
+    def tearDown(self):
+        db.session.remove()
+        self.app_context.pop()
+        os.close(self.db_fd)
+        os.unlink(self.db_path)
+
+    def create_item(self, headers, title, description='Barely used', tags=None):
+        return self.client.post('/api/items', json={
+            'title': title,
+            'description': description,
+            'category': 'Electronics',
+            'tags': tags or []
+        }, headers=headers).get_json()['item']
+
+    def test_extract_keywords_skips_stopwords(self):
+        self.assertEqual(extract_keywords('I need a TI-84 calculator for the exam'), ['calculator', 'exam'])
+
+    def test_listing_changes_only_queue_need_matching(self):
+        item = self.create_item(self.headers[0], 'Desk lamp')
+        self.client.put(f"/api/items/{item['id']}", json={'description': 'Warm light'}, headers=self.headers[0])
+        self.assertEqual({job.kind for job in Job.query}, {'needs.match_item'})
+
+    def test_new_listing_matches_standing_need(self):
+        response = self.client.post('/instant-needs', json={'description': 'Looking for a graphing calculator'}, headers=self.headers[0])
+        self.assertEqual(response.status_code, 201)
+        need = response.get_json()['need']
+        self.assertEqual(need['keywords'], ['graphing', 'calculator'])
+        
+        item = self.create_item(self.headers[1], 'Graphing calculator', tags=['math'])
+        self.create_item(self.headers[1], 'Desk lamp')
+        work(self.app, once=True)
+        
+        matches = self.client.get('/instant-needs/matches', headers=self.headers[0]).get_json()
+        self.assertEqual([match['item']['id'] for match in matches], [item['id']])
+        self.assertEqual(matches[0]['need_id'], need['id'])
+        
+        # Matches are only returned once
+        self.assertEqual(self.client.get('/instant-needs/matches', headers=self.headers[0]).get_json(), [])
+
+    def test_own_listings_and_removed_needs_do_not_match(self):
+        need = self.client.post('/instant-needs', json={'description': 'graphing calculator'}, headers=self.headers[0]).get_json()['need']
+        self.create_item(self.headers[0], 'Graphing calculator')
+        work(self.app, once=True)
+        self.assertEqual(self.client.get('/instant-needs/matches', headers=self.headers[0]).get_json(), [])
+        
+        response = self.client.delete(f'/instant-needs/{need["id"]}', headers=self.headers[0])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(NeedKeyword.query.count(), 0)
+        
+        self.create_item(self.headers[1], 'Graphing calculator')
+        work(self.app, once=True)
+        self.assertEqual(self.client.get('/instant-needs/matches', headers=self.headers[0]).get_json(), [])
+        self.assertEqual(self.client.get('/instant-needs', headers=self.headers[0]).get_json(), [])
+
+    def test_new_need_is_backfilled_from_existing_listings(self):
+        item = self.create_item(self.headers[1], 'Graphing calculator')
+        self.client.post('/instant-needs', json={'description': 'graphing calculator'}, headers=self.headers[0])
+        work(self.app, once=True)
+        
+        needs = self.client.get('/instant-needs', headers=self.headers[0]).get_json()
+        self.assertEqual(needs[0]['unseen_matches'], 1)
+        matches = self.client.get('/instant-needs/matches', headers=self.headers[0]).get_json()
+        self.assertEqual([match['item']['id'] for match in matches], [item['id']])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import os
+import tempfile
+import unittest
+from app import create_app, db
+from app.models.trade import Trade
+from app.utils.negotiation import transition, TradeConflict
+
+class TestNegotiation(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.db_path}'
+        })
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+        self.users, self.headers = [], []
+        for i in range(2):
+            response = self.client.post('/api/auth/register', json={
+                'name': f'User {i}',
+                'email': f'user{i}@example.com',
+                'password': 'password123'
+            })
+            data = response.get_json()
+            self.users.append(data['user']['id'])
+            self.headers.append({'Authorization': f"Bearer {data['access_token']}"})
+
+        # Two items each
+        self.items = [[], []]
+        for owner in range(2):
+            for i in range(2):
+                response = self.client.post('/api/items', json={
+                    'title': f'Item {owner}-{i}', 'description': 'Something to trade', 'category': 'Books'
+                }, headers=self.headers[owner])
+                self.items[owner].append(response.get_json()['item']['id'])
+
+        response = self.client.post('/api/trades', json={
+            'recipient_id': self.users[1],
+            'offered_items': [self.items[0][0]],
+            'requested_items': [self.items[1][0]]
+        }, headers=self.headers[0])
+        self.trade = response.get_json()['trade']
+
+    def tearDown(self):
+        db.session.remove()
+        self.app_context.pop()
+        os.close(self.db_fd)
+        os.unlink(self.db_path)
+
+    def set_status(self, user, status, **extra):
+        return self.client.put(f"/api/trades/{self.trade['id']}", json=dict(status=status, **extra), headers=self.headers[user])
+
+    def counter(self, user, offered, requested, **extra):
+        return self.client.post(f"/api/trades/{self.trade['id']}/counter", json=dict(
+            offered_items=offered, requested_items=requested, **extra
+        ), headers=self.headers[user])
+
+    def test_transitions_bump_the_version(self):
+        self.assertEqual(self.trade['version'], 1)
+        response = self.set_status(1, 'accepted', version=1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['trade']['version'], 2)
+
+        # A second answer based on the same read loses
+        response = self.set_status(1, 'rejected', version=1)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.get_json()['trade']['status'], 'accepted')
+
+    def test_state_machine(self):
+        self.assertEqual(self.set_status(0, 'accepted').status_code, 403)
+        self.assertEqual(self.set_status(1, 'rejected').status_code, 200)
+        self.assertEqual(self.set_status(1, 'accepted').status_code, 400)
+        self.assertEqual(self.set_status(0, 'completed').status_code, 400)
+
+    def test_counter_offers_store_only_changed_items(self):
+        # The recipient asks for the other item instead; the offered side is unchanged
+        response = self.counter(1, [self.items[0][1]], [self.items[1][0]], message='How about this one?')
+        self.assertEqual(response.status_code, 201)
+        data = response.get_json()
+        self.assertEqual(data['revision']['changes'], {
+            'offered': {'added': [self.items[0][1]], 'removed': [self.items[0][0]]}
+        })
+        self.assertEqual(data['trade']['proposer_id'], self.users[1])
+        self.assertEqual(data['trade']['version'], 2)
+        self.assertEqual(
+            sorted(item['offered_item_id'] for item in data['trade']['items'] if item['offered_item_id']),
+            [self.items[0][1]]
+        )
+
+        # Now the initiator answers
+        self.assertEqual(self.set_status(1, 'accepted').status_code, 403)
+        self.assertEqual(self.counter(1, [self.items[0][0]], [self.items[1][0]]).status_code, 403)
+        self.assertEqual(self.counter(0, [self.items[0][1]], [self.items[1][0], self.items[1][1]]).status_code, 201)
+
+        revisions = self.client.get(f"/api/trades/{self.trade['id']}/revisions", headers=self.headers[0]).get_json()
+        self.assertEqual([revision['number'] for revision in revisions], [1, 2])
+        self.assertEqual(list(revisions[1]['changes']), ['requested'])
+
+    def test_invalid_counter_offers(self):
+        self.assertEqual(self.counter(1, [self.items[0][0]], [self.items[1][0]]).status_code, 400)
+        self.assertEqual(self.counter(1, [self.items[1][1]], [self.items[1][0]]).status_code, 400)
+        self.assertEqual(self.counter(1, [self.items[0][1]], [self.items[1][0]], version=5).status_code, 409)
+        self.assertEqual(self.counter(1, [self.items[0][1]], [self.items[1][0]], version='1').status_code, 400)
+
+    def test_concurrent_writer_wins(self):
+        trade = db.session.get(Trade, self.trade['id'])
+        self.assertEqual(trade.version, 1)
+
+        # Another worker accepts the trade after this one read it
+        with db.engine.begin() as connection:
+            connection.execute(
+                db.update(Trade).where(Trade.id == trade.id).values(status='accepted', version=2)
+            )
+
+        with self.assertRaises(TradeConflict):
+            transition(trade, self.users[1], 'rejected')
+        db.session.rollback()
+        self.assertEqual(db.session.get(Trade, self.trade['id']).status, 'accepted')
+
+if __name__ == '__main__':
+    unittest.main()
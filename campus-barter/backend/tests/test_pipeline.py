@@ -0,0 +1,128 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from app import create_app, db
+from app.utils.ai_matching import ENGINES, fake_embedding
+from app.utils.candidates import CandidateIndex, PipelineMatchingSystem, VectorIndex, get_candidate_index, parse_weights
+
+class TestCandidateIndex(unittest.TestCase):
+    def test_generators_are_unioned_deduplicated_and_capped(self):
+        index = CandidateIndex()
+        index.load([
+            (1, 'Graphing calculator', 'TI-84', 'Electronics', 'math'),
+            (2, 'Desk lamp', 'LED', 'Furniture', 'lighting'),
+            (3, 'Calculus textbook', 'Stewart', 'Textbooks', 'math'),
+        ])
+        self.assertEqual(
+            sorted(index.generate(categories=['Electronics'], tags=['math'], keywords=['calculator'])),
+            [1, 3]
+        )
+        self.assertEqual(len(index.generate(tags=['math'], max_candidates=1)), 1)
+
+        index.remove_item(1)
+        self.assertEqual(index.generate(categories=['Electronics'], keywords=['calculator']), [])
+
+    def test_vector_search_finds_nearest_items(self):
+        vectors = VectorIndex()
+        texts = {1: 'graphing calculator calculus', 2: 'winter jacket coat', 3: 'desk lamp bulb'}
+        for item_id, text in texts.items():
+            vectors.add(item_id, fake_embedding(text))
+        self.assertEqual(vectors.search(fake_embedding('graphing calculator calculus'), 1), [1])
+
+    def test_concurrent_updates_and_searches(self):
+        index = CandidateIndex()
+        query = fake_embedding('graphing calculator calculus')
+        errors = []
+
+        def churn(offset):
+            try:
+                for i in range(300):
+                    item_id = 1000 + offset * 1000 + i
+                    index.update_item(item_id, f'Calculator {i}', 'graphing', 'Electronics', 'math,art')
+                    index.vectors.add(item_id, fake_embedding(f'graphing calculator {i}'))
+                    index.generate(categories=['Electronics'], tags=['math'], keywords=['calculator'], vector=query)
+                    index.vectors.get(range(item_id - 5, item_id))
+                    index.remove_item(item_id - 1)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=churn, args=(offset,)) for offset in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_unknown_weight_is_rejected(self):
+        self.assertEqual(parse_weights('similarity=1')['category'], 0.0)
+        with self.assertRaises(ValueError):
+            parse_weights('price=1')
+
+@mock.patch.dict(os.environ, {'MATCHING_EMBEDDINGS': 'fake'})
+class TestPipelineMatching(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.db_path}'
+        })
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+        self.headers = []
+        for i in range(2):
+            response = self.client.post('/api/auth/register', json={
+                'name': f'User {i}',
+                'email': f'user{i}@example.com',
+                'password': 'password123'
+            })
+            token = response.get_json()['access_token']
+            self.headers.append({'Authorization': f'Bearer {token}'})
+
+    def tearDown(self):
+        db.session.remove()
+        self.app_context.pop()
+        os.close(self.db_fd)
+        os.unlink(self.db_path)
+
+    def create_item(self, headers, title, category='Electronics', tags=None):
+        return self.client.post('/api/items', json={
+            'title': title,
+            'description': 'Barely used',
+            'category': category,
+            'tags': tags or []
+        }, headers=headers).get_json()['item']
+
+    def test_pipeline_engine_is_registered(self):
+        self.assertIs(ENGINES['pipeline'], PipelineMatchingSystem)
+
+    def test_instant_matches_rank_relevant_items_first(self):
+        calculator = self.create_item(self.headers[1], 'Graphing calculator', tags=['math'])
+        self.create_item(self.headers[1], 'Winter jacket', category='Clothing')
+
+        matches = PipelineMatchingSystem.find_instant_matches('graphing calculator for calculus', campus='example.com')
+        self.assertEqual(matches[0]['item']['id'], calculator['id'])
+
+    def test_recommendations_exclude_own_items(self):
+        self.create_item(self.headers[0], 'Graphing calculator', tags=['math'])
+        lamp = self.create_item(self.headers[0], 'Desk lamp', category='Furniture')
+        calculus = self.create_item(self.headers[1], 'Scientific calculator', tags=['math'])
+
+        user_id = lamp['user_id']
+        recommended = [match['recommended_item']['id'] for match in PipelineMatchingSystem.get_trade_recommendations(user_id)]
+        self.assertEqual(recommended, [calculus['id']])
+
+    def test_index_follows_item_changes(self):
+        with self.app.test_request_context():
+            index = get_candidate_index('example.com')
+        item = self.create_item(self.headers[1], 'Graphing calculator')
+        self.assertIn(item['id'], index.categories)
+
+        self.client.delete(f"/api/items/{item['id']}", headers=self.headers[1])
+        self.assertNotIn(item['id'], index.categories)
+
+if __name__ == '__main__':
+    unittest.main()
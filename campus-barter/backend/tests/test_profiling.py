@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+import unittest
+from app import create_app, db
+
+class TestRequestProfiling(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        self.profile_dir = tempfile.mkdtemp()
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.db_path}',
+            'PROFILING_ENABLED': True,
+            'PROFILING_TOKEN': 'let-me-profile',
+            'PROFILE_DIR': self.profile_dir
+        })
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+    def tearDown(self):
+        db.session.remove()
+        self.app_context.pop()
+        os.close(self.db_fd)
+        os.unlink(self.db_path)
+        shutil.rmtree(self.profile_dir)
+
+    def test_profiles_request_with_token(self):
+        response = self.client.get('/api/items', headers={
+            'X-Profile': 'let-me-profile',
+            'X-Profile-Top': '5',
+            'X-Request-ID': 'slow-items-1'
+        })
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['X-Request-ID'], 'slow-items-1')
+        self.assertEqual(len(response.headers['X-Profile-Summary'].split('; ')), 5)
+        self.assertTrue(os.path.exists(os.path.join(self.profile_dir, 'slow-items-1.prof')))
+
+    def test_unsafe_request_id_is_replaced(self):
+        response = self.client.get('/api/items', headers={'X-Profile': 'let-me-profile', 'X-Request-ID': '../../etc'})
+        
+        request_id = response.headers['X-Request-ID']
+        self.assertNotIn('/', request_id)
+        self.assertEqual(os.listdir(self.profile_dir), [f'{request_id}.prof'])
+        self.assertNotIn('X-Profile-Summary', response.headers)
+
+    def test_requests_without_token_are_not_profiled(self):
+        response = self.client.get('/api/items', headers={'X-Profile': 'wrong'})
+        
+        self.assertNotIn('X-Request-ID', response.headers)
+        self.assertEqual(os.listdir(self.profile_dir), [])
+
+if __name__ == '__main__':
+    unittest.main()
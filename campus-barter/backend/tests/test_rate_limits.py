@@ -0,0 +1,110 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+from flask import g
+from app import create_app, db
+from app.utils import ai_matching
+from app.utils.ai_matching import AIMatchingSystem
+from app.utils.rate_limit import RateLimiter, SharedRateLimiter, RemoteBudgetExceeded, charge_remote_calls_to
+
+class TestMatchingLimits(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.db_path}',
+            'ITEM_ANALYSIS_RATE_PER_USER': '2/60',
+            'REMOTE_BUDGET_PER_USER': '25/3600'
+        })
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+        self.headers, self.items = [], []
+        for i in range(2):
+            response = self.client.post('/api/auth/register', json={
+                'name': f'User {i}', 'email': f'user{i}@example.com', 'password': 'password123'
+            })
+            headers = {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+            self.headers.append(headers)
+            self.items.append(self.client.post('/api/items', json={
+                'title': 'Desk lamp', 'description': 'Barely used', 'category': 'Furniture'
+            }, headers=headers).get_json()['item'])
+
+    def tearDown(self):
+        db.session.remove()
+        self.app_context.pop()
+        os.close(self.db_fd)
+        os.unlink(self.db_path)
+
+    def analyze(self, user):
+        return self.client.get(f"/item-analysis/{self.items[user]['id']}", headers=self.headers[user])
+
+    @mock.patch.dict(os.environ, {'MATCHING_ENGINE': 'mock'})
+    def test_endpoint_buckets_are_per_user(self):
+        statuses = [self.analyze(0).status_code for _ in range(3)]
+        self.assertEqual(statuses[2], 429)
+        self.assertNotEqual(statuses[1], 429)
+        self.assertGreater(int(self.analyze(0).headers['Retry-After']), 0)
+
+        # Someone else is unaffected
+        self.assertNotEqual(self.analyze(1).status_code, 429)
+
+    @mock.patch.dict(os.environ, {'MATCHING_ENGINE': 'openai'})
+    @mock.patch.object(ai_matching, 'get_openai')
+    def test_remote_calls_are_weighted_against_the_budget(self, get_openai):
+        get_openai.return_value.ChatCompletion.create.return_value = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content='Add a photo'))]
+        )
+
+        # A chat completion costs 20 of the 25 units
+        response = self.analyze(0)
+        self.assertEqual(response.get_json(), {'analysis': 'Add a photo'})
+        response = self.analyze(0)
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response.headers['Retry-After']), 60)
+        self.assertEqual(get_openai.return_value.ChatCompletion.create.call_count, 1)
+
+        # Embeddings cost 1 each, so the remaining 5 units cover 5 of 8 texts
+        with self.app.test_request_context(), \
+                mock.patch.object(AIMatchingSystem, 'get_text_embedding', side_effect=lambda text, timeout=None: [1.0, 0.0]):
+            charge_remote_calls_to(1)
+            embeddings = AIMatchingSystem.get_embeddings({i: f'text {i}' for i in range(8)}, ai_matching.matching_deadline())
+            self.assertEqual(sorted(embeddings), [0, 1, 2, 3, 4])
+            self.assertTrue(g.matching_partial)
+            with self.assertRaises(RemoteBudgetExceeded):
+                AIMatchingSystem.get_embeddings({0: 'more'}, ai_matching.matching_deadline())
+
+class TestSharedRateLimiter(unittest.TestCase):
+    def test_processes_share_buckets(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'limits.db')
+            first = SharedRateLimiter('2/60', path, 'TEST_RATE')
+            second = SharedRateLimiter('2/60', path, 'TEST_RATE')
+
+            self.assertTrue(first.consume('user:1')[0])
+            self.assertTrue(second.consume('user:1')[0])
+            allowed, retry_after = first.consume('user:1')
+            self.assertFalse(allowed)
+            self.assertAlmostEqual(retry_after, 30, delta=1)
+            self.assertTrue(second.consume('user:2')[0])
+
+            # Other limiters in the same file keep their own buckets
+            self.assertTrue(SharedRateLimiter('1/60', path, 'OTHER_RATE').consume('user:1')[0])
+
+    def test_many_calls_take_one_transaction(self):
+        with tempfile.TemporaryDirectory() as directory:
+            shared = SharedRateLimiter('200/3600', os.path.join(directory, 'limits.db'), 'TEST_RATE')
+            for limiter in (RateLimiter('200/3600'), shared):
+                with self.subTest(limiter=type(limiter).__name__):
+                    self.assertEqual(limiter.consume_up_to('user:1', 1, 150), (150, 0))
+                    self.assertEqual(limiter.consume_up_to('user:1', 20, 5)[0], 2)
+                    granted, retry_after = limiter.consume_up_to('user:1', 20, 5)
+                    self.assertEqual(granted, 0)
+                    self.assertGreater(retry_after, 0)
+            self.assertEqual(shared._calls, 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import os
+import tempfile
+import unittest
+from app import create_app, db
+from app.models.reputation import UserStats
+from app.utils.reputation import rebuild_user_stats
+
+class TestReputation(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.db_path}'
+        })
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        
+        self.users = []
+        self.headers = []
+        for i in range(2):
+            response = self.client.post('/api/auth/register', json={
+                'name': f'User {i}',
+                'email': f'user{i}@example.com',
+                'password': 'password123'
+            })
+            data = response.get_json()
+            self.users.append(data['user']['id'])
+            self.headers.append({'Authorization': f"Bearer {data['access_token']}"})
+
+    def tearDown(self):
+        db.session.remove()
+        self.app_context.pop()
+        os.close(self.db_fd)
+        os.unlink(self.db_path)
+
+    def create_trade(self):
+        items = []
+        for i in range(2):
+            response = self.client.post('/api/items', json={
+                'title': f'Item {i}',
+                'description': 'Something to trade',
+                'category': 'Textbooks'
+            }, headers=self.headers[i])
+            items.append(response.get_json()['item']['id'])
+        
+        response = self.client.post('/api/trades', json={
+            'recipient_id': self.users[1],
+            'offered_items': [items[0]],
+            'requested_items': [items[1]]
+        }, headers=self.headers[0])
+        return response.get_json()['trade']['id']
+
+    def set_status(self, trade_id, user, status, **extra):
+        return self.client.put(f'/api/trades/{trade_id}', json=dict(status=status, **extra), headers=self.headers[user])
+
+    def test_completion_updates_stats_and_reputation(self):
+        trade_id = self.create_trade()
+        self.set_status(trade_id, 1, 'accepted')
+        response = self.set_status(trade_id, 0, 'completed', rating=3, comment='Late but fine')
+        self.assertEqual(response.status_code, 200)
+        self.set_status(trade_id, 1, 'completed', rating=5)
+        
+        profile = self.client.get(f'/api/users/{self.users[1]}').get_json()
+        self.assertEqual(profile['reputation_score'], 3.0)
+        self.assertEqual(profile['stats']['trades_completed'], 1)
+        self.assertEqual(profile['stats']['rating_count'], 1)
+        self.assertIsNotNone(profile['stats']['average_response_seconds'])
+        
+        # Marking an already completed trade as completed again is not counted twice
+        other = self.client.get(f'/api/users/{self.users[0]}').get_json()
+        self.assertEqual(other['stats']['trades_completed'], 1)
+        self.assertEqual(other['reputation_score'], 5.0)
+
+    def test_invalid_ratings_are_rejected(self):
+        trade_id = self.create_trade()
+        self.assertEqual(self.set_status(trade_id, 1, 'accepted', rating=4).status_code, 400)
+        self.assertEqual(self.set_status(trade_id, 0, 'completed', rating=9).status_code, 400)
+        self.assertEqual(self.set_status(trade_id, 0, 'completed', rating=4).status_code, 200)
+        self.assertEqual(self.set_status(trade_id, 0, 'completed', rating=4).status_code, 400)
+        
+        # Failed requests leave the stats untouched
+        self.assertEqual(db.session.get(UserStats, self.users[0]).trades_completed, 1)
+
+    def test_trade_history(self):
+        trade_id = self.create_trade()
+        self.set_status(trade_id, 0, 'completed', rating=4)
+        self.create_trade()
+        
+        history = self.client.get(f'/api/users/{self.users[1]}/trades').get_json()
+        self.assertEqual([trade['trade_id'] for trade in history['trades']], [trade_id])
+        self.assertEqual(history['trades'][0]['partner_id'], self.users[0])
+        self.assertEqual(history['trades'][0]['rating']['score'], 4)
+        self.assertEqual(history['stats']['reputation_score'], 4.0)
+
+    def test_rebuild_matches_incremental_stats(self):
+        trade_id = self.create_trade()
+        self.set_status(trade_id, 1, 'accepted')
+        self.set_status(trade_id, 0, 'completed', rating=2)
+        rejected_id = self.create_trade()
+        self.set_status(rejected_id, 1, 'rejected')
+        
+        before = {stats.user_id: stats.to_dict() for stats in UserStats.query.all()}
+        rebuild_user_stats()
+        db.session.expire_all()
+        after = {stats.user_id: stats.to_dict() for stats in UserStats.query.all()}
+        self.assertEqual(before, after)
+        self.assertEqual(after[self.users[1]]['trades_rejected'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
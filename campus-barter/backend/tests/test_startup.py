@@ -0,0 +1,137 @@
+import os
+import subprocess
+import sys
+import tempfile
+import sqlite3
+import unittest
+from flask_jwt_extended import create_access_token
+from app import create_app, db
+from app.utils.startup import ensure_schema, SCHEMA_VERSION
+from app.models.schema_version import SchemaVersion
+from app.models.reputation import UserStats
+from app.models.user import User
+from app.models.item import Item
+from app.utils.expiry import expire_items
+
+class TestStartup(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        self.config = {
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.db_path}',
+            'STARTUP_MODE': 'fast'
+        }
+
+    def tearDown(self):
+        os.close(self.db_fd)
+        os.unlink(self.db_path)
+
+    def test_fast_mode_skips_schema_when_marker_current(self):
+        app = create_app(self.config)
+        with app.app_context():
+            self.assertEqual(SchemaVersion.query.one().version, SCHEMA_VERSION)
+        
+        self.assertFalse(ensure_schema(app))
+        
+        app.config['STARTUP_MODE'] = 'full'
+        self.assertTrue(ensure_schema(app))
+        with app.app_context():
+            self.assertEqual(SchemaVersion.query.count(), 1)
+
+    def test_startup_report(self):
+        app = create_app(dict(self.config, STARTUP_REPORT=True))
+        report = app.extensions['startup_report']
+        
+        self.assertEqual([phase['name'] for phase in report['phases']], ['extensions', 'blueprints', 'schema'])
+
+    def test_matching_stays_out_of_startup(self):
+        # A fresh interpreter, as other tests in this one load the matching stack
+        script = (
+            'import sys\n'
+            'from app import create_app\n'
+            f'create_app({self.config!r})\n'
+            "print('app.utils.ai_matching' in sys.modules)\n"
+        )
+        backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        result = subprocess.run([sys.executable, '-c', script], cwd=backend, capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip().splitlines()[-1], 'False')
+
+class TestBaselineUpgrade(unittest.TestCase):
+    """
+    Databases created before schema markers existed have the original tables
+    and no schema_version, and must get every backfill
+    """
+    def setUp(self):
+        self.db_fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        connection = sqlite3.connect(self.db_path)
+        connection.executescript('''
+            CREATE TABLE user (id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, email VARCHAR(120) NOT NULL UNIQUE,
+                password_hash VARCHAR(200) NOT NULL, profile_picture VARCHAR(200), bio TEXT, reputation_score FLOAT, join_date DATETIME);
+            CREATE TABLE item (id INTEGER PRIMARY KEY, title VARCHAR(100) NOT NULL, description TEXT NOT NULL, category VARCHAR(50) NOT NULL,
+                condition VARCHAR(50), images TEXT, tags VARCHAR(200), date_listed DATETIME, status VARCHAR(20),
+                user_id INTEGER NOT NULL REFERENCES user (id));
+            CREATE TABLE trade (id INTEGER PRIMARY KEY, initiator_id INTEGER NOT NULL REFERENCES user (id),
+                recipient_id INTEGER NOT NULL REFERENCES user (id), status VARCHAR(20), creation_date DATETIME, completion_date DATETIME);
+            CREATE TABLE trade_item (id INTEGER PRIMARY KEY, trade_id INTEGER NOT NULL REFERENCES trade (id),
+                offered_item_id INTEGER REFERENCES item (id), requested_item_id INTEGER REFERENCES item (id));
+            CREATE TABLE message (id INTEGER PRIMARY KEY, trade_id INTEGER NOT NULL REFERENCES trade (id),
+                sender_id INTEGER NOT NULL REFERENCES user (id), content TEXT NOT NULL, timestamp DATETIME);
+            INSERT INTO user (id, name, email, password_hash) VALUES (1, 'Ann', 'ann@west.edu', 'x'), (2, 'Ben', 'ben@west.edu', 'x');
+            INSERT INTO item (id, title, description, category, status, date_listed, user_id) VALUES
+                (1, 'Lamp', 'Bright', 'Furniture', 'available', '2020-01-01 00:00:00', 1),
+                (2, 'Desk', 'Sturdy', 'Furniture', 'available', '2020-01-01 00:00:00', 2);
+            INSERT INTO trade (id, initiator_id, recipient_id, status, creation_date) VALUES
+                (1, 1, 2, 'pending', '2020-01-01 00:00:00'),
+                (2, 1, 2, 'completed', '2020-01-01 00:00:00'),
+                (3, 2, 1, 'rejected', '2020-01-01 00:00:00');
+            INSERT INTO trade_item (trade_id, offered_item_id) VALUES (1, 1);
+            INSERT INTO trade_item (trade_id, requested_item_id) VALUES (1, 2);
+        ''')
+        connection.close()
+
+        self.app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.db_path}'})
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+    def tearDown(self):
+        db.session.remove()
+        self.app_context.pop()
+        os.close(self.db_fd)
+        os.unlink(self.db_path)
+
+    def headers(self, user_id):
+        return {'Authorization': f'Bearer {create_access_token(identity=user_id)}'}
+
+    def test_marker_is_recorded(self):
+        self.assertEqual(SchemaVersion.query.one().version, SCHEMA_VERSION)
+
+    def test_existing_trades_are_versioned(self):
+        response = self.client.put('/api/trades/1', json={'status': 'accepted'}, headers=self.headers(2))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['trade']['version'], 2)
+
+    def test_stats_are_seeded_from_existing_trades(self):
+        stats = db.session.get(UserStats, 1)
+        self.assertEqual((stats.trades_completed, stats.trades_rejected), (1, 1))
+
+    def test_existing_users_and_listings_get_campuses(self):
+        self.assertEqual(db.session.get(User, 1).campus, 'west.edu')
+        listed = self.client.get('/api/items', headers=self.headers(1)).get_json()
+        self.assertEqual(sorted(item['id'] for item in listed), [1, 2])
+
+    def test_existing_listings_get_an_expiry(self):
+        self.assertTrue(all(item.expires_at for item in Item.query))
+        self.assertEqual(expire_items(pause=0)['expired'], 0)
+
+    def test_trade_counters_are_seeded(self):
+        summary = self.client.get('/api/trades/summary', headers=self.headers(2)).get_json()
+        self.assertEqual(summary, {'unread_messages': 0, 'pending_received': 1, 'pending_sent': 0})
+
+        # Later changes build on the seeded counts
+        self.client.put('/api/trades/1', json={'status': 'rejected'}, headers=self.headers(2))
+        summary = self.client.get('/api/trades/summary', headers=self.headers(1)).get_json()
+        self.assertEqual(summary['pending_sent'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
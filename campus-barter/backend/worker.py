@@ -0,0 +1,64 @@
+"""
+Background job worker for Campus Barter
+
+Usage:
+    python worker.py                 # one worker process
+    python worker.py --processes 4   # four worker processes
+    python worker.py --once          # run every runnable job, then exit
+    python worker.py --enqueue duplicates.cluster --once   # run a batch job now
+"""
+
+import argparse
+import multiprocessing
+import signal
+import threading
+from app import create_app, db
+from app.utils.jobs import work, enqueue
+
+def run_worker(index, once):
+    app = create_app()
+    
+    # Finish the current job and stop cleanly on SIGTERM / Ctrl-C
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+    
+    processed = work(app, once=once, stop_event=stop_event)
+    if once:
+        print(f"Worker {index} processed {processed} jobs")
+
+def main():
+    parser = argparse.ArgumentParser(description='Run Campus Barter background job workers')
+    parser.add_argument('--processes', type=int, default=1, help='number of worker processes')
+    parser.add_argument('--once', action='store_true', help='drain runnable jobs and exit')
+    parser.add_argument('--enqueue', action='append', default=[], metavar='KIND', help='queue a payload-less batch job first, e.g. duplicates.cluster')
+    args = parser.parse_args()
+    
+    if args.enqueue:
+        app = create_app()
+        with app.app_context():
+            for kind in args.enqueue:
+                enqueue(kind, key=kind)
+            db.session.commit()
+    
+    if args.processes == 1:
+        run_worker(0, args.once)
+        return
+    
+    processes = [
+        multiprocessing.Process(target=run_worker, args=(index, args.once), name=f'job-worker-{index}')
+        for index in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+            process.join()
+
+if __name__ == '__main__':
+    main()
@@ -12,7 +12,8 @@ const ItemCard: React.FC<ItemCardProps> = ({ item }) => {
       <div className="h-48 bg-gray-200 relative">
         {item.images && item.images.length > 0 ? (
           <img 
-            src={item.images[0]} 
+            src={item.thumbnails?.[0] || item.images[0]} 
+            loading="lazy"
             alt={item.title} 
             className="w-full h-full object-cover"
           />
@@ -0,0 +1,14 @@
+import api from './api';
+import { BatchRequest, BatchResponse } from '../types';
+
+export const batchService = {
+  // Run several API calls in one round trip; paths include the /api prefix
+  run: async (requests: BatchRequest[]): Promise<BatchResponse[]> => {
+    try {
+      const response = await api.post<{ responses: BatchResponse[] }>('/batch', { requests });
+      return response.data.responses;
+    } catch (error: any) {
+      throw error.response?.data || { error: 'Failed to run batch' };
+    }
+  }
+};
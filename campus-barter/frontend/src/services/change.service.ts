@@ -0,0 +1,14 @@
+import api from './api';
+import { ChangeFeed } from '../types';
+
+export const changeService = {
+  // Fetch changes after a cursor; store the returned cursor for the next call
+  getChanges: async (since: string = '0', limit: number = 100): Promise<ChangeFeed> => {
+    try {
+      const response = await api.get<ChangeFeed>('/changes', { params: { since, limit } });
+      return response.data;
+    } catch (error: any) {
+      throw error.response?.data || { error: 'Failed to fetch changes' };
+    }
+  }
+};
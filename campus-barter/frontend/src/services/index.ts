@@ -3,11 +3,15 @@ import { itemService } from './item.service';
 import { tradeService } from './trade.service';
 import { userService } from './user.service';
 import { matchingService } from './matching.service';
+import { changeService } from './change.service';
+import { batchService } from './batch.service';
 
 export {
   authService,
   itemService,
   tradeService,
   userService,
-  matchingService
+  matchingService,
+  changeService,
+  batchService
 };
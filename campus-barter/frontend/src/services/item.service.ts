@@ -1,5 +1,5 @@
 import api from './api';
-import { Item, ApiError } from '../types';
+import { Item, MediaFile, ApiError } from '../types';
 
 export const itemService = {
   getAllItems: async (category?: string, status: string = 'available'): Promise<Item[]> => {
@@ -44,6 +44,16 @@ export const itemService = {
     }
   },
   
+  // Keep a listing up for another term, or bring back an expired one
+  renewItem: async (id: number): Promise<Item> => {
+    try {
+      const response = await api.post<{message: string, item: Item}>(`/items/${id}/renew`);
+      return response.data.item;
+    } catch (error: any) {
+      throw error.response?.data || { error: 'Failed to renew item' };
+    }
+  },
+  
   deleteItem: async (id: number): Promise<void> => {
     try {
       await api.delete(`/items/${id}`);
@@ -59,5 +69,19 @@ export const itemService = {
     } catch (error: any) {
       throw error.response?.data || { error: 'Failed to fetch categories' };
     }
+  },
+  
+  uploadImage: async (file: File): Promise<MediaFile> => {
+    try {
+      const formData = new FormData();
+      formData.append('file', file);
+      
+      const response = await api.post<{message: string, media: MediaFile}>('/media', formData, {
+        headers: { 'Content-Type': 'multipart/form-data' }
+      });
+      return response.data.media;
+    } catch (error: any) {
+      throw error.response?.data || { error: 'Failed to upload image' };
+    }
   }
 };
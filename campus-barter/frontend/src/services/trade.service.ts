@@ -1,11 +1,15 @@
 import api from './api';
-import { Trade, Message, ApiError } from '../types';
+import { Trade, TradeRevision, TradeSummary, TradeReadMarker, Message, TradeEvent, ApiError } from '../types';
 
 export const tradeService = {
-  getUserTrades: async (status?: string): Promise<Trade[]> => {
+  // include embeds related records, e.g. 'items.offered_item,initiator';
+  // archived adds old finished trades from the archive
+  getUserTrades: async (status?: string, include?: string, archived?: boolean): Promise<Trade[]> => {
     try {
       const params: Record<string, string> = {};
       if (status) params.status = status;
+      if (include) params.include = include;
+      if (archived) params.archived = '1';
       
       const response = await api.get<Trade[]>('/trades', { params });
       return response.data;
@@ -14,9 +18,19 @@ export const tradeService = {
     }
   },
   
-  getTradeById: async (id: number): Promise<Trade> => {
+  // Unread message and pending trade counts for badges
+  getSummary: async (): Promise<TradeSummary> => {
     try {
-      const response = await api.get<Trade>(`/trades/${id}`);
+      const response = await api.get<TradeSummary>('/trades/summary');
+      return response.data;
+    } catch (error: any) {
+      throw error.response?.data || { error: 'Failed to fetch trade summary' };
+    }
+  },
+  
+  getTradeById: async (id: number, include?: string): Promise<Trade> => {
+    try {
+      const response = await api.get<Trade>(`/trades/${id}`, { params: include ? { include } : {} });
       return response.data;
     } catch (error: any) {
       throw error.response?.data || { error: 'Failed to fetch trade' };
@@ -42,15 +56,50 @@ export const tradeService = {
     }
   },
   
-  updateTradeStatus: async (id: number, status: 'accepted' | 'rejected' | 'completed'): Promise<Trade> => {
+  updateTradeStatus: async (
+    id: number,
+    status: 'accepted' | 'rejected' | 'completed',
+    rating?: { rating: number, comment?: string },
+    version?: number
+  ): Promise<Trade> => {
+    // Pass the version the user saw; a 409 response carries the current trade
     try {
-      const response = await api.put<{message: string, trade: Trade}>(`/trades/${id}`, { status });
+      const response = await api.put<{message: string, trade: Trade}>(`/trades/${id}`, { status, version, ...rating });
       return response.data.trade;
     } catch (error: any) {
       throw error.response?.data || { error: 'Failed to update trade status' };
     }
   },
   
+  counterOffer: async (
+    id: number,
+    offeredItems: number[],
+    requestedItems: number[],
+    version?: number,
+    message?: string
+  ): Promise<Trade> => {
+    try {
+      const response = await api.post<{message: string, trade: Trade, revision: TradeRevision}>(`/trades/${id}/counter`, {
+        offered_items: offeredItems,
+        requested_items: requestedItems,
+        version,
+        message
+      });
+      return response.data.trade;
+    } catch (error: any) {
+      throw error.response?.data || { error: 'Failed to send counter-offer' };
+    }
+  },
+  
+  getTradeRevisions: async (id: number): Promise<TradeRevision[]> => {
+    try {
+      const response = await api.get<TradeRevision[]>(`/trades/${id}/revisions`);
+      return response.data;
+    } catch (error: any) {
+      throw error.response?.data || { error: 'Failed to fetch trade revisions' };
+    }
+  },
+  
   sendMessage: async (tradeId: number, content: string): Promise<Message> => {
     try {
       const response = await api.post<{message: string, trade_message: Message}>(
@@ -61,5 +110,28 @@ export const tradeService = {
     } catch (error: any) {
       throw error.response?.data || { error: 'Failed to send message' };
     }
+  },
+  
+  markRead: async (tradeId: number): Promise<TradeSummary> => {
+    try {
+      const response = await api.post<{marker: TradeReadMarker, summary: TradeSummary}>(`/trades/${tradeId}/read`);
+      return response.data.summary;
+    } catch (error: any) {
+      throw error.response?.data || { error: 'Failed to mark trade read' };
+    }
+  },
+  
+  subscribeToTradeEvents: (onEvent: (event: TradeEvent) => void): EventSource => {
+    // EventSource cannot send headers, so the token goes in the query string
+    const token = localStorage.getItem('token') || '';
+    const source = new EventSource(`${api.defaults.baseURL}/trades/events?jwt=${encodeURIComponent(token)}`);
+    
+    ['trade', 'message', 'status', 'counter'].forEach((type) => {
+      source.addEventListener(type, (event) => {
+        onEvent(JSON.parse((event as MessageEvent).data));
+      });
+    });
+    
+    return source;
   }
 };
@@ -1,5 +1,5 @@
 import api from './api';
-import { User, ApiError } from '../types';
+import { User, TradeHistory, ApiError } from '../types';
 
 export const userService = {
   getUserById: async (id: number): Promise<User> => {
@@ -37,5 +37,14 @@ export const userService = {
     } catch (error: any) {
       throw error.response?.data || { error: 'Failed to fetch user items' };
     }
+  },
+  
+  getUserTradeHistory: async (id: number, page = 1): Promise<TradeHistory> => {
+    try {
+      const response = await api.get<TradeHistory>(`/users/${id}/trades`, { params: { page } });
+      return response.data;
+    } catch (error: any) {
+      throw error.response?.data || { error: 'Failed to fetch trade history' };
+    }
   }
 };
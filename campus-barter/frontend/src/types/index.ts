@@ -2,10 +2,48 @@ export interface User {
   id: number;
   name: string;
   email: string;
+  campus?: string | null;
   profile_picture?: string;
   bio?: string;
   reputation_score: number;
   join_date: string;
+  stats?: UserStats;
+  items?: Item[];
+}
+
+export interface UserStats {
+  user_id: number;
+  reputation_score: number;
+  rating_count: number;
+  trades_completed: number;
+  trades_rejected: number;
+  average_response_seconds: number | null;
+}
+
+export interface TradeRating {
+  id: number;
+  trade_id: number;
+  rater_id: number;
+  ratee_id: number;
+  score: number;
+  comment?: string;
+  created_at: string;
+}
+
+export interface TradeHistoryEntry {
+  trade_id: number;
+  partner_id: number;
+  role: 'initiator' | 'recipient';
+  creation_date: string;
+  completion_date: string | null;
+  rating: TradeRating | null;
+}
+
+export interface TradeHistory {
+  stats: UserStats;
+  trades: TradeHistoryEntry[];
+  page: number;
+  per_page: number;
 }
 
 export interface Item {
@@ -15,10 +53,29 @@ export interface Item {
   category: string;
   condition?: string;
   images: string[];
+  thumbnails?: string[];
   tags: string[];
   date_listed: string;
-  status: 'available' | 'pending' | 'traded';
+  updated_at?: string | null;
+  campus?: string | null;
+  duplicate_of?: number | null;
+  status: 'available' | 'pending' | 'traded' | 'expired';
+  expires_at?: string | null;
   user_id: number;
+  owner?: User;
+  original?: Item | null;
+}
+
+export interface MediaFile {
+  hash: string;
+  content_type: string;
+  size: number;
+  width?: number;
+  height?: number;
+  variants_ready: boolean;
+  url: string;
+  thumbnail_url: string;
+  created_at: string;
 }
 
 export interface Trade {
@@ -28,8 +85,15 @@ export interface Trade {
   status: 'pending' | 'accepted' | 'rejected' | 'completed';
   creation_date: string;
   completion_date?: string;
+  updated_at?: string | null;
+  version: number;
+  revision: number;
+  proposer_id: number;
+  archived?: boolean;
   items: TradeItem[];
-  messages: Message[];
+  messages?: Message[];
+  initiator?: User;
+  recipient?: User;
 }
 
 export interface TradeItem {
@@ -37,6 +101,35 @@ export interface TradeItem {
   trade_id: number;
   offered_item_id?: number;
   requested_item_id?: number;
+  offered_item?: Item | null;
+  requested_item?: Item | null;
+}
+
+export interface ItemSetChange {
+  added: number[];
+  removed: number[];
+}
+
+export interface TradeRevision {
+  id: number;
+  trade_id: number;
+  number: number;
+  author_id: number;
+  changes: { offered?: ItemSetChange; requested?: ItemSetChange };
+  created_at: string;
+}
+
+export interface TradeSummary {
+  unread_messages: number;
+  pending_received: number;
+  pending_sent: number;
+}
+
+export interface TradeReadMarker {
+  trade_id: number;
+  user_id: number;
+  last_read_message_id: number | null;
+  unread: number;
 }
 
 export interface Message {
@@ -45,6 +138,43 @@ export interface Message {
   sender_id: number;
   content: string;
   timestamp: string;
+  sender?: User;
+}
+
+export interface TradeEvent {
+  id: number;
+  trade_id: number;
+  type: 'trade' | 'message' | 'status' | 'counter';
+  data: any;
+  created_at: string;
+}
+
+export interface Change {
+  cursor: string;
+  entity: 'item' | 'trade' | 'message';
+  id: number;
+  operation: 'create' | 'update' | 'delete';
+  data: Item | Trade | Message | null;
+  created_at: string;
+}
+
+export interface ChangeFeed {
+  changes: Change[];
+  cursor: string;
+  has_more: boolean;
+}
+
+export interface BatchRequest {
+  id?: string | number;
+  method?: 'GET' | 'HEAD' | 'POST' | 'PUT' | 'DELETE';
+  path: string;
+  body?: any;
+}
+
+export interface BatchResponse {
+  id: string | number;
+  status: number;
+  body: any;
 }
 
 export interface AuthResponse {